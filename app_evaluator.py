@@ -1,23 +1,56 @@
 import streamlit as st
-import numpy as np
-import matplotlib.pyplot as plt
-from streamlit_utils.firestore_utils import init_firestore
-import datetime
+from streamlit_utils.bootstrap import firestore_client
+from streamlit_utils.plotting import show_ecg, show_measurements, render_ecg_png, select_backend
+from streamlit_utils.signal_codec import decode_signal
+from streamlit_utils.measurements import measure_record
+from streamlit_utils.preprocessing import TARGET_FS
+from streamlit_utils.ecg_listing import ECGListing
+from streamlit_utils.prefetch import PrefetchingRecordCache
+from streamlit_utils.eval_writer import EvalWriter, reviewer_key
+import functools
 
-# Initialize Firestore
+PREFETCH_K = 3
+
+# Projected ID listing shared by all sessions, refreshed incrementally
+@st.cache_resource
+def get_listing(only_unevaluated):
+    return ECGListing(firestore_client(), 'ecg_data_ste', only_unevaluated=only_unevaluated)
+
+# Durable write-behind queue; submissions are committed by its background thread
 @st.cache_resource
-def init_st():
-    db = init_firestore()
-    docs = db.collection('ecg_data_ste').stream()
-    ecg_id_list = [""] + [doc.id for doc in docs]
-    return db, ecg_id_list
+def get_eval_writer():
+    return EvalWriter(firestore_client())
+
+def fetch_record(db, doc_id):
+    # Runs in a prefetch thread: network read, decode, measurements and plot are all done ahead of the click
+    ecg_dict = db.collection('ecg_data_ste').document(doc_id).get().to_dict()
+    if ecg_dict is None:
+        return None  # deleted or never uploaded
+    ecg = decode_signal(ecg_dict)
+    render_ecg_png(ecg)
+    # The blob is 100 Hz: fine for heart rate, too coarse for QRS/PR/QT (those are in the viewers)
+    measured = measure_record(ecg.T, TARGET_FS)
+    return {'doc': ecg_dict, 'ecg': ecg, 'measurements': {field: measured[field] for field in ('n_beats', 'heart_rate')}}
+
+def neighbour_ids(ecg_id_list, current, entries, k=PREFETCH_K):
+    # Next k unevaluated records after `current`, plus the previous one
+    ids = ecg_id_list[1:]
+    ix = ids.index(current) if current in ids else -1
+    ahead = [doc_id for doc_id in ids[ix + 1:] if not entries.get(doc_id, {}).get('eval')][:k]
+    return ahead + (ids[ix - 1:ix] if ix > 0 else [])
+
+def step_select(ecg_id_list, step):
+    ids = [doc_id for doc_id in ecg_id_list if doc_id != ""]
+    if ids:
+        ix = ids.index(st.session_state.ecg_select) if st.session_state.ecg_select in ids else -1
+        st.session_state.ecg_select = ids[min(max(ix + step, 0), len(ids) - 1)]
 
 def main():
     st.set_page_config(page_title="ECG Evaluator", page_icon="👨‍⚕️")
     st.title("👨‍⚕️ ECG MI Evaluator")
     st.text("استاد عزیز، لطفا بررسی کنید آیا نوارها همگی به نفع \nMI\n هستند یا خیر.")
     
-    db, ecg_id_list = init_st()
+    db = firestore_client()
 
     # Initialize session state
     if "username" not in st.session_state:
@@ -36,89 +69,80 @@ def main():
         st.session_state.fb_submit = False
     if "select_change" not in st.session_state:    
         st.session_state.select_change = ""
+    if "only_unevaluated" not in st.session_state:
+        st.session_state.only_unevaluated = False
+    if "ecg" not in st.session_state:
+        st.session_state.ecg = None
+    if "measurements" not in st.session_state:
+        st.session_state.measurements = None
+    if "record_cache" not in st.session_state:
+        st.session_state.record_cache = PrefetchingRecordCache(functools.partial(fetch_record, db))
+    record_cache = st.session_state.record_cache
         
-    @st.cache_data
     def load_ecg():
-        ecg = np.array(st.session_state.ecg_dict['signals_flat'])
-        ecg = ecg.reshape(12, 500)
+        ecg = st.session_state.ecg
         
         actual_labels = '\n- '.join(st.session_state.ecg_dict['label_list'])
         st.info(f"""
                 **Actual** interpretation:\n- {actual_labels}
                 """)
 
-        # Plot settings
-        lead_names = ['I', 'II', 'III', 'aVR', 'aVL', 'aVF', 'V1', 'V2', 'V3', 'V4', 'V5', 'V6']
-        lead_order = [0, 3, 1, 4, 2, 5, 6, 9, 7, 10, 8, 11]  # I, aVR, II, aVL, III, aVF, V1, V4, V2, V5, V3, V6
-
-        # Parameters
-        n_samples = 500
-        sampling_rate = 100
-        duration = n_samples / sampling_rate
-        time = np.linspace(0, duration, n_samples)
-
-        # Create a 6x2 grid of subplots
-        fig, axes = plt.subplots(6, 2, figsize=(10, 12), sharex=True, sharey=True)
-        axes = axes.flatten()
-
-        # Plot each lead
-        for subplot_idx, lead_idx in enumerate(lead_order):
-            ax = axes[subplot_idx]
-            # Set light pink background to mimic ECG paper
-            ax.set_facecolor('#ffe6e6')
-            
-            # Plot ECG signal
-            ax.plot(time, ecg[lead_idx], color='red', linewidth=1)
-            
-            # Set title to lead name
-            ax.set_title(lead_names[lead_idx], loc='left', fontsize=10, fontweight='bold')
-            
-            # Major grid: 0.5 mV (5 mm) and 0.2 s (5 mm at 25 mm/s)
-            ax.grid(True, which='major', linestyle='-', linewidth=0.8, color='gray', alpha=0.7)
-            ax.set_yticks(np.arange(-2, 2.1, 0.5))  # 0.5 mV steps
-            ax.set_xticks(np.arange(0, duration + 0.2, 0.2))  # 0.2 s steps
-            
-            # Minor grid: 0.1 mV (1 mm) and 0.04 s (1 mm at 25 mm/s)
-            ax.grid(True, which='minor', linestyle=':', linewidth=0.5, color='gray', alpha=0.5)
-            ax.set_yticks(np.arange(-2, 2.1, 0.1), minor=True)
-            ax.set_xticks(np.arange(0, duration + 0.04, 0.04), minor=True)
-            
-            # Hide tick labels
-            ax.set_xticklabels([])
-            ax.set_yticklabels([])
-            
-            # Set axis limits
-            ax.set_ylim(-2, 2)  # Typical ECG range in mV
-            ax.set_xlim(0, duration)
-            
-            # Remove spines for cleaner look
-            ax.spines['top'].set_visible(False)
-            ax.spines['right'].set_visible(False)
-            ax.spines['left'].set_visible(False)
-            ax.spines['bottom'].set_visible(False)
-
-        plt.tight_layout()
-        st.pyplot(fig)
+        show_ecg(ecg)
+        if st.session_state.measurements is not None:
+            show_measurements(st.session_state.measurements, intervals=False)
 
     # Sidebar widgets
     st.sidebar.header("Config")
     st.sidebar.text_input('Your Name:', value=st.session_state.username, key="username")
+    st.sidebar.checkbox('Only not yet evaluated', key="only_unevaluated")
+    select_backend()
+    listing = get_listing(st.session_state.only_unevaluated)
+    listing.refresh(full=st.sidebar.button('🔄 Refresh list'))
+    ecg_id_list = [""] + listing.ids()
+    if st.session_state.ecg_select not in ecg_id_list:
+        ecg_id_list.append(st.session_state.ecg_select)
     st.sidebar.selectbox('Select Patient:', ecg_id_list, key="ecg_select")
+    prev_col, next_col = st.sidebar.columns(2)
+    prev_col.button('⬅ Previous', on_click=step_select, args=(ecg_id_list, -1), width='stretch')
+    next_col.button('Next ➡', on_click=step_select, args=(ecg_id_list, 1), width='stretch')
     
     if (st.session_state.username != "") and (st.session_state.ecg_select != "") and (st.session_state.select_change != st.session_state.ecg_select):
-        load_ecg.clear() # type: ignore
-        act_ecg_dict = db.collection('ecg_data_ste').document(st.session_state.ecg_select)
-        st.session_state.ecg_dict = act_ecg_dict.get().to_dict()
-        st.session_state.ecg_loaded = True
+        record = record_cache.get(st.session_state.ecg_select)
         st.session_state.select_change = st.session_state.ecg_select
-        st.sidebar.success("🎉 Loaded successfully!")
+        if record is None:
+            # Not cached, so the record is fetched again if it is re-created
+            record_cache.invalidate(st.session_state.ecg_select)
+            st.session_state.ecg_dict = None
+            st.session_state.ecg_loaded = False
+            st.sidebar.error(f'Patient "{st.session_state.ecg_select}" no longer exists.')
+        else:
+            st.session_state.ecg_dict = record['doc']
+            st.session_state.ecg = record['ecg']
+            st.session_state.measurements = record['measurements']
+            st.session_state.ecg_loaded = True
+            st.sidebar.success("🎉 Loaded successfully!")
     else:
         st.sidebar.warning('Please fill both fields.')
+    if st.session_state.username != "":
+        record_cache.prefetch(neighbour_ids(ecg_id_list, st.session_state.ecg_select, listing.entries))
+    cache_stats = record_cache.stats()
+    st.sidebar.caption(
+        f"Record cache: {cache_stats['hit_rate']:.0%} hits, last load {cache_stats['last_ms']:.0f} ms, "
+        f"median {cache_stats['median_ms']:.0f} ms, {cache_stats['cached']} cached"
+    )
+    writer_stats = get_eval_writer().stats()
+    if writer_stats['pending']:
+        st.sidebar.caption(f"{writer_stats['pending']} evaluation(s) waiting to sync"
+                           + (f" (last error: {writer_stats['last_error']})" if writer_stats['last_error'] else ""))
+    if writer_stats['failed']:
+        st.sidebar.caption(f"{writer_stats['failed']} evaluation(s) rejected by the database; they are retried on the next start")
     
             
     # Display ECG and feedback widgets if data is loaded
     if st.session_state.ecg_loaded and st.session_state.ecg_dict:
-        if st.session_state.ecg_dict['eval']:
+        if reviewer_key(st.session_state.username) in st.session_state.ecg_dict.get('reviewers', []):
+            st.sidebar.warning('You evaluated this patient before; submitting again replaces your evaluation.')
+        elif st.session_state.ecg_dict['eval']:
             st.sidebar.warning('This patient was evaluated before.')
             
         load_ecg()
@@ -130,21 +154,17 @@ def main():
     
         # Handle submission
         if st.sidebar.button('Submit!', type='secondary'):
-            act_ecg_dict = db.collection('ecg_data_ste').document(st.session_state.ecg_select)
-            act_ecg_dict.update({
-                'eval': True
-            })
-            eval_data = db.collection("eval_data").document(st.session_state.ecg_select)
-            eval_data.set({
-                "username": st.session_state.username,
+            # Evaluation document + record flag go out as one atomic batch, off the UI thread
+            get_eval_writer().submit(st.session_state.ecg_select, st.session_state.username, {
                 "fb_stars": st.session_state.fb_stars,
                 "fb_comment": st.session_state.fb_comment,
-                "submit_datetime": datetime.datetime.now()
             })
+            get_listing(True).mark_evaluated(st.session_state.ecg_select)
+            get_listing(False).mark_evaluated(st.session_state.ecg_select)
+            record_cache.invalidate(st.session_state.ecg_select)
             
             st.session_state.ecg_loaded = False
             st.session_state.fb_submit = True
-            load_ecg.clear() # type: ignore
             st.rerun()
     else:
         st.info("👈 Select a patient in sidebar.")
@@ -1,13 +1,108 @@
+import hashlib
 import os
+import time
 import streamlit as st
-import wfdb
 import tempfile
-import numpy as np
-import matplotlib.pyplot as plt
-from streamlit_utils.firestore_utils import init_firestore
-from streamlit_utils.app_utils import label_finder
+from streamlit_utils.bootstrap import firestore_client
+from streamlit_utils.app_utils import wtd_label_finder
+from streamlit_utils.preprocessing import preprocess_record
+from streamlit_utils.plotting import show_ecg, show_ecg_window, select_backend
+from streamlit_utils.lod import MinMaxPyramid
+from streamlit_utils.signal_codec import encode_signal
+from streamlit_utils.batch_upload import CHUNK_RECORDS, build_upload_document, collect_uploads
+from streamlit_utils.ingest import ingest
 
-db = init_firestore()
+def batch_upload():
+    import pandas as pd
+
+    st.sidebar.header("Load files")
+    uploads = st.sidebar.file_uploader(
+        '.hea + .mat/.dat files or .zip archives', type=['hea', 'mat', 'dat', 'zip'],
+        accept_multiple_files=True,
+        help="Files are paired by name, e.g. 00001.hea with 00001.mat"
+    )
+    workers = st.sidebar.slider('Decode workers', 1, 16, 8)
+    if not uploads:
+        st.info("👈 Load many records at once: pairs of **HEA** and **MAT** files, or zip archives of them.")
+        return
+
+    records, problems = collect_uploads(uploads)
+    st.write(f'{len(records)} complete records found, {len(problems)} file(s) skipped.')
+    if not st.button(f'Process and upload {len(records)} records', type='primary', disabled=not records):
+        if problems:
+            st.dataframe(pd.DataFrame(problems, columns=['file', 'status']), hide_index=True)
+        return
+
+    status = {name: problem for name, problem in problems}
+    stems = sorted(records)
+    progress = st.progress(0.0)
+    committed = failed = 0
+    start = time.perf_counter()
+    # Chunked so progress shows between chunks; ingest keeps memory flat within each
+    for ix in range(0, len(stems), CHUNK_RECORDS):
+        chunk = stems[ix:ix + CHUNK_RECORDS]
+        try:
+            report = ingest(firestore_client(), [(stem, (stem, records[stem])) for stem in chunk], "ecg_data",
+                            build_upload_document, max_workers=workers, log=lambda message: None)
+        except Exception as e:
+            for stem in chunk:
+                status.setdefault(stem, f'not committed: {e!r}')
+            break
+        errors = dict(report['errors'])
+        for stem in chunk:
+            status[stem] = f'failed: {errors[stem]}' if stem in errors else 'uploaded'
+        committed += report['committed']
+        failed += report['failed']
+        elapsed = time.perf_counter() - start
+        progress.progress(min(1.0, (ix + len(chunk)) / len(stems)),
+                          text=f'{committed} uploaded, {failed} failed, {committed / elapsed:.1f} records/s')
+
+    st.success(f'🎉 {committed} records added to database in {time.perf_counter() - start:.1f}s, {failed} failed.')
+    st.dataframe(pd.DataFrame(sorted(status.items()), columns=['record', 'status']), hide_index=True)
+
+def upload_record(ecg_mat, ecg_hea):
+    """Decode, preprocess and upload a MAT/HEA pair once; the result is kept in session state.
+
+    Reruns with the same pair (same name and file contents) reuse it, so widget changes never
+    decode the record or rewrite its Firestore document (which would reset "eval").
+    """
+    name = ecg_mat.name[:-4]
+    digest = hashlib.blake2b(ecg_mat.getbuffer(), digest_size=16)
+    digest.update(ecg_hea.getbuffer())
+    key = (name, digest.hexdigest())
+    upload = st.session_state.get('single_upload')
+    if upload is not None and upload['key'] == key:
+        return upload
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Save BOTH files to the SAME temporary directory
+        with open(os.path.join(tmp_dir, ecg_mat.name), "wb") as f_mat, open(os.path.join(tmp_dir, ecg_hea.name), "wb") as f_hea:
+            f_mat.write(ecg_mat.getbuffer())
+            f_hea.write(ecg_hea.getbuffer())
+
+        import wfdb
+
+        record = wfdb.rdrecord(os.path.join(tmp_dir, name))
+
+    # Process ECG signals
+    ecg = preprocess_record(record)
+    label_list = wtd_label_finder(record.comments) # type: ignore
+
+    # Save to Firestore
+    doc_ref = firestore_client().collection("ecg_data").document(name)
+    doc_ref.set({
+        **encode_signal(ecg),  # compressed binary signal + shape
+        "label_list": label_list,
+        "eval": False
+    })
+
+    upload = {
+        'key': key, 'ecg': ecg, 'label_list': label_list,
+        'signal': record.p_signal[:, :12], 'fs': record.fs, # type: ignore
+        'pyramid': None,  # built on the first full-record view
+    }
+    st.session_state.single_upload = upload
+    return upload
 
 def main():
     st.set_page_config(page_title="ECGMaster Uploader", page_icon="👨‍⚕️")
@@ -15,6 +110,10 @@ def main():
 
     st.header("Upload your ECG to see what is going on!")
 
+    if st.sidebar.radio('Mode', ['Single record', 'Batch'], horizontal=True) == 'Batch':
+        batch_upload()
+        return
+
     # Sidebar widgets
     st.sidebar.header("Load files")
     st.sidebar.write('Please load the files with same names:')
@@ -31,105 +130,29 @@ def main():
     )
 
     if ecg_mat is not None and ecg_hea is not None:
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            # Save BOTH files to the SAME temporary directory
-            mat_path = os.path.join(tmp_dir, ecg_mat.name)
-            hea_path = os.path.join(tmp_dir, ecg_hea.name)
-            
-            with open(mat_path, "wb") as f_mat, open(hea_path, "wb") as f_hea:
-                f_mat.write(ecg_mat.getbuffer())
-                f_hea.write(ecg_hea.getbuffer())
-            
-            # Verify filenames match (excluding extensions)
-            if ecg_mat.name[:-4] == ecg_hea.name[:-4]:
-                ecg_name = os.path.join(tmp_dir, ecg_mat.name[:-4])
-                st.sidebar.success("Files loaded successfully!")
-                
-                record = wfdb.rdrecord(ecg_name)
-                
-                # Process ECG signals
-                ecg = []
-                for ix, _ in enumerate(record.sig_name[:12]): # type: ignore
-                    num_signals = record.fs * 5 # type: ignore
-                    signals = record.p_signal[:num_signals, ix] # type: ignore
-                    signals = signals.reshape(500, (record.fs//100)).mean(axis=1) # type: ignore
-                    ecg.append(signals)
-                ecg = np.array(ecg)
-                
-                label_list = label_finder(record.comments[2]) # type: ignore
-                actual_labels = '\n- '.join(label_list)
-                
-                # Save to Firestore
-                doc_ref = db.collection("ecg_data").document(ecg_mat.name[:-4])
-                doc_ref.set({
-                    "signals_flat": ecg.flatten().tolist(),  # 1D list
-                    "shape": list(ecg.shape),
-                    "label_list": label_list,
-                    "eval": False
-                })
-                st.success('🎉 Files successfully processed and added to database!')
-                    
-                st.info(f"""
-                        **Actual** interpretation:\n- {actual_labels}
-                        """)
-                
-                #### Plot settings
-                lead_names = ['I', 'II', 'III', 'aVR', 'aVL', 'aVF', 'V1', 'V2', 'V3', 'V4', 'V5', 'V6']
-                lead_order = [0, 3, 1, 4, 2, 5, 6, 9, 7, 10, 8, 11]  # I, aVR, II, aVL, III, aVF, V1, V4, V2, V5, V3, V6
-
-                # Parameters
-                n_samples = 500  # Number of samples per lead
-                sampling_rate = 100  # Hz
-                duration = n_samples / sampling_rate
-                time = np.linspace(0, duration, n_samples)  # Time array with 500 samples
-                
-                # Create a 6x2 grid of subplots
-                fig, axes = plt.subplots(6, 2, figsize=(10, 12), sharex=True, sharey=True)
-                axes = axes.flatten()
-
-                # Plot each lead
-                for subplot_idx, lead_idx in enumerate(lead_order):
-                    ax = axes[subplot_idx]
-                    # Set light pink background to mimic ECG paper
-                    ax.set_facecolor('#ffe6e6')
-                    
-                    # Plot ECG signal
-                    ax.plot(time, ecg[lead_idx], color='red', linewidth=1)
-                    
-                    # Set title to lead name
-                    ax.set_title(lead_names[lead_idx], loc='left', fontsize=10, fontweight='bold')
-                    
-                    # Major grid: 0.5 mV (5 mm) and 0.2 s (5 mm at 25 mm/s)
-                    ax.grid(True, which='major', linestyle='-', linewidth=0.8, color='gray', alpha=0.7)
-                    ax.set_yticks(np.arange(-2, 2.1, 0.5))  # 0.5 mV steps
-                    ax.set_xticks(np.arange(0, duration + 0.2, 0.2))  # 0.2 s steps
-                    
-                    # Minor grid: 0.1 mV (1 mm) and 0.04 s (1 mm at 25 mm/s)
-                    ax.grid(True, which='minor', linestyle=':', linewidth=0.4, color='gray', alpha=0.4)
-                    ax.set_yticks(np.arange(-2, 2.1, 0.1), minor=True)
-                    ax.set_xticks(np.arange(0, duration + 0.04, 0.04), minor=True)
-                    
-                    # Hide tick labels
-                    ax.set_xticklabels([])
-                    ax.set_yticklabels([])
-                    
-                    # Set axis limits
-                    ax.set_ylim(-2, 2)  # Typical ECG range in mV
-                    ax.set_xlim(0, duration)
-                    
-                    # Remove spines for cleaner look
-                    ax.spines['top'].set_visible(False)
-                    ax.spines['right'].set_visible(False)
-                    ax.spines['left'].set_visible(False)
-                    ax.spines['bottom'].set_visible(False)
-
-                # Adjust layout to prevent overlap
-                plt.tight_layout()
-
-                # Display in Streamlit
-                st.pyplot(fig)
+        # Verify filenames match (excluding extensions)
+        if ecg_mat.name[:-4] == ecg_hea.name[:-4]:
+            upload = upload_record(ecg_mat, ecg_hea)
+            st.sidebar.success("Files loaded successfully!")
+            st.success('🎉 Files successfully processed and added to database!')
+
+            actual_labels = '\n- '.join(upload['label_list'])
+            st.info(f"""
+                    **Actual** interpretation:\n- {actual_labels}
+                    """)
+
+            # View widgets only rerun the drawing: the upload above is done once per file pair
+            select_backend()
+            if st.sidebar.checkbox('Full record view (zoom & scroll)', key='full_view'):
+                if upload['pyramid'] is None:
+                    upload['pyramid'] = MinMaxPyramid.from_array(upload['signal'], upload['fs'])
+                pyramid = upload['pyramid']
+                view_range = st.sidebar.slider('Visible range (s)', 0.0, pyramid.duration, (0.0, pyramid.duration), step=0.1)
+                show_ecg_window(pyramid, *view_range)
             else:
-                st.sidebar.error('File names must match (e.g., "00001.hea" and "00001.mat")')
+                show_ecg(upload['ecg'])
+        else:
+            st.sidebar.error('File names must match (e.g., "00001.hea" and "00001.mat")')
     else:
         st.info("👈 Both **MAT** and **HEA** files are needed. Please load them in sidebar.")
 
@@ -0,0 +1,34 @@
+import time
+import numpy as np
+import pandas as pd
+from streamlit_utils.agreement import fleiss_kappa, pairwise_cohen, rating_matrix
+
+# Usage: python -m benchmarks.bench_agreement
+# Kappa statistics over a synthetic multi-reader study (each reviewer rates ~60% of records).
+
+
+def synthetic_evals(n_records, n_reviewers, seed=0):
+    rng = np.random.default_rng(seed)
+    truth = rng.integers(0, 5, n_records)
+    frames = []
+    for reviewer in range(n_reviewers):
+        rated = rng.random(n_records) < 0.6
+        stars = np.where(rng.random(n_records) < 0.7, truth, rng.integers(0, 5, n_records))
+        frames.append(pd.DataFrame({'record_id': np.flatnonzero(rated).astype(str),
+                                    'reviewer': f'reviewer{reviewer}', 'fb_stars': stars[rated]}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    for n_records, n_reviewers in ((10_000, 3), (50_000, 4), (200_000, 6)):
+        evals = synthetic_evals(n_records, n_reviewers)
+        start = time.perf_counter()
+        ratings, _, raters, _ = rating_matrix(evals, categories=range(5))
+        fleiss = fleiss_kappa(ratings, 5)
+        pairwise_cohen(ratings, raters, 5, 'quadratic')
+        elapsed = time.perf_counter() - start
+        print(f'{len(evals):>8} evaluations, {n_reviewers} reviewers: {elapsed * 1000:7.1f} ms (Fleiss {fleiss:.3f})')
+
+
+if __name__ == "__main__":
+    main()
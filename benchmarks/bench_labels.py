@@ -0,0 +1,63 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from streamlit_utils.app_utils import (
+    MIMIC_CODES, MIMIC_LABELS, WTD_CODES, WTD_LABELS,
+    mimic_label_finder, mimic_multi_hot, wtd_label_finder, wtd_multi_hot, wtd_table_multi_hot,
+)
+from streamlit_utils.record_index import MIMIC_LABELS_CSV, WTD_CSV
+
+# Usage: python -m benchmarks.bench_labels
+# Label decoding over the full WTD / MIMIC label tables (synthetic tables of the same size
+# when the CSVs are not available).
+
+
+def legacy_wtd_label_finder(dxs):
+    # Old behaviour: dict literal rebuilt on every call, parsed by position
+    label_json_wtd = dict(WTD_LABELS)
+    return [label_json_wtd[item] for item in dxs[4:].split(',')]
+
+
+def legacy_mimic_label_finder(dx_dict):
+    label_json_mimic = dict(MIMIC_LABELS)
+    return [label_json_mimic[key] for key, value in dx_dict.items() if value == 1]
+
+
+def synthetic_tables(rng, n_wtd=88000, n_mimic=800000):
+    codes = np.array(WTD_CODES)
+    dx_strings = ['Dx: ' + ','.join(rng.choice(codes, size=rng.integers(1, 5), replace=False)) for _ in range(n_wtd)]
+    wtd = pd.DataFrame((rng.random((n_wtd, len(WTD_CODES))) < 0.03).astype(np.uint8),
+                       columns=[f'g2_{code}' for code in WTD_CODES])
+    mimic = pd.DataFrame((rng.random((n_mimic, len(MIMIC_CODES))) < 0.05).astype(np.uint8), columns=list(MIMIC_CODES))
+    return dx_strings, wtd, mimic
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f'{label:<40}: {time.perf_counter() - start:8.3f}s')
+    return result
+
+
+def main():
+    dx_strings, wtd, mimic = synthetic_tables(np.random.default_rng(0))
+    if os.path.exists(WTD_CSV):
+        wtd = pd.read_csv(WTD_CSV)
+    if os.path.exists(MIMIC_LABELS_CSV):
+        mimic = pd.read_csv(MIMIC_LABELS_CSV).drop(columns=['study_id'])
+    print(f'{len(dx_strings)} Dx strings, WTD table {wtd.shape}, MIMIC table {mimic.shape}')
+
+    timed('legacy wtd_label_finder loop', lambda: [legacy_wtd_label_finder(dxs) for dxs in dx_strings])
+    timed('wtd_label_finder loop', lambda: [wtd_label_finder(dxs) for dxs in dx_strings])
+    timed('wtd_multi_hot (vectorized)', lambda: wtd_multi_hot(dx_strings))
+    timed('wtd_table_multi_hot (g2_* block)', lambda: wtd_table_multi_hot(wtd))
+
+    mimic_rows = mimic.iloc[:100000].to_dict(orient='records')
+    timed('legacy mimic_label_finder x 100k rows', lambda: [legacy_mimic_label_finder(row) for row in mimic_rows])
+    timed('mimic_label_finder x 100k rows', lambda: [mimic_label_finder(row) for row in mimic_rows])
+    timed('mimic_multi_hot (full table)', lambda: mimic_multi_hot(mimic))
+
+
+if __name__ == "__main__":
+    main()
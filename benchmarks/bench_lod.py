@@ -0,0 +1,46 @@
+import time
+import numpy as np
+from streamlit_utils.lod import MinMaxPyramid
+from streamlit_utils.plotting import get_renderer
+
+# Usage: python -m benchmarks.bench_lod
+# Draw time against window length on a synthetic 1 h, 500 Hz, 12-lead record: every raw
+# sample vs the min/max pyramid, rasterized without the PNG cache.
+
+WINDOWS = (5, 30, 120, 600, 3600)
+
+
+def synthetic_record(seconds=3600, fs=500, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(seconds * fs) / fs
+    beats = np.sin(2 * np.pi * 1.2 * t) ** 63  # sharp periodic spikes, ~72 bpm
+    return (beats[:, None] + 0.05 * rng.standard_normal((len(t), 12))).astype(np.float32)
+
+
+def draw_ms(fn, repeat=3):
+    fn()  # warm-up: builds the renderer for this duration
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(fs=500):
+    signal = synthetic_record(fs=fs)
+    start = time.perf_counter()
+    pyramid = MinMaxPyramid.from_array(signal, fs)
+    print(f'pyramid build: {time.perf_counter() - start:.2f} s for {len(signal) / fs:.0f} s of signal')
+
+    print(f'{"window":>8} {"raw pts":>9} {"raw ms":>9} {"lod pts":>8} {"lod ms":>8}')
+    for seconds in WINDOWS:
+        renderer = get_renderer(seconds)
+        raw = signal[:seconds * fs].T
+        t_raw = np.arange(raw.shape[-1]) / fs
+        time_lod, values = pyramid.query(0, seconds)
+        raw_ms = draw_ms(lambda: renderer.render(raw, t_raw))
+        lod_ms = draw_ms(lambda: renderer.render(values.T, time_lod))
+        print(f'{seconds:>7}s {raw.shape[-1]:>9} {raw_ms:>9.1f} {len(values):>8} {lod_ms:>8.1f}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import os
+import tempfile
+import time
+import numpy as np
+from benchmarks.bench_training_feed import write_records
+from streamlit_utils.measurement_store import MeasurementStore, build_measurements
+from streamlit_utils.measurements import measure_batch, measure_record
+
+# Usage: python -m benchmarks.bench_measurements
+# Records/s of the measurement engine on synthetic 10 s, 500 Hz, 12-lead records: one
+# record per call, batches of 64, and a catalog build (WFDB read + measure + SQLite)
+# in a process pool.
+
+N_RECORDS = 512
+
+
+def records_per_second(fn, n_records):
+    start = time.perf_counter()
+    fn()
+    return n_records / (time.perf_counter() - start)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    t = np.arange(5000) / 500
+    beats = np.sin(2 * np.pi * 1.2 * t) ** 63
+    signals = (beats[None, :, None] + 0.05 * rng.standard_normal((256, 5000, 12))).astype(np.float32)
+    measure_batch(signals[:4], 500)  # warm-up
+
+    print(f'single record    : {records_per_second(lambda: [measure_record(sig, 500) for sig in signals], len(signals)):8.0f} records/s')
+    print(f'batches of 64    : {records_per_second(lambda: [measure_batch(signals[i:i + 64], 500) for i in range(0, len(signals), 64)], len(signals)):8.0f} records/s')
+
+    with tempfile.TemporaryDirectory() as directory:
+        jobs = write_records(directory, N_RECORDS)
+        for workers in sorted({1, os.cpu_count() or 1}):
+            store = MeasurementStore(os.path.join(directory, f'measurements-{workers}.sqlite'))
+            rate = records_per_second(lambda: build_measurements(jobs, store, max_workers=workers, log=lambda message: None), len(jobs))
+            print(f'catalog, {workers:2d} proc : {rate:8.0f} records/s')
+        rate = records_per_second(lambda: build_measurements(jobs, store, log=lambda message: None), len(jobs))
+        print(f'catalog, cached  : {rate:8.0f} records/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import io
+import json
+import time
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+from streamlit.dataframe_util import convert_pandas_df_to_arrow_bytes
+from streamlit_utils.plotting import LEAD_NAMES, LEAD_ORDER, ecg_chart_data, ecg_chart_spec, get_renderer
+
+# Usage: python -m benchmarks.bench_renderers
+# Payload bytes sent to the browser and server CPU per render of one 5 s, 100 Hz ECG:
+# the original st.pyplot figure, the cached-grid PNG renderer and the Vega-Lite chart.
+
+
+def legacy_png(ecg):
+    fig, axes = plt.subplots(6, 2, figsize=(10, 12), sharex=True, sharey=True)
+    for subplot_idx, lead_idx in enumerate(LEAD_ORDER):
+        ax = axes.flatten()[subplot_idx]
+        ax.set_facecolor('#ffe6e6')
+        ax.plot(np.linspace(0, 5, ecg.shape[-1]), ecg[lead_idx], color='red', linewidth=1)
+        ax.set_title(LEAD_NAMES[lead_idx], loc='left', fontsize=10, fontweight='bold')
+        ax.grid(True, which='major', linestyle='-', linewidth=0.8, color='gray', alpha=0.7)
+        ax.set_yticks(np.arange(-2, 2.1, 0.5))
+        ax.set_xticks(np.arange(0, 5.2, 0.2))
+        ax.grid(True, which='minor', linestyle=':', linewidth=0.4, color='gray', alpha=0.4)
+        ax.set_yticks(np.arange(-2, 2.1, 0.1), minor=True)
+        ax.set_xticks(np.arange(0, 5.04, 0.04), minor=True)
+        ax.set_ylim(-2, 2)
+        ax.set_xlim(0, 5)
+    plt.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')  # what st.pyplot does
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def cached_grid_png(ecg):
+    return get_renderer(5.0).render_png(ecg)
+
+
+def vega_payload(ecg):
+    data = convert_pandas_df_to_arrow_bytes(ecg_chart_data(ecg, np.arange(ecg.shape[-1]) / 100))
+    return data + json.dumps(ecg_chart_spec(0, 5.0)).encode()
+
+
+def measure(fn, ecgs):
+    fn(ecgs[0])  # warm-up
+    start = time.process_time()
+    sizes = [len(fn(ecg)) for ecg in ecgs]
+    return (time.process_time() - start) / len(ecgs) * 1000, np.mean(sizes) / 1024
+
+
+def main(n=20):
+    rng = np.random.default_rng(0)
+    ecgs = (np.sin(np.linspace(0, 40, 500)) * 0.8 + 0.1 * rng.standard_normal((n, 12, 500))).astype(np.float32)
+    print(f'{"renderer":<18} {"cpu ms":>8} {"payload KB":>11}')
+    for name, fn in (('st.pyplot (old)', legacy_png), ('cached-grid PNG', cached_grid_png), ('Vega-Lite', vega_payload)):
+        cpu_ms, kb = measure(fn, ecgs[:5] if fn is legacy_png else ecgs)
+        print(f'{name:<18} {cpu_ms:>8.1f} {kb:>11.1f}')
+
+
+if __name__ == "__main__":
+    main()
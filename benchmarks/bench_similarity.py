@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+import time
+import numpy as np
+from streamlit_utils.app_utils import WTD_CODES
+from streamlit_utils.similarity import EMBEDDING_DIM, INDEX_FILE, SIMILARITY_VERSION, Projection, SimilarityIndex, features
+
+# Usage: python -m benchmarks.bench_similarity
+# Latency of "Find similar ECGs" queries on a synthetic index of N_ROWS records (random
+# unit embeddings, ~3% of records per label): unfiltered, filtered by one label and by
+# two labels at once, plus embedding a record that is not in the index.
+
+N_ROWS = 300000
+N_QUERIES = 50
+K = 10
+
+
+def synthetic_ecgs(n, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(500) / 100
+    rate = rng.uniform(0.8, 2.0, n)
+    beats = np.sin(np.pi * rate[:, None] * t) ** 40
+    return (beats[:, None, :] * rng.uniform(0.5, 1.5, (n, 12, 1)) + 0.05 * rng.standard_normal((n, 12, 500))).astype(np.float32)
+
+
+def write_index(directory, n_rows=N_ROWS, dim=EMBEDDING_DIM, codes=WTD_CODES, seed=0):
+    """A similarity index directory with random embeddings and labels; the projection is fitted for real."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    projection = Projection.fit(features(synthetic_ecgs(2000, seed)), dim)
+    projection.save(os.path.join(directory, 'projection.npz'))
+    embeddings = np.lib.format.open_memmap(os.path.join(directory, 'embeddings.npy'), mode='w+',
+                                           dtype=np.float32, shape=(n_rows, dim))
+    for start in range(0, n_rows, 65536):
+        block = rng.standard_normal((min(65536, n_rows - start), dim)).astype(np.float32)
+        embeddings[start:start + len(block)] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    embeddings.flush()
+    flags = rng.random((n_rows, len(codes))) < 0.03
+    np.save(os.path.join(directory, 'bits.npy'), np.packbits(flags, axis=1, bitorder='little').T.copy())
+    np.save(os.path.join(directory, 'ids.npy'), np.array([f'JS{ix:06d}' for ix in range(n_rows)]))
+    with open(os.path.join(directory, INDEX_FILE), 'w') as f:
+        json.dump({'version': SIMILARITY_VERSION, 'dataset': 'wtd', 'codes': list(codes), 'n': n_rows, 'dim': dim}, f)
+    return directory
+
+
+def query_ms(index, queries, **kwargs):
+    index.search(queries[0], K, **kwargs)  # warm-up: page in the embeddings
+    start = time.perf_counter()
+    for vector in queries:
+        index.search(vector, K, **kwargs)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        index = SimilarityIndex(write_index(os.path.join(directory, 'x.similarity')))
+        queries = np.asarray(index.embeddings[np.random.default_rng(1).choice(len(index), N_QUERIES)])
+        print(f'{len(index)} records, {index.embeddings.shape[1]} dimensions, k={K}')
+        print(f'unfiltered          : {query_ms(index, queries):7.2f} ms/query')
+        print(f'any of 1 label      : {query_ms(index, queries, codes=index.codes[:1]):7.2f} ms/query')
+        print(f'all of 2 labels     : {query_ms(index, queries, codes=index.codes[:2], require_all=True):7.2f} ms/query')
+        ecgs = synthetic_ecgs(N_QUERIES, seed=2)
+        start = time.perf_counter()
+        for ecg in ecgs:
+            index.embed(ecg)
+        print(f'embed one record    : {(time.perf_counter() - start) / len(ecgs) * 1000:7.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
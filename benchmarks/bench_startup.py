@@ -0,0 +1,49 @@
+import json
+import subprocess
+import sys
+
+# Usage: python -m benchmarks.bench_startup
+# Cold start of each app in a fresh interpreter: module import time (on top of streamlit
+# itself) and the latency of the first script run through streamlit's AppTest harness.
+APPS = ['app_evaluator.py', 'app_uploader.py', 'eval_wtd.py', 'eval_mimic.PY', 'eval_dashboard.py']
+
+PROBE = '''
+import importlib.machinery, importlib.util, json, sys, time
+import streamlit
+from streamlit.testing.v1 import AppTest
+path = sys.argv[1]
+start = time.perf_counter()
+loader = importlib.machinery.SourceFileLoader('bench_app', path)
+module = importlib.util.module_from_spec(importlib.util.spec_from_loader('bench_app', loader))
+loader.exec_module(module)
+import_ms = (time.perf_counter() - start) * 1000
+modules = len(sys.modules)
+start = time.perf_counter()
+app = AppTest.from_file(path, default_timeout=60).run()
+render_ms = (time.perf_counter() - start) * 1000
+errors = [str(e.value).splitlines()[0] for e in app.exception]
+print(json.dumps({'import_ms': import_ms, 'render_ms': render_ms, 'modules': modules, 'errors': errors}))
+'''
+
+
+def probe(path):
+    out = subprocess.run([sys.executable, '-c', PROBE, path], capture_output=True, text=True)
+    lines = [line for line in out.stdout.splitlines() if line.startswith('{')]
+    if not lines:
+        return {'error': (out.stderr.strip().splitlines() or ['no output'])[-1]}
+    return json.loads(lines[-1])
+
+
+def main():
+    print(f'{"app":<20} {"import ms":>10} {"first run ms":>13} {"modules":>8}')
+    for path in APPS:
+        result = probe(path)
+        if 'error' in result:
+            print(f'{path:<20} failed: {result["error"]}')
+            continue
+        note = f'  ({result["errors"][0][:60]})' if result['errors'] else ''
+        print(f'{path:<20} {result["import_ms"]:>10.0f} {result["render_ms"]:>13.0f} {result["modules"]:>8}{note}')
+
+
+if __name__ == "__main__":
+    main()
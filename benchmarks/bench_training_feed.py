@@ -0,0 +1,64 @@
+import os
+import tempfile
+import time
+import numpy as np
+from streamlit_utils.app_utils import WTD_CODES
+from streamlit_utils.augment import augmented_view
+from streamlit_utils.training_feed import TrainingFeed, padded_window
+
+# Usage: python -m benchmarks.bench_training_feed
+# Samples/second of the training feed against worker count on synthetic 10 s, 500 Hz,
+# 12-lead WFDB records with every augmentation enabled, next to a single-process loop
+# calling augmented_view one record at a time (what the viewers do).
+
+N_RECORDS = 1024
+BATCH_SIZE = 64
+WORKERS = (1, 2, 4, 8)
+PARAMS = dict(scale_range=(0.8, 1.2), shift_range=(-0.1, 0.1), sigma_range=(0.0, 0.05),
+              max_stretch=0.1, dropout_p=0.1)
+
+
+def write_records(directory, n_records=N_RECORDS, seconds=10, fs=500, seed=0):
+    import wfdb
+
+    rng = np.random.default_rng(seed)
+    t = np.arange(seconds * fs) / fs
+    beats = np.sin(2 * np.pi * 1.2 * t) ** 63
+    jobs = []
+    for ix in range(n_records):
+        signal = beats[:, None] + 0.05 * rng.standard_normal((len(t), 12))
+        name = f'rec{ix:05d}'
+        dx = ','.join(rng.choice(WTD_CODES, size=2, replace=False))
+        wfdb.wrsamp(name, fs=fs, units=['mV'] * 12, sig_name=[f'L{lead}' for lead in range(12)],
+                    p_signal=signal, fmt=['16'] * 12, comments=[f'Dx: {dx}'], write_dir=directory)
+        jobs.append((name, os.path.join(directory, name)))
+    return jobs
+
+
+def single_process(jobs):
+    rng = np.random.default_rng(0)
+    start = time.perf_counter()
+    for _, record_path in jobs:
+        window, fs, _ = padded_window(record_path, 5 * 1.1)
+        augmented_view(window, fs, rng, **PARAMS)
+    return len(jobs) / (time.perf_counter() - start)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        jobs = write_records(directory)
+        print(f'{"workers":>8} {"samples/s":>10} {"wait":>6}')
+        print(f'{"inline":>8} {single_process(jobs):10.0f} {"-":>6}')
+        for n_workers in WORKERS:
+            with TrainingFeed(jobs, 'wtd', BATCH_SIZE, PARAMS, n_workers=n_workers) as feed:
+                for _ in feed:  # warm-up epoch: process start, page cache
+                    pass
+                feed.reset_stats()
+                for batch in feed:
+                    batch.x.sum()  # touch the batch like a consumer would
+                stats = feed.stats()
+            print(f'{n_workers:>8} {stats["samples_per_second"]:10.0f} {stats["wait_fraction"]:6.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+import copy
+import threading
+import time
+
+# In-memory stand-in for the parts of the Firestore client the apps use (documents, write
+# batches, projected/ordered/paged queries), so benchmarks run offline. `latency` seconds
+# are slept per RPC (get, stream, commit) to model a network round trip.
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return copy.copy(self._data) if self._data is not None else None
+
+
+class FakeDocument:
+    def __init__(self, client, collection, doc_id):
+        self.client = client
+        self.collection = collection
+        self.id = doc_id
+
+    def get(self):
+        self.client._rpc()
+        with self.client._lock:
+            data = self.client._collection(self.collection).get(self.id)
+            self.client.reads += data is not None
+            return FakeSnapshot(self.id, copy.copy(data))
+
+    def set(self, fields, merge=False):
+        batch = self.client.batch()
+        batch.set(self, fields, merge)
+        batch.commit()
+
+
+class FakeQuery:
+    def __init__(self, client, collection, fields=None, order=None, limit=None, after=None):
+        self.client = client
+        self.collection = collection
+        self._fields = fields
+        self._order = order
+        self._limit = limit
+        self._after = after
+
+    def _replace(self, **changes):
+        state = dict(fields=self._fields, order=self._order, limit=self._limit, after=self._after)
+        state.update(changes)
+        return FakeQuery(self.client, self.collection, **state)
+
+    def select(self, fields):
+        return self._replace(fields=list(fields))
+
+    def order_by(self, field):
+        return self._replace(order=field)
+
+    def limit(self, n):
+        return self._replace(limit=n)
+
+    def start_after(self, snapshot):
+        return self._replace(after=snapshot)
+
+    def _key(self, doc_id, data):
+        return doc_id if self._order in (None, '__name__') else (data.get(self._order), doc_id)
+
+    def stream(self):
+        self.client._rpc()
+        with self.client._lock:
+            items = sorted(self.client._collection(self.collection).items(), key=lambda item: self._key(*item))
+            if self._after is not None:
+                boundary = self._key(self._after.id, self._after._data or {})
+                items = [item for item in items if self._key(*item) > boundary]
+            items = items[:self._limit] if self._limit is not None else items
+            self.client.reads += len(items)
+            for doc_id, data in items:
+                if self._fields is not None:
+                    data = {key: data[key] for key in self._fields if key in data}
+                yield FakeSnapshot(doc_id, copy.copy(data))
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, client, name):
+        super().__init__(client, name)
+
+    def document(self, doc_id):
+        return FakeDocument(self.client, self.collection, doc_id)
+
+
+class FakeBatch:
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+
+    def set(self, ref, fields, merge=False):
+        self.writes.append((ref.collection, ref.id, dict(fields), merge))
+
+    def commit(self):
+        if len(self.writes) > 500:
+            raise ValueError('maximum 500 writes allowed per request')
+        self.client._rpc()
+        with self.client._lock:
+            for collection, doc_id, fields, merge in self.writes:
+                docs = self.client._collection(collection)
+                docs[doc_id] = {**docs[doc_id], **fields} if merge and doc_id in docs else fields
+            self.client.writes += len(self.writes)
+            self.client.commits += 1
+
+
+class FakeFirestore:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.data = {}
+        self.reads = 0
+        self.writes = 0
+        self.commits = 0
+        self._lock = threading.Lock()
+
+    def _rpc(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _collection(self, name):
+        return self.data.setdefault(name, {})
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
@@ -0,0 +1,478 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from streamlit_utils.app_utils import MIMIC_CODES, WTD_CODES
+
+# Usage: python -m benchmarks.run_all [--output results.json] [--baseline baseline.json]
+#                                     [--only csv,render] [--threshold 0.25]
+# Every hot path of the apps timed separately, offline: synthetic WFDB records and
+# catalog CSVs in a temp dir, and benchmarks.fake_firestore in place of Firestore.
+# Results are per-item milliseconds (median of repeated runs) written as JSON; with
+# --baseline, stages slower than the baseline by more than --threshold are listed and
+# the exit status is 1.
+
+N_RECORDS = 32
+N_WTD_ROWS = 45000
+N_MIMIC_ROWS = 100000
+N_LOOKUPS = 1000
+N_DOCS = 1000
+N_SIMILARITY_ROWS = 100000
+STAGES = []
+
+
+def stage(name, items=1):
+    """Register `setup(fixture) -> fn`; fn() is timed and the result divided by `items`."""
+    def register(setup):
+        STAGES.append((name, items, setup))
+        return setup
+    return register
+
+
+class Fixture:
+    """Synthetic 10 s, 500 Hz, 12-lead WFDB records and WTD/MIMIC catalogs in `directory`."""
+
+    def __init__(self, directory, n_records=N_RECORDS, seed=0):
+        import pandas as pd
+        import wfdb
+
+        self.directory = directory
+        self.rng = np.random.default_rng(seed)
+        self.fs = 500
+        t = np.arange(10 * self.fs) / self.fs
+        beats = np.sin(2 * np.pi * 1.2 * t) ** 63
+        self.record_paths = []
+        self.dx_strings = []
+        for ix in range(n_records):
+            name = f'JS{ix:05d}'
+            dx = 'Dx: ' + ','.join(self.rng.choice(WTD_CODES, size=self.rng.integers(1, 5), replace=False))
+            signal = beats[:, None] + 0.05 * self.rng.standard_normal((len(t), 12))
+            wfdb.wrsamp(name, fs=self.fs, units=['mV'] * 12, sig_name=[f'L{lead}' for lead in range(12)],
+                        p_signal=signal, fmt=['16'] * 12, comments=['Age: 60', dx], write_dir=directory)
+            self.record_paths.append(os.path.join(directory, name))
+            self.dx_strings.append(dx)
+        self.p_signal = wfdb.rdrecord(self.record_paths[0]).p_signal.astype(np.float32) # type: ignore
+        self.ecg = (np.sin(np.linspace(0, 40, 500)) * 0.8 + 0.1 * self.rng.standard_normal((12, 500))).astype(np.float32)
+
+        names = [os.path.basename(path) for path in self.record_paths]
+        self.wtd_ids = [f'JS{ix:05d}' for ix in range(N_WTD_ROWS)]
+        wtd = pd.DataFrame({'patient_id': self.wtd_ids,
+                            'record_path': [names[ix % n_records] for ix in range(N_WTD_ROWS)],
+                            'dataset': 'cpsc_2018'})
+        flags = (self.rng.random((N_WTD_ROWS, len(WTD_CODES))) < 0.03).astype(np.uint8)
+        wtd = pd.concat([wtd, pd.DataFrame(flags, columns=[f'g2_{code}' for code in WTD_CODES])], axis=1)
+        self.wtd_csv = os.path.join(directory, 'wtd.csv')
+        wtd.to_csv(self.wtd_csv, index=False)
+
+        self.study_ids = np.arange(40000000, 40000000 + N_MIMIC_ROWS)
+        self.mimic_records_csv = os.path.join(directory, 'record_list.csv')
+        pd.DataFrame({'study_id': self.study_ids,
+                      'path': [names[ix % n_records] for ix in range(N_MIMIC_ROWS)]}).to_csv(self.mimic_records_csv, index=False)
+        labels = pd.DataFrame((self.rng.random((N_MIMIC_ROWS, len(MIMIC_CODES))) < 0.05).astype(np.uint8), columns=list(MIMIC_CODES))
+        labels.insert(0, 'study_id', self.study_ids)
+        self.mimic_labels_csv = os.path.join(directory, 'mimic_labels.csv')
+        labels.to_csv(self.mimic_labels_csv, index=False)
+        self.mimic_rows = labels.drop(columns=['study_id']).iloc[:N_LOOKUPS].to_dict(orient='records')
+
+    def cycle(self, items):
+        # Each call of the returned function gets the next item, round robin
+        state = {'ix': 0}
+
+        def next_item():
+            item = items[state['ix'] % len(items)]
+            state['ix'] += 1
+            return item
+        return next_item
+
+
+# --- catalog CSVs -------------------------------------------------------------------
+
+@stage('csv.wtd_load')
+def _wtd_load(fx):
+    from streamlit_utils.record_index import load_wtd_table
+
+    def run():
+        load_wtd_table.cache_clear()
+        load_wtd_table(fx.wtd_csv)
+    return run
+
+
+@stage('csv.wtd_lookup', items=N_LOOKUPS)
+def _wtd_lookup(fx):
+    from streamlit_utils.record_index import wtd_record_path
+
+    ids = list(fx.rng.choice(fx.wtd_ids, N_LOOKUPS))
+    wtd_record_path(ids[0], fx.wtd_csv)  # table load is the previous stage
+    return lambda: [wtd_record_path(pid, fx.wtd_csv) for pid in ids]
+
+
+@stage('csv.wtd_lookup_store', items=N_LOOKUPS)
+def _wtd_lookup_store(fx):
+    import shutil
+    from streamlit_utils.label_store import convert_csv
+    from streamlit_utils.record_index import wtd_record_path
+
+    # A converted copy, so the other csv stages keep timing the CSV path
+    csv_path = os.path.join(fx.directory, 'wtd_store.csv')
+    shutil.copy(fx.wtd_csv, csv_path)
+    convert_csv(csv_path)
+    ids = list(fx.rng.choice(fx.wtd_ids, N_LOOKUPS))
+    return lambda: [wtd_record_path(pid, csv_path) for pid in ids]
+
+
+@stage('csv.mimic_load')
+def _mimic_load(fx):
+    from streamlit_utils.record_index import load_mimic_labels, load_mimic_records
+
+    def run():
+        load_mimic_records.cache_clear()
+        load_mimic_labels.cache_clear()
+        load_mimic_records(fx.mimic_records_csv)
+        load_mimic_labels(fx.mimic_labels_csv)
+    return run
+
+
+@stage('csv.mimic_lookup', items=N_LOOKUPS)
+def _mimic_lookup(fx):
+    from streamlit_utils.record_index import mimic_label_row, mimic_record_path
+
+    ids = list(fx.rng.choice(fx.study_ids, N_LOOKUPS))
+    return lambda: [(mimic_record_path(sid, fx.mimic_records_csv), mimic_label_row(sid, fx.mimic_labels_csv)) for sid in ids]
+
+
+# --- record reads and preprocessing ---------------------------------------------------
+
+@stage('wfdb.rdrecord')
+def _rdrecord(fx):
+    import wfdb
+
+    next_path = fx.cycle(fx.record_paths)
+    return lambda: wfdb.rdrecord(next_path())
+
+
+@stage('wfdb.signal_window')
+def _signal_window(fx):
+    from streamlit_utils.preprocessing import DURATION
+    from streamlit_utils.wfdb_reader import WFDBSignal
+
+    next_path = fx.cycle(fx.record_paths)
+    return lambda: WFDBSignal(next_path()).window(0, int(DURATION * fx.fs), range(12))
+
+
+@stage('wfdb.shared_cache_hit')
+def _shared_cache_hit(fx):
+    from streamlit_utils.record_cache import RecordCache, SharedRecordStore
+
+    # What another app process pays for a window one process has decoded: no private LRU
+    shared = SharedRecordStore(os.path.join(fx.directory, 'record_cache'))
+    RecordCache(shared=shared).get(fx.record_paths[0])
+    cache = RecordCache(max_bytes=0, shared=shared)
+    return lambda: cache.get(fx.record_paths[0])
+
+
+@stage('preprocess.legacy_loop')
+def _legacy_loop(fx):
+    from benchmarks.bench_preprocessing import legacy_preprocess
+
+    sig_name = [f'L{lead}' for lead in range(12)]
+    return lambda: legacy_preprocess(fx.p_signal, fx.fs, sig_name)
+
+
+@stage('preprocess.downsample')
+def _downsample(fx):
+    from streamlit_utils.preprocessing import preprocess_signal
+
+    return lambda: preprocess_signal(fx.p_signal, fx.fs)
+
+
+def _augment_stage(name, **params):
+    @stage(f'augment.{name}')
+    def setup(fx):
+        from streamlit_utils.augment import augment_window
+
+        rng = np.random.default_rng(0)
+        return lambda: augment_window(fx.p_signal, fx.fs, rng, **params)
+
+
+_augment_stage('scale', scale_range=(0.9, 1.1))
+_augment_stage('shift', shift_range=(-0.5, 0.5))
+_augment_stage('gaussian_noise', sigma_range=(0.0, 0.2))
+_augment_stage('time_warp', max_stretch=0.2)
+_augment_stage('lead_dropout', dropout_p=0.1)
+_augment_stage('all', scale_range=(0.9, 1.1), shift_range=(-0.5, 0.5), sigma_range=(0.0, 0.2),
+               max_stretch=0.2, dropout_p=0.1)
+
+
+@stage('measure.record')
+def _measure_record(fx):
+    from streamlit_utils.measurements import measure_record
+
+    return lambda: measure_record(fx.p_signal, fx.fs)
+
+
+@stage('measure.batch', items=N_RECORDS)
+def _measure_batch(fx):
+    from streamlit_utils.measurements import measure_batch
+
+    signals = np.stack([fx.p_signal] * N_RECORDS)
+    return lambda: measure_batch(signals, fx.fs)
+
+
+# --- similar ECGs ---------------------------------------------------------------------
+
+@stage('similarity.embed', items=N_RECORDS)
+def _similarity_embed(fx):
+    from benchmarks.bench_similarity import synthetic_ecgs
+    from streamlit_utils.similarity import Projection, features
+
+    ecgs = synthetic_ecgs(N_RECORDS)
+    projection = Projection.fit(features(synthetic_ecgs(1000, seed=1)))
+    return lambda: projection.transform(features(ecgs))
+
+
+def _similarity_index(fx):
+    # One synthetic index shared by the query stages
+    from benchmarks.bench_similarity import write_index
+    from streamlit_utils.similarity import SimilarityIndex
+
+    if not hasattr(fx, 'similarity_index'):
+        fx.similarity_index = SimilarityIndex(write_index(os.path.join(fx.directory, 'x.similarity'), n_rows=N_SIMILARITY_ROWS))
+    return fx.similarity_index
+
+
+@stage('similarity.query')
+def _similarity_query(fx):
+    index = _similarity_index(fx)
+    next_row = fx.cycle(range(len(index)))
+    return lambda: index.similar(index.ids[next_row()], k=10)
+
+
+@stage('similarity.query_filtered')
+def _similarity_query_filtered(fx):
+    index = _similarity_index(fx)
+    next_row = fx.cycle(range(len(index)))
+    return lambda: index.similar(index.ids[next_row()], k=10, codes=index.codes[:1])
+
+
+# --- labels and signal serialization --------------------------------------------------
+
+@stage('labels.wtd_label_finder', items=N_LOOKUPS)
+def _wtd_label_finder(fx):
+    from streamlit_utils.app_utils import wtd_label_finder
+
+    dx_strings = [fx.dx_strings[ix % len(fx.dx_strings)] for ix in range(N_LOOKUPS)]
+    return lambda: [wtd_label_finder(dxs) for dxs in dx_strings]
+
+
+@stage('labels.wtd_multi_hot', items=N_LOOKUPS)
+def _wtd_multi_hot(fx):
+    from streamlit_utils.app_utils import wtd_multi_hot
+
+    dx_strings = [fx.dx_strings[ix % len(fx.dx_strings)] for ix in range(N_LOOKUPS)]
+    return lambda: wtd_multi_hot(dx_strings)
+
+
+@stage('labels.mimic_label_finder', items=N_LOOKUPS)
+def _mimic_label_finder(fx):
+    from streamlit_utils.app_utils import mimic_label_finder
+
+    return lambda: [mimic_label_finder(row) for row in fx.mimic_rows]
+
+
+@stage('codec.signals_flat_encode')
+def _flat_encode(fx):
+    return lambda: {'signals_flat': fx.ecg.flatten().tolist()}
+
+
+@stage('codec.signals_flat_decode')
+def _flat_decode(fx):
+    from streamlit_utils.signal_codec import decode_signal
+
+    doc = {'signals_flat': fx.ecg.flatten().tolist()}
+    return lambda: decode_signal(doc)
+
+
+@stage('codec.blob_encode')
+def _blob_encode(fx):
+    from streamlit_utils.signal_codec import encode_signal
+
+    return lambda: encode_signal(fx.ecg)
+
+
+@stage('codec.blob_decode')
+def _blob_decode(fx):
+    from streamlit_utils.signal_codec import decode_signal, encode_signal
+
+    doc = encode_signal(fx.ecg)
+    return lambda: decode_signal(doc)
+
+
+# --- rendering ------------------------------------------------------------------------
+
+@stage('render.legacy_pyplot_png')
+def _legacy_png(fx):
+    from benchmarks.bench_renderers import legacy_png
+
+    return lambda: legacy_png(fx.ecg)
+
+
+@stage('render.cached_grid_png')
+def _grid_png(fx):
+    from streamlit_utils.plotting import get_renderer
+
+    renderer = get_renderer(5.0)  # figure and grid built once per process, like the app
+    return lambda: renderer.render_png(fx.ecg)
+
+
+@stage('render.vega_payload')
+def _vega_payload(fx):
+    from benchmarks.bench_renderers import vega_payload
+
+    return lambda: vega_payload(fx.ecg)
+
+
+# --- Firestore paths (fake client) ----------------------------------------------------
+
+@stage('firestore.ingest', items=N_DOCS)
+def _ingest(fx):
+    from benchmarks.fake_firestore import FakeFirestore
+    from streamlit_utils.ingest import ingest
+    from streamlit_utils.signal_codec import encode_signal
+
+    jobs = [(f'doc{ix:05d}', ix) for ix in range(N_DOCS)]
+
+    def build_doc(ix):
+        return {**encode_signal(fx.ecg), 'label_list': ['sinus rhythm'], 'eval': False}
+    return lambda: ingest(FakeFirestore(), jobs, 'ecg_data_ste', build_doc, log=lambda message: None)
+
+
+@stage('firestore.listing', items=N_DOCS)
+def _listing(fx):
+    from benchmarks.fake_firestore import FakeFirestore
+    from streamlit_utils.ecg_listing import ECGListing
+    from streamlit_utils.signal_codec import encode_signal
+
+    db = FakeFirestore()
+    batch = db.batch()
+    for ix in range(N_DOCS):
+        if len(batch.writes) == 500:
+            batch.commit()
+            batch = db.batch()
+        batch.set(db.collection('ecg_data_ste').document(f'doc{ix:05d}'),
+                  {**encode_signal(fx.ecg), 'label_list': ['sinus rhythm'], 'eval': False})
+    batch.commit()
+    return lambda: ECGListing(db, 'ecg_data_ste').refresh(full=True)
+
+
+@stage('firestore.get_record')
+def _get_record(fx):
+    from benchmarks.fake_firestore import FakeFirestore
+    from streamlit_utils.signal_codec import decode_signal, encode_signal
+
+    db = FakeFirestore()
+    db.collection('ecg_data_ste').document('doc').set({**encode_signal(fx.ecg), 'eval': False})
+    return lambda: decode_signal(db.collection('ecg_data_ste').document('doc').get().to_dict())
+
+
+def measure(fn, items=1, min_time=0.2, max_repeat=200):
+    """Median, min and max per-item milliseconds over repeated calls (after one warm-up)."""
+    fn()
+    times = []
+    deadline = time.perf_counter() + min_time
+    while not times or (time.perf_counter() < deadline and len(times) < max_repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000 / items)
+    return {'median_ms': statistics.median(times), 'min_ms': min(times), 'max_ms': max(times),
+            'repeat': len(times), 'items': items}
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'numpy': np.__version__,
+            'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def run(only=None, min_time=0.2, log=print):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        fx = Fixture(directory)
+        for name, items, setup in STAGES:
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            results[name] = measure(setup(fx), items, min_time)
+            log(f'{name:<30} {results[name]["median_ms"]:10.3f} ms')
+    return {'environment': environment(), 'stages': results}
+
+
+def compare(results, baseline, threshold=0.25):
+    """Rows (stage, baseline ms, current ms, ratio, verdict) and the regressed stage names."""
+    rows = []
+    regressions = []
+    for name in sorted(set(results['stages']) | set(baseline['stages'])):
+        current = results['stages'].get(name)
+        before = baseline['stages'].get(name)
+        if current is None or before is None:
+            rows.append((name, before and before['median_ms'], current and current['median_ms'], None,
+                         'new' if before is None else 'missing'))
+            continue
+        ratio = current['median_ms'] / before['median_ms'] if before['median_ms'] else float('inf')
+        if ratio > 1 + threshold:
+            verdict = 'SLOWER'
+            regressions.append(name)
+        elif ratio < 1 / (1 + threshold):
+            verdict = 'faster'
+        else:
+            verdict = ''
+        rows.append((name, before['median_ms'], current['median_ms'], ratio, verdict))
+    return rows, regressions
+
+
+def _ms(value):
+    return f'{value:12.3f}' if value is not None else f'{"-":>12}'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time every hot path of the apps on synthetic data.')
+    parser.add_argument('--output', help='write results as JSON to this path')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='slowdown ratio above 1 counted as a regression')
+    parser.add_argument('--only', help='comma-separated stage name prefixes, e.g. csv,render')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds spent repeating each stage')
+    args = parser.parse_args(argv)
+
+    only = [prefix.strip() for prefix in args.only.split(',')] if args.only else None
+    results = run(only, args.min_time)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if only:
+            baseline['stages'] = {name: value for name, value in baseline['stages'].items()
+                                  if any(name.startswith(prefix) for prefix in only)}
+        rows, regressions = compare(results, baseline, args.threshold)
+        print(f'\nagainst {args.baseline} (commit {baseline["environment"].get("commit")})')
+        print(f'{"stage":<30} {"baseline ms":>12} {"current ms":>12} {"ratio":>7}')
+        for name, before, current, ratio, verdict in rows:
+            print(f'{name:<30} {_ms(before)} {_ms(current)} {f"{ratio:7.2f}" if ratio else "":>7} {verdict}')
+        if regressions:
+            print(f'{len(regressions)} regression(s) beyond {args.threshold:.0%}: {", ".join(regressions)}')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,13 @@
+import sys
+import time
+from streamlit_utils.label_store import convert_csv
+from streamlit_utils.record_index import WTD_CSV, MIMIC_RECORDS_CSV, MIMIC_LABELS_CSV
+
+# Usage: python build_label_store.py [csv ...]
+# Converts the label/metadata CSVs once; the apps then pick up the .store directories automatically.
+csv_paths = sys.argv[1:] or [WTD_CSV, MIMIC_RECORDS_CSV, MIMIC_LABELS_CSV]
+
+for csv_path in csv_paths:
+    start = time.perf_counter()
+    out_dir = convert_csv(csv_path)
+    print(f'{csv_path} -> {out_dir} ({time.perf_counter() - start:.1f}s)')
@@ -0,0 +1,37 @@
+import argparse
+import time
+from precompute_shards import CATALOGS
+from streamlit_utils.shard_store import open_shards, shard_path
+from streamlit_utils.similarity import EMBEDDING_DIM, FIT_RECORDS, build_similarity, similarity_path
+
+# Usage: python build_similarity_index.py wtd [--workers 16] [--dim 64]
+#        python build_similarity_index.py mimic
+# Embeds every record of the catalog's shards (run precompute_shards.py first) into
+# ./wtd/5_wtd_10seconds.similarity (or ./mimic/record_list.similarity) for the viewers'
+# "Similar ECGs" panel. Rerun after the shards change; the whole index is rebuilt.
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('dataset', choices=sorted(CATALOGS))
+    parser.add_argument('--csv', default=None, help='catalog CSV (default: the one the apps use)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--dim', type=int, default=EMBEDDING_DIM, help='embedding dimensions')
+    parser.add_argument('--fit-records', type=int, default=FIT_RECORDS, help='records sampled to fit the projection')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    csv_path = args.csv or CATALOGS[args.dataset][0]
+    if open_shards(csv_path) is None:
+        parser.error(f'no shards at {shard_path(csv_path)}; run precompute_shards.py {args.dataset} first')
+
+    start = time.perf_counter()
+    report = build_similarity(shard_path(csv_path), similarity_path(csv_path), dim=args.dim,
+                              fit_records=args.fit_records, max_workers=args.workers, seed=args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"{report['total']} records embedded in {report['dim']} dimensions in {elapsed:.1f}s "
+          f"({report['total'] / max(elapsed, 1e-9):.0f} records/s)")
+
+
+if __name__ == "__main__":
+    main()
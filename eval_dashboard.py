@@ -0,0 +1,73 @@
+import streamlit as st
+from streamlit_utils.bootstrap import firestore_client
+from streamlit_utils.eval_stats import EvalTable, progress_counts, read_counters, rebuild_counters, star_table
+from streamlit_utils.agreement import fleiss_kappa, pairwise_cohen, rating_matrix
+
+STAR_SCALE = range(5)  # st.feedback('stars') values, shown as 1-5
+
+# Incrementally refreshed projection of eval_data shared by all sessions
+@st.cache_resource
+def get_eval_table():
+    return EvalTable(firestore_client())
+
+# Aggregation queries and the counters document are cheap, but not free: cache briefly
+@st.cache_data(ttl=30)
+def get_progress():
+    return progress_counts(firestore_client())
+
+@st.cache_data(ttl=30)
+def get_counters():
+    return read_counters(firestore_client())
+
+def main():
+    st.set_page_config(page_title="ECG Evaluation Dashboard", page_icon="📊")
+    st.title("📊 Evaluation progress")
+
+    if st.sidebar.button('🔄 Refresh now'):
+        get_progress.clear()
+        get_counters.clear()
+    weights = st.sidebar.selectbox('Kappa weights', [None, 'linear', 'quadratic'],
+                                   format_func=lambda w: 'unweighted' if w is None else w)
+
+    progress = get_progress()
+    done_col, evals_col, pct_col = st.columns(3)
+    done_col.metric('Records evaluated', f"{progress['evaluated']} / {progress['records']}")
+    evals_col.metric('Evaluations', progress['evaluations'])
+    pct_col.metric('Progress', f"{progress['evaluated'] / max(progress['records'], 1):.1%}")
+    st.progress(progress['evaluated'] / max(progress['records'], 1))
+
+    st.subheader('Stars per reviewer')
+    counters = get_counters()
+    if counters.get('stars'):
+        stars = star_table(counters)
+        st.bar_chart(stars)
+        st.dataframe(stars.assign(total=stars.sum(axis=1)))
+    else:
+        st.info('No counters yet; they are filled by new submissions (or rebuilt below).')
+
+    st.subheader('Inter-rater agreement')
+    table = get_eval_table()
+    table.refresh()
+    ratings, records, raters, _ = rating_matrix(table.frame(), categories=STAR_SCALE)
+    multi = int(((ratings >= 0).sum(axis=1) >= 2).sum())
+    st.caption(f'{len(records)} rated records, {len(raters)} reviewers, {multi} records rated by 2 or more')
+    if multi:
+        st.metric("Fleiss' kappa", f'{fleiss_kappa(ratings, len(STAR_SCALE)):.3f}')
+        kappa, shared = pairwise_cohen(ratings, raters, len(STAR_SCALE), weights)
+        st.write("Cohen's kappa per reviewer pair")
+        st.dataframe(kappa.style.format('{:.3f}', na_rep='-'))
+        st.write('Records rated by both reviewers')
+        st.dataframe(shared)
+    else:
+        st.info('Agreement needs records evaluated by at least two reviewers.')
+
+    with st.expander("Maintenance"):
+        st.write('Recompute the star counters from a full (projected) scan of eval_data, '
+                 'e.g. to include evaluations submitted before the counters existed.')
+        if st.button('Rebuild counters'):
+            rebuild_counters(firestore_client())
+            get_counters.clear()
+            st.rerun()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import argparse
+import time
+from precompute_shards import BASE_PATHS, CATALOGS
+from streamlit_utils.measurement_store import CHUNK_RECORDS, build_measurements, measurement_path, open_measurements
+
+# Usage: python measure_catalog.py wtd [--base-path DIR] [--workers 16] [--rebuild]
+#        python measure_catalog.py mimic [--base-path DIR] [--export mimic_measurements.csv]
+# Measures heart rate, RR variability and QRS/PR/QT of every catalog record into
+# ./wtd/5_wtd_10seconds.measurements.sqlite (or ./mimic/record_list.measurements.sqlite);
+# reruns only redo records whose files changed.
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('dataset', choices=sorted(CATALOGS))
+    parser.add_argument('--base-path', default=None, help='directory the catalog record paths are relative to')
+    parser.add_argument('--csv', default=None, help='catalog CSV (default: the one the apps use)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--chunk', type=int, default=CHUNK_RECORDS, help='records measured per worker task')
+    parser.add_argument('--limit', type=int, default=None, help='only the first N catalog records')
+    parser.add_argument('--rebuild', action='store_true', help='re-measure every record')
+    parser.add_argument('--export', default=None, help='also write every measurement to this CSV')
+    args = parser.parse_args()
+
+    default_csv, make_jobs = CATALOGS[args.dataset]
+    csv_path = args.csv or default_csv
+    jobs = make_jobs(args.base_path or BASE_PATHS[args.dataset], csv_path)[:args.limit]
+    store = open_measurements(csv_path)
+    if store is None:
+        parser.error(f'cannot write {measurement_path(csv_path)}')
+
+    start = time.perf_counter()
+    report = build_measurements(jobs, store, max_workers=args.workers, chunk_records=args.chunk, rebuild=args.rebuild)
+    elapsed = time.perf_counter() - start
+    print(f"{report['written']} measured, {report['skipped']} up to date, {len(report['errors'])} failed "
+          f"in {elapsed:.1f}s ({report['written'] / max(elapsed, 1e-9):.0f} records/s)")
+    for record_id, error in report['errors']:
+        print(f'failed {record_id}: {error}')
+    if args.export:
+        store.frame().to_csv(args.export)
+        print(f'wrote {len(store)} records to {args.export}')
+
+
+if __name__ == "__main__":
+    main()
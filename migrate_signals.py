@@ -0,0 +1,43 @@
+import argparse
+import time
+from firebase_admin import firestore
+from streamlit_utils.firestore_utils import init_firestore
+from streamlit_utils.signal_codec import CODECS, DEFAULT_CODEC, decode_signal, encode_signal
+
+# Usage: python migrate_signals.py [--codec int16-delta-zlib] [--keep-legacy] [collection ...]
+# Rewrites legacy `signals_flat` documents to the binary signal encoding in batches of 500.
+BATCH_SIZE = 500
+
+parser = argparse.ArgumentParser()
+parser.add_argument('collections', nargs='*', default=['ecg_data', 'ecg_data_ste'])
+parser.add_argument('--codec', choices=CODECS, default=DEFAULT_CODEC)
+parser.add_argument('--keep-legacy', action='store_true', help="don't delete the signals_flat field")
+args = parser.parse_args()
+
+db = init_firestore()
+
+for collection in args.collections:
+    start = time.perf_counter()
+    n_migrated = 0
+    n_skipped = 0
+    batch = db.batch()
+    n_pending = 0
+    for doc in db.collection(collection).select(['signals_flat', 'shape', 'signal_codec']).stream():
+        doc_dict = doc.to_dict()
+        if 'signals_flat' not in doc_dict or 'signal_codec' in doc_dict:
+            n_skipped += 1
+            continue
+        fields = encode_signal(decode_signal(doc_dict), codec=args.codec)
+        if not args.keep_legacy:
+            fields["signals_flat"] = firestore.DELETE_FIELD
+        batch.update(doc.reference, fields)
+        n_pending += 1
+        if n_pending == BATCH_SIZE:
+            batch.commit()
+            n_migrated += n_pending
+            batch = db.batch()
+            n_pending = 0
+    if n_pending:
+        batch.commit()
+        n_migrated += n_pending
+    print(f'{collection}: {n_migrated} migrated, {n_skipped} skipped in {time.perf_counter() - start:.1f}s')
@@ -0,0 +1,43 @@
+import argparse
+import time
+from streamlit_utils.datasets import MIMIC_BASE_PATH, WTD_BASE_PATH
+from streamlit_utils.record_index import WTD_CSV, MIMIC_RECORDS_CSV
+from streamlit_utils.shard_store import SHARD_SIZE, build_shards, mimic_jobs, shard_path, wtd_jobs
+
+# Usage: python precompute_shards.py wtd [--base-path DIR] [--workers 16] [--rebuild]
+#        python precompute_shards.py mimic [--base-path DIR]
+# Preprocesses every catalog record once into ./wtd/5_wtd_10seconds.shards (or
+# ./mimic/record_list.shards); reruns only redo records whose files changed.
+BASE_PATHS = {'wtd': WTD_BASE_PATH, 'mimic': MIMIC_BASE_PATH}
+CATALOGS = {'wtd': (WTD_CSV, wtd_jobs), 'mimic': (MIMIC_RECORDS_CSV, mimic_jobs)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('dataset', choices=sorted(CATALOGS))
+    parser.add_argument('--base-path', default=None, help='directory the catalog record paths are relative to')
+    parser.add_argument('--csv', default=None, help='catalog CSV (default: the one the apps use)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE)
+    parser.add_argument('--limit', type=int, default=None, help='only the first N catalog records')
+    parser.add_argument('--rebuild', action='store_true', help='ignore the existing index and rewrite every shard')
+    args = parser.parse_args()
+
+    default_csv, make_jobs = CATALOGS[args.dataset]
+    csv_path = args.csv or default_csv
+    jobs = make_jobs(args.base_path or BASE_PATHS[args.dataset], csv_path)[:args.limit]
+
+    start = time.perf_counter()
+    report = build_shards(args.dataset, jobs, shard_path(csv_path), shard_size=args.shard_size,
+                          max_workers=args.workers, rebuild=args.rebuild)
+    elapsed = time.perf_counter() - start
+    print(f"{report['written']} written, {report['skipped']} up to date, {len(report['errors'])} failed "
+          f"in {elapsed:.1f}s ({report['written'] / max(elapsed, 1e-9):.0f} records/s)")
+    if report['stale_shards']:
+        print(f"{len(report['stale_shards'])} shards no longer referenced; --rebuild compacts them")
+    for record_id, error in report['errors']:
+        print(f'failed {record_id}: {error}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+MISSING = -1
+
+
+def rating_matrix(evals, category_col='fb_stars', record_col='record_id', rater_col='reviewer', categories=None):
+    """Long table of evaluations -> (ratings [n_records, n_raters] int, records, raters, categories).
+
+    Ratings are indices into `categories` (default: the observed values, sorted); pass the
+    full ordinal scale for weighted kappa. Missing ratings are MISSING, rows whose
+    category is NA are dropped and a duplicate (record, rater) keeps its last row.
+    """
+    evals = evals.dropna(subset=[category_col]).drop_duplicates([record_col, rater_col], keep='last')
+    records = pd.Categorical(evals[record_col])
+    raters = pd.Categorical(evals[rater_col])
+    categories = pd.Categorical(evals[category_col], categories=categories)
+    ratings = np.full((len(records.categories), len(raters.categories)), MISSING, dtype=np.int16)
+    ratings[records.codes, raters.codes] = categories.codes
+    return ratings, np.asarray(records.categories), np.asarray(raters.categories), np.asarray(categories.categories)
+
+
+def category_counts(ratings, n_categories):
+    """[n_records, n_categories] number of raters choosing each category."""
+    rows, cols = np.nonzero(ratings != MISSING)
+    flat = rows * n_categories + ratings[rows, cols]
+    return np.bincount(flat, minlength=len(ratings) * n_categories).reshape(len(ratings), n_categories)
+
+
+def fleiss_kappa(ratings, n_categories=None):
+    """Fleiss' kappa over records with at least two ratings (raters per record may vary)."""
+    n_categories = n_categories or int(ratings.max()) + 1
+    counts = category_counts(ratings, n_categories)
+    n = counts.sum(axis=1)
+    counts, n = counts[n >= 2], n[n >= 2]
+    if not len(n):
+        return np.nan
+    p_i = ((counts ** 2).sum(axis=1) - n) / (n * (n - 1))
+    p_j = counts.sum(axis=0) / n.sum()
+    p_e = (p_j ** 2).sum()
+    return float((p_i.mean() - p_e) / (1 - p_e)) if p_e < 1 else np.nan
+
+
+def _weights(n_categories, weights):
+    i, j = np.indices((n_categories, n_categories))
+    if weights is None:
+        return (i != j).astype(np.float64)
+    if weights == 'linear':
+        return np.abs(i - j) / max(n_categories - 1, 1)
+    if weights == 'quadratic':
+        return (i - j) ** 2 / max(n_categories - 1, 1) ** 2
+    raise ValueError(f'Unknown weights "{weights}", expected None, "linear" or "quadratic"')
+
+
+def cohen_kappa(a, b, n_categories, weights=None):
+    """Cohen's kappa of two aligned rating vectors; pairs with a missing rating are ignored."""
+    both = (a != MISSING) & (b != MISSING)
+    if both.sum() < 2:
+        return np.nan
+    confusion = np.bincount(a[both] * n_categories + b[both], minlength=n_categories ** 2)
+    confusion = confusion.reshape(n_categories, n_categories) / both.sum()
+    expected = np.outer(confusion.sum(axis=1), confusion.sum(axis=0))
+    w = _weights(n_categories, weights)
+    disagreement = (w * expected).sum()
+    return float(1 - (w * confusion).sum() / disagreement) if disagreement else np.nan
+
+
+def pairwise_cohen(ratings, raters, n_categories=None, weights=None):
+    """(kappa, shared record counts) DataFrames over every pair of raters."""
+    n_categories = n_categories or int(ratings.max()) + 1
+    rated = (ratings != MISSING).astype(np.int64)
+    shared = rated.T @ rated
+    kappa = np.full((len(raters), len(raters)), np.nan)
+    for i in range(len(raters)):
+        for j in range(i, len(raters)):
+            if shared[i, j] >= 2:
+                kappa[i, j] = kappa[j, i] = cohen_kappa(ratings[:, i], ratings[:, j], n_categories, weights)
+    return pd.DataFrame(kappa, index=raters, columns=raters), pd.DataFrame(shared, index=raters, columns=raters)
@@ -0,0 +1,91 @@
+import numpy as np
+from streamlit_utils.preprocessing import DURATION, N_LEADS, TARGET_FS, crop, downsample
+
+
+def augment_batch(x, rng, scale_range=None, shift_range=None, sigma_range=None, max_stretch=None,
+                  dropout_p=None, length=None, out=None, scratch=None):
+    """Random scale, baseline shift, Gaussian noise, time warp and lead dropout in one pass.
+
+    x is a batch [N, T_in, C] (or a single [T_in, C]) of physical signals; a transform is
+    skipped when its parameter is None. The output has `length` samples (default T_in);
+    with warping, pass T_in > length so a stretched window reads real signal instead of
+    padding. `out` and `scratch` ([N, length, C] float32) make the call allocation-free
+    apart from the per-sample interpolation indices. Draws come only from `rng`.
+    """
+    x = np.asarray(x, dtype=np.float32)
+    single = x.ndim == 2
+    if single:
+        x = x[None]
+    n, t_in, n_leads = x.shape
+    length = length or t_in
+    if length > t_in:
+        raise ValueError(f'length {length} is longer than the input window ({t_in} samples)')
+    if out is None:
+        out = np.empty((n, length, n_leads), dtype=np.float32)
+    elif single and out.ndim == 2:
+        out = out[None]
+
+    if max_stretch:
+        # Time warp as one linear interpolation over every lead: output sample t reads
+        # input position t * stretch. Scale, shift and dropout are per-lead affine, so
+        # applying them after the (convex) interpolation gives the same result.
+        if scratch is None:
+            scratch = np.empty_like(out)
+        elif single and scratch.ndim == 2:
+            scratch = scratch[None]
+        stretch = rng.uniform(1 - max_stretch, 1 + max_stretch, size=(n, 1))
+        pos = np.minimum(np.arange(length) * stretch, t_in - 1)
+        i0 = pos.astype(np.intp)
+        frac = (pos - i0).astype(np.float32)[..., None]
+        rows = np.arange(n)[:, None] * t_in
+        flat = x.reshape(n * t_in, n_leads)
+        np.take(flat, rows + i0, axis=0, out=out)
+        np.take(flat, rows + np.minimum(i0 + 1, t_in - 1), axis=0, out=scratch)
+        scratch -= out
+        scratch *= frac
+        out += scratch
+    else:
+        out[...] = x[:, :length]
+
+    if scale_range:
+        out *= rng.uniform(*scale_range, size=(n, 1, 1)).astype(np.float32)
+    if shift_range:
+        out += rng.uniform(*shift_range, size=(n, 1, 1)).astype(np.float32)
+    if sigma_range:
+        if scratch is None:
+            scratch = np.empty_like(out)
+        elif single and scratch.ndim == 2:
+            scratch = scratch[None]
+        rng.standard_normal(out=scratch, dtype=np.float32)
+        scratch *= rng.uniform(*sigma_range, size=(n, 1, 1)).astype(np.float32)
+        out += scratch
+    if dropout_p:
+        out *= rng.random((n, 1, n_leads)) > dropout_p
+    return out[0] if single else out
+
+
+def augment_window(p_signal, fs, rng, duration=DURATION, n_leads=N_LEADS, **params):
+    """Crop the displayed window of a full-rate [T, C] record and augment only that.
+
+    The crop is extended by the maximum stretch so warped windows stay inside the record.
+    """
+    n_out = int(fs * duration)
+    margin = 1 + (params.get('max_stretch') or 0)
+    window = crop(p_signal, fs, duration * margin, n_leads)
+    return augment_batch(window, rng, length=min(n_out, window.shape[-2]), **params)
+
+
+def crop_seconds(duration=DURATION, max_stretch=None, **params):
+    """Seconds of raw signal augment_window reads for a `duration` s view."""
+    return duration * (1 + (max_stretch or 0))
+
+
+def augmented_view(p_signal, fs, rng, duration=DURATION, n_leads=N_LEADS, target_fs=TARGET_FS, **params):
+    """What the viewers display and the training feed yields: augment, then downsample.
+
+    p_signal is one [T, C] record or a batch [N, T, C] of records sharing `fs`; the result
+    is [n_leads, duration * target_fs] (or [N, ...]) float32. Augmenting at the native
+    rate before downsampling matters: noise and warping are averaged by the decimation.
+    """
+    window = augment_window(p_signal, fs, rng, duration, n_leads, **params)
+    return downsample(window, fs, target_fs)[..., :int(duration * target_fs)]
@@ -0,0 +1,82 @@
+import functools
+import os
+import zipfile
+from collections import defaultdict
+from streamlit_utils.app_utils import wtd_label_finder
+from streamlit_utils.preprocessing import DURATION, N_LEADS, preprocess_signal
+from streamlit_utils.signal_codec import encode_signal
+from streamlit_utils.wfdb_reader import signal_from_bytes
+
+MAX_MEMBER_BYTES = 64 * 1024 * 1024  # larger archive members are rejected, not decompressed
+CHUNK_RECORDS = 200  # records decoded and committed per ingest() call between UI updates
+
+
+def _zip_entries(archive, problems):
+    # Members are decompressed lazily, one record at a time, by the decode workers
+    archive_file = zipfile.ZipFile(archive)
+    for info in archive_file.infolist():
+        name = os.path.basename(info.filename)
+        if info.is_dir() or not name or info.filename.startswith('__MACOSX/'):
+            continue
+        if info.file_size > MAX_MEMBER_BYTES:
+            problems.append((name, f'skipped: {info.file_size / 2**20:.0f} MB uncompressed exceeds the '
+                                   f'{MAX_MEMBER_BYTES / 2**20:.0f} MB limit'))
+            continue
+        yield name, functools.partial(archive_file.read, info)
+
+
+def collect_uploads(uploaded_files):
+    """Group uploaded files and zip members by stem.
+
+    Returns ({stem: {file name: loader}}, [(name, problem)]) where a loader returns the
+    file's bytes; nothing inside an archive is read yet.
+    """
+    records = defaultdict(dict)
+    problems = []
+    for uploaded in uploaded_files:
+        if uploaded.name.lower().endswith('.zip'):
+            entries = _zip_entries(uploaded, problems)
+        else:
+            entries = [(uploaded.name, uploaded.getvalue)]
+        for name, loader in entries:
+            stem, ext = os.path.splitext(name)
+            if ext.lower() not in ('.hea', '.mat', '.dat'):
+                problems.append((name, 'skipped: not a .hea/.mat/.dat file'))
+                continue
+            if name in records[stem]:
+                problems.append((name, 'skipped: duplicate file name'))
+                continue
+            records[stem][name] = loader
+    for stem in list(records):
+        if _header_name(records[stem]) is None:
+            problems.append((stem, 'missing .hea file'))
+            del records[stem]
+        elif len(records[stem]) == 1:
+            problems.append((stem, 'missing .mat/.dat file'))
+            del records[stem]
+    return dict(records), problems
+
+
+def _header_name(files):
+    return next((name for name in files if name.lower().endswith('.hea')), None)
+
+
+def decode_upload(stem, files, duration=DURATION, n_leads=N_LEADS):
+    """(ecg [12, 500], label_list, signal) of one uploaded record, decoded from memory."""
+    header_name = _header_name(files)
+    header_bytes = files[header_name]()
+    buffers = {name: loader() for name, loader in files.items() if name != header_name}
+    signal = signal_from_bytes(stem, header_bytes, buffers)
+    window = signal.window(0, int(duration * signal.fs), range(min(n_leads, signal.n_sig))) # type: ignore
+    return preprocess_signal(window, signal.fs), wtd_label_finder(signal.comments), signal
+
+
+def build_upload_document(job):
+    """ingest() build_doc: (stem, files) -> Firestore document, as the single upload writes it."""
+    stem, files = job
+    ecg, label_list, _ = decode_upload(stem, files)
+    return {
+        **encode_signal(ecg),
+        "label_list": label_list,
+        "eval": False
+    }
@@ -0,0 +1,33 @@
+import streamlit as st
+
+# Process-wide singletons shared by every app, session and rerun. Heavy dependencies
+# (firebase_admin, matplotlib, pandas tables) are imported or loaded on first use, so a
+# cold start only pays for what the first page actually renders.
+
+
+@st.cache_resource(show_spinner=False)
+def firestore_client():
+    """The Firestore client, initialized once per process."""
+    from streamlit_utils.firestore_utils import init_firestore
+
+    return init_firestore()
+
+
+@st.cache_resource(show_spinner=False)
+def matplotlib_agg():
+    """(Figure, FigureCanvasAgg) on the headless Agg backend; pyplot is never imported."""
+    import matplotlib
+
+    matplotlib.use('Agg')
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    return Figure, FigureCanvasAgg
+
+
+@st.cache_resource(show_spinner='Building cohort index...')
+def dataset_cohort(name):
+    """Cohort of a dataset adapter (see streamlit_utils.datasets), or None if it has no label table."""
+    from streamlit_utils.datasets import get_dataset
+
+    return get_dataset(name).cohort()
@@ -0,0 +1,230 @@
+import functools
+import re
+import numpy as np
+import pandas as pd
+from streamlit_utils.app_utils import MIMIC_LABELS, WTD_LABELS
+from streamlit_utils.label_store import BIT_COLUMN_PATTERN, open_store
+from streamlit_utils.record_index import MIMIC_LABELS_CSV, WTD_CSV, load_mimic_labels, load_wtd_table
+
+# Shorthands accepted in queries, resolved to label names
+ALIASES = {
+    'lbbb': 'left bundle branch block',
+    'rbbb': 'right bundle branch block',
+    'af': 'atrial fibrillation',
+    'afib': 'atrial fibrillation',
+    'mi': 'myocardial infarction',
+    'lvh': 'left ventricular hypertrophy',
+    'rvh': 'right ventricular hypertrophy',
+    'pvc': 'premature ventricular contractions',
+    'pac': 'premature atrial contraction',
+    'ste': 'st elevation',
+    'std': 'st depression',
+    'wpw': 'wolff parkinson white pattern',
+}
+KEYWORDS = {'AND', 'OR', 'NOT', 'IN', '(', ')', ','}  # upper case only: label names contain 'and', 'in', ...
+TOKEN_PATTERN = re.compile(r'\(|\)|,|[^\s(),]+')
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+COOCCURRENCE_CHUNK = 8192  # packed bytes (65536 records) per matrix-multiply block
+
+
+def popcount(packed):
+    return int(_POPCOUNT[packed].sum(dtype=np.int64))
+
+
+class Cohort:
+    """Boolean diagnosis/dataset queries over packed per-code bitsets of a label table.
+
+    Queries combine diagnosis terms with AND / OR / NOT and parentheses and may end in
+    `IN <dataset>[, <dataset>...]`, e.g. `st elevation AND NOT lbbb IN cpsc_2018`.
+    Keywords are matched in upper case only, so `atrial fibrillation and flutter` is one
+    label name. A term is a flag column (`g2_164931005`, `M17`), a SNOMED code, a label name or an
+    alias from ALIASES.
+    """
+
+    def __init__(self, ids, bits, columns, labels, datasets=None):
+        self.ids = np.asarray(ids)
+        self.n_rows = len(self.ids)
+        self.bits = bits
+        self.columns = list(columns)
+        self.labels = labels
+        self._column_index = {col.lower(): ix for ix, col in enumerate(self.columns)}
+        self._valid = np.packbits(np.ones(self.n_rows, dtype=bool), bitorder='little')
+        self.dataset_bits = {}
+        if datasets is not None:
+            datasets = pd.Categorical(datasets)
+            for code, name in enumerate(datasets.categories):
+                self.dataset_bits[str(name).lower()] = np.packbits(datasets.codes == code, bitorder='little')
+
+    # Query language
+
+    def _term_bits(self, term):
+        key = term.lower()
+        key = ALIASES.get(key, key)
+        for candidate in (key, f'g2_{key}'):
+            if candidate in self._column_index:
+                return self.bits[self._column_index[candidate]]
+        # Label names: exact matches first, substrings otherwise; several columns are OR-ed
+        matches = [ix for ix, col in enumerate(self.columns) if self.labels.get(col, '').lower() == key]
+        if not matches:
+            matches = [ix for ix, col in enumerate(self.columns) if key in self.labels.get(col, '').lower()]
+        if not matches:
+            raise ValueError(f'Unknown diagnosis "{term}"')
+        return np.bitwise_or.reduce(self.bits[matches], axis=0)
+
+    def _dataset_bits(self, name):
+        if name.lower() not in self.dataset_bits:
+            raise ValueError(f'Unknown dataset "{name}", expected one of {sorted(self.dataset_bits)}')
+        return self.dataset_bits[name.lower()]
+
+    def query(self, expr):
+        """Packed bitset (little bit order) of the records matching `expr`; '' or '*' is everything."""
+        tokens = TOKEN_PATTERN.findall(expr)
+        if not tokens or tokens == ['*']:
+            return self._valid.copy()
+        pos = 0
+
+        def peek():
+            return tokens[pos] if pos < len(tokens) else None
+
+        def take(expected=None):
+            nonlocal pos
+            if expected is not None and peek() != expected:
+                raise ValueError(f'Expected "{expected}" at position {pos} of query "{expr}"')
+            pos += 1
+            return tokens[pos - 1]
+
+        def parse_query():
+            bits = parse_or()
+            if peek() == 'IN':
+                take('IN')
+                in_bits = self._dataset_bits(take())
+                while peek() == ',':
+                    take(',')
+                    in_bits = in_bits | self._dataset_bits(take())
+                bits = bits & in_bits
+            return bits
+
+        def parse_or():
+            bits = parse_and()
+            while peek() == 'OR':
+                take('OR')
+                bits = bits | parse_and()
+            return bits
+
+        def parse_and():
+            bits = parse_not()
+            while peek() == 'AND':
+                take('AND')
+                bits = bits & parse_not()
+            return bits
+
+        def parse_not():
+            if peek() == 'NOT':
+                take('NOT')
+                return ~parse_not() & self._valid
+            if peek() == '(':
+                take('(')
+                bits = parse_query()
+                take(')')
+                return bits
+            words = []
+            while peek() is not None and peek() not in KEYWORDS:
+                words.append(take())
+            if not words:
+                raise ValueError(f'Expected a diagnosis at position {pos} of query "{expr}"')
+            return self._term_bits(' '.join(words))
+
+        bits = parse_query()
+        if pos != len(tokens):
+            raise ValueError(f'Unexpected "{tokens[pos]}" at position {pos} of query "{expr}"')
+        return bits
+
+    # Results
+
+    def mask(self, expr):
+        return np.unpackbits(self.query(expr), count=self.n_rows, bitorder='little').astype(bool)
+
+    def count(self, expr):
+        return popcount(self.query(expr))
+
+    def select(self, expr):
+        return self.ids[self.mask(expr)]
+
+    def code_counts(self, expr=''):
+        """Positives per flag column within the records matching `expr`."""
+        selection = self.query(expr)
+        counts = _POPCOUNT[self.bits & selection].sum(axis=1, dtype=np.int64)
+        return pd.Series(counts, index=self.columns).sort_values(ascending=False)
+
+    def cooccurrence(self, columns=None, expr=''):
+        """(k, k) matrix of records having both codes, within the records matching `expr`."""
+        columns = self.columns if columns is None else list(columns)
+        rows = self.bits[[self._column_index[col.lower()] for col in columns]] & self.query(expr)
+        out = np.zeros((len(columns), len(columns)), dtype=np.float64)
+        for start in range(0, rows.shape[1], COOCCURRENCE_CHUNK):
+            block = np.unpackbits(rows[:, start:start + COOCCURRENCE_CHUNK], axis=1, bitorder='little')
+            block = block.astype(np.float32)
+            out += block @ block.T
+        return pd.DataFrame(out.astype(np.int64), index=columns, columns=columns)
+
+    def sample(self, expr, n, seed=None, strata=None, per_stratum=False):
+        """Seeded sample of IDs matching `expr`.
+
+        `strata` is 'dataset' or a list of terms (a record belongs to the first matching
+        one); samples are allocated proportionally to stratum size, or `n` per stratum.
+        """
+        rng = np.random.default_rng(seed)
+        mask = self.mask(expr)
+        if strata is None:
+            groups = [np.flatnonzero(mask)]
+        else:
+            if strata == 'dataset':
+                stratum_bits = list(self.dataset_bits.values())
+            else:
+                stratum_bits = [self.query(term) for term in strata]
+            remaining = mask.copy()
+            groups = []
+            for bits in stratum_bits:
+                member = remaining & np.unpackbits(bits, count=self.n_rows, bitorder='little').astype(bool)
+                groups.append(np.flatnonzero(member))
+                remaining &= ~member
+        sizes = np.array([len(group) for group in groups])
+        if per_stratum:
+            alloc = np.minimum(sizes, n)
+        else:
+            # Proportional allocation with largest-remainder rounding
+            total = sizes.sum()
+            quota = sizes * min(n, total) / total if total else np.zeros(len(sizes))
+            alloc = np.floor(quota).astype(int)
+            for ix in np.argsort(alloc - quota)[:min(n, total) - alloc.sum()]:
+                alloc[ix] += 1
+        picked = [rng.choice(group, size=k, replace=False) for group, k in zip(groups, alloc) if k]
+        return self.ids[np.sort(np.concatenate(picked))] if picked else self.ids[:0]
+
+
+def _table_bits(df, columns):
+    flags = df[columns].to_numpy().astype(bool).T
+    return np.packbits(flags, axis=1, bitorder='little')
+
+
+@functools.lru_cache(maxsize=None)
+def wtd_cohort(csv_path=WTD_CSV):
+    """Cohort over the WTD catalog, built once per process (from the label store if present)."""
+    labels = {f'g2_{code}': label for code, label in WTD_LABELS.items()}
+    store = open_store(csv_path)
+    if store is not None:
+        return Cohort(store.column('patient_id'), store.bits, store.bit_columns, labels, store.categorical('dataset'))
+    df = load_wtd_table(csv_path)
+    columns = [col for col in df.columns if BIT_COLUMN_PATTERN.fullmatch(col)]
+    return Cohort(df['patient_id'].to_numpy(), _table_bits(df, columns), columns, labels, df['dataset'])
+
+
+@functools.lru_cache(maxsize=None)
+def mimic_cohort(csv_path=MIMIC_LABELS_CSV):
+    """Cohort over the MIMIC label table, keyed by study_id."""
+    store = open_store(csv_path)
+    if store is not None:
+        return Cohort(store.column('study_id'), store.bits, store.bit_columns, dict(MIMIC_LABELS))
+    df = load_mimic_labels(csv_path)
+    columns = [col for col in df.columns if BIT_COLUMN_PATTERN.fullmatch(col)]
+    return Cohort(df.index.to_numpy(), _table_bits(df, columns), columns, dict(MIMIC_LABELS))
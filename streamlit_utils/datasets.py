@@ -0,0 +1,143 @@
+import abc
+import functools
+import os
+import re
+from streamlit_utils.app_utils import mimic_label_finder, wtd_label_finder
+from streamlit_utils.record_index import MIMIC_LABELS_CSV, MIMIC_RECORDS_CSV, WTD_CSV, mimic_label_row, mimic_record_path, wtd_record_path
+
+# Where each dataset's WFDB files live; the catalogs store paths relative to these
+WTD_BASE_PATH = os.environ.get('ECG_WTD_PATH', '/home/ubuntu/BackupFiles/soheili/DATA/ecg_wtd')
+MIMIC_BASE_PATH = os.environ.get('ECG_MIMIC_PATH', '/home/ubuntu/soheili/mimic-iv-ecg-diagnostic-electrocardiogram-matched-subset-1.0/')
+UPLOAD_DIR = os.environ.get('ECG_UPLOAD_DIR', './uploads')
+RECORD_NAME = re.compile(r'[A-Za-z0-9][A-Za-z0-9_.-]*')  # uploaded record stems kept as file names
+
+
+class Dataset(abc.ABC):
+    """A set of WFDB records the viewer can open by ID.
+
+    Adapters map a record ID to its record path and labels. `catalog_path` is what the
+    derived stores are named after (shards, measurements, similarity index), so every
+    dataset gets them the same way; `cohort()` is None where there is no label table.
+    """
+
+    name = None
+    title = None
+    id_label = 'Record ID'
+    query_placeholder = None
+
+    def __init__(self, base_path, catalog_path):
+        self.base_path = base_path
+        self.catalog_path = catalog_path
+
+    @abc.abstractmethod
+    def record_path(self, record_id):
+        """Path (without extension) of a record; raises KeyError if unknown."""
+
+    def labels(self, record_id, record):
+        """Label names of a record (`record` is the CachedRecord read from record_path)."""
+        return wtd_label_finder(record.comments)
+
+    def cohort(self):
+        return None
+
+
+class WTDDataset(Dataset):
+    name = 'wtd'
+    title = 'WTD'
+    id_label = 'ECG Name'
+    query_placeholder = 'st elevation IN cpsc_2018'
+
+    def __init__(self, base_path=WTD_BASE_PATH, csv_path=WTD_CSV):
+        super().__init__(base_path, csv_path)
+
+    def record_path(self, record_id):
+        return self.base_path + wtd_record_path(record_id, self.catalog_path)
+
+    def cohort(self):
+        from streamlit_utils.cohort import wtd_cohort
+
+        return wtd_cohort(self.catalog_path)
+
+
+class MIMICDataset(Dataset):
+    name = 'mimic'
+    title = 'MIMIC-IV-ECG'
+    id_label = 'Study ID'
+    query_placeholder = 'st elevation'
+
+    def __init__(self, base_path=MIMIC_BASE_PATH, records_csv=MIMIC_RECORDS_CSV, labels_csv=MIMIC_LABELS_CSV):
+        super().__init__(base_path, records_csv)
+        self.labels_csv = labels_csv
+
+    def record_path(self, record_id):
+        try:
+            return self.base_path + mimic_record_path(record_id, self.catalog_path)
+        except ValueError:
+            raise KeyError(record_id) from None
+
+    def labels(self, record_id, record):
+        try:
+            return mimic_label_finder(mimic_label_row(record_id, self.labels_csv))
+        except (KeyError, ValueError):
+            return []
+
+    def cohort(self):
+        from streamlit_utils.cohort import mimic_cohort
+
+        return mimic_cohort(self.labels_csv)
+
+
+class UploadedDataset(Dataset):
+    """WFDB records uploaded through the viewer, kept as files in `directory`; labels come from their Dx comments."""
+
+    name = 'uploaded'
+    title = 'Uploaded'
+    id_label = 'Record'
+
+    def __init__(self, directory=UPLOAD_DIR):
+        super().__init__(directory, directory)
+
+    def record_path(self, record_id):
+        record_id = str(record_id).strip()
+        path = os.path.join(self.base_path, record_id)
+        if not RECORD_NAME.fullmatch(record_id) or not os.path.exists(path + '.hea'):
+            raise KeyError(record_id)
+        return path
+
+    def record_ids(self):
+        try:
+            names = os.listdir(self.base_path)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-4] for name in names if name.endswith('.hea'))
+
+    def add(self, uploaded_files):
+        """Store uploaded .hea/.mat/.dat files and zip archives; returns (record IDs added, [(name, problem)])."""
+        from streamlit_utils.batch_upload import collect_uploads
+
+        records, problems = collect_uploads(uploaded_files)
+        os.makedirs(self.base_path, exist_ok=True)
+        added = []
+        for stem, files in sorted(records.items()):
+            if not RECORD_NAME.fullmatch(stem) or not all(RECORD_NAME.fullmatch(name) for name in files):
+                problems.append((stem, 'skipped: record names may only use letters, digits, "_", "-" and "."'))
+                continue
+            # Signal files before the header: a record only exists once its .hea is in place
+            for name in sorted(files, key=lambda name: name.lower().endswith('.hea')):
+                # Signal files keep their uploaded names, which the header refers to
+                path = os.path.join(self.base_path, stem + '.hea' if name.lower().endswith('.hea') else name)
+                tmp_path = f'{path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(files[name]())
+                os.replace(tmp_path, path)
+            added.append(stem)
+        return added, problems
+
+
+DATASETS = {dataset.name: dataset for dataset in (WTDDataset, MIMICDataset, UploadedDataset)}
+
+
+@functools.lru_cache(maxsize=None)
+def get_dataset(name):
+    """The process-wide adapter of a dataset in DATASETS, with its default paths."""
+    return DATASETS[name]()
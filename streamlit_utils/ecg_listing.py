@@ -0,0 +1,73 @@
+import threading
+import time
+
+LISTING_FIELDS = ['eval', 'label_list']  # small metadata only, never signal payloads
+PAGE_SIZE = 500
+FULL_REFRESH_SECONDS = 600
+INCREMENTAL_REFRESH_SECONDS = 30
+
+
+def list_ecg_page(db, collection, cursor=None, page_size=PAGE_SIZE, only_unevaluated=False, fields=LISTING_FIELDS):
+    """One page of (doc_id, metadata) ordered by ID, plus the cursor after it (None if the page is empty)."""
+    query = db.collection(collection)
+    if only_unevaluated:
+        from firebase_admin import firestore
+
+        query = query.where(filter=firestore.FieldFilter('eval', '==', False))
+    query = query.select(fields).order_by('__name__').limit(page_size)
+    if cursor is not None:
+        query = query.start_after(cursor)
+    snapshots = list(query.stream())
+    rows = [(snap.id, snap.to_dict() or {}) for snap in snapshots]
+    return rows, (snapshots[-1] if snapshots else None)
+
+
+class ECGListing:
+    """Projected ID/metadata listing of an ECG collection with incremental refresh.
+
+    `refresh()` only pages past the last seen document (at most every
+    INCREMENTAL_REFRESH_SECONDS); `refresh(full=True)`, also done automatically every
+    FULL_REFRESH_SECONDS, re-lists to pick up deletions and flags changed by other reviewers.
+    """
+
+    def __init__(self, db, collection, only_unevaluated=False, page_size=PAGE_SIZE):
+        self.db = db
+        self.collection = collection
+        self.only_unevaluated = only_unevaluated
+        self.page_size = page_size
+        self.entries = {}
+        self._cursor = None
+        self._last_full = 0.0
+        self._last_incremental = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self, full=False):
+        with self._lock:
+            if full or time.time() - self._last_full > FULL_REFRESH_SECONDS:
+                self.entries = {}
+                self._cursor = None
+                self._last_full = time.time()
+            elif time.time() - self._last_incremental < INCREMENTAL_REFRESH_SECONDS:
+                return self
+            self._last_incremental = time.time()
+            while True:
+                rows, cursor = list_ecg_page(
+                    self.db, self.collection, self._cursor, self.page_size, self.only_unevaluated
+                )
+                self.entries.update(rows)
+                # Incremental refreshes resume right after the last document seen
+                if cursor is not None:
+                    self._cursor = cursor
+                if len(rows) < self.page_size:
+                    return self
+
+    def ids(self):
+        return sorted(self.entries)
+
+    def mark_evaluated(self, doc_id):
+        with self._lock:
+            if doc_id in self.entries:
+                if self.only_unevaluated:
+                    del self.entries[doc_id]
+                else:
+                    self.entries[doc_id]['eval'] = True
@@ -0,0 +1,111 @@
+import threading
+import time
+import pandas as pd
+from streamlit_utils.eval_writer import EVAL_COLLECTION, RECORD_COLLECTION, STATS_DOCUMENT, reviewer_key, star_bucket
+
+EVAL_FIELDS = ['record_id', 'username', 'fb_stars', 'submit_datetime']
+PAGE_SIZE = 1000
+REFRESH_SECONDS = 30
+
+
+def aggregate_count(query):
+    """Server-side COUNT of a query (billed per 1000 index entries, no documents read)."""
+    return int(query.count(alias='n').get()[0][0].value)
+
+
+def progress_counts(db, record_collection=RECORD_COLLECTION, eval_collection=EVAL_COLLECTION):
+    """Records, evaluated records and evaluation documents, via aggregation queries."""
+    from firebase_admin import firestore
+
+    records = db.collection(record_collection)
+    return {
+        'records': aggregate_count(records),
+        'evaluated': aggregate_count(records.where(filter=firestore.FieldFilter('eval', '==', True))),
+        'evaluations': aggregate_count(db.collection(eval_collection)),
+    }
+
+
+def read_counters(db):
+    """The eval_stats counters maintained by EvalWriter ({} before the first submission)."""
+    snapshot = db.collection(STATS_DOCUMENT[0]).document(STATS_DOCUMENT[1]).get()
+    return (snapshot.to_dict() or {}) if snapshot.exists else {}
+
+
+def star_table(counters):
+    """Reviewer x star bucket counts from the counters document."""
+    table = pd.DataFrame(counters.get('stars', {})).T.fillna(0).astype(int)
+    buckets = [bucket for bucket in ['1', '2', '3', '4', '5', 'none'] if bucket in table.columns]
+    return table[buckets].sort_index()
+
+
+def _row(snapshot):
+    doc = snapshot.to_dict()
+    # Evaluations written before per-reviewer keys were keyed by record ID only
+    return {
+        'record_id': doc.get('record_id', snapshot.id),
+        'reviewer': reviewer_key(doc.get('username') or ''),
+        'fb_stars': doc.get('fb_stars'),
+        'submit_datetime': doc.get('submit_datetime'),
+    }
+
+
+class EvalTable:
+    """Projected copy of eval_data kept current by fetching only documents submitted since the last refresh."""
+
+    def __init__(self, db, eval_collection=EVAL_COLLECTION, page_size=PAGE_SIZE):
+        self.db = db
+        self.eval_collection = eval_collection
+        self.page_size = page_size
+        self.rows = {}
+        self.latest = None
+        self.last_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def _fetch_since(self, since):
+        query = self.db.collection(self.eval_collection).select(EVAL_FIELDS).order_by('submit_datetime')
+        if since is not None:
+            from firebase_admin import firestore
+
+            # >= rather than >: documents sharing the boundary timestamp are re-read, not lost
+            query = query.where(filter=firestore.FieldFilter('submit_datetime', '>=', since))
+        cursor = None
+        while True:
+            page = query.start_after(cursor) if cursor is not None else query
+            snapshots = list(page.limit(self.page_size).stream())
+            for snapshot in snapshots:
+                yield snapshot
+            if len(snapshots) < self.page_size:
+                return
+            cursor = snapshots[-1]
+
+    def refresh(self, force=False, max_age=REFRESH_SECONDS):
+        with self._lock:
+            if not force and time.monotonic() - self.last_refresh < max_age:
+                return 0
+            n = 0
+            for snapshot in self._fetch_since(self.latest):
+                row = _row(snapshot)
+                self.rows[snapshot.id] = row
+                if row['submit_datetime'] is not None and (self.latest is None or row['submit_datetime'] > self.latest):
+                    self.latest = row['submit_datetime']
+                n += 1
+            self.last_refresh = time.monotonic()
+            return n
+
+    def frame(self):
+        with self._lock:
+            return pd.DataFrame(list(self.rows.values()), columns=['record_id', 'reviewer', 'fb_stars', 'submit_datetime'])
+
+
+def rebuild_counters(db, eval_collection=EVAL_COLLECTION):
+    """Recompute the eval_stats counters from a projected scan of eval_data (repair/backfill only)."""
+    evals = EvalTable(db, eval_collection)
+    evals.refresh(force=True)
+    df = evals.frame()
+    buckets = df['fb_stars'].map(lambda stars: star_bucket(None if pd.isna(stars) else stars))
+    stars = {}
+    for (reviewer, bucket), n in df.groupby([df['reviewer'], buckets]).size().items():
+        stars.setdefault(reviewer, {})[bucket] = int(n)
+    counters = {'evaluations': len(df), 'stars': stars}
+    db.collection(STATS_DOCUMENT[0]).document(STATS_DOCUMENT[1]).set(counters)
+    return counters
@@ -0,0 +1,234 @@
+import datetime
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+EVAL_QUEUE_PATH = './eval_queue.sqlite'
+RECORD_COLLECTION = 'ecg_data_ste'
+EVAL_COLLECTION = 'eval_data'
+STATS_DOCUMENT = ('eval_stats', 'summary')  # incrementally maintained counters
+FLUSH_INTERVAL = 1.0
+MAX_EVALS_PER_BATCH = 200  # two writes each plus the counters, under the 500-write limit
+MAX_ATTEMPTS = 10  # failed commits of an entry before it is set aside in the `failed` table
+
+
+def reviewer_key(reviewer):
+    """Document-ID-safe form of a reviewer name."""
+    return re.sub(r'[^\w.-]+', '_', reviewer.strip().lower()) or 'anonymous'
+
+
+def evaluation_id(record_id, reviewer):
+    """One evaluation document per (record, reviewer): `<record_id>__<reviewer>`."""
+    return f'{record_id}__{reviewer_key(reviewer)}'
+
+
+def add_evaluation(batch, db, record_id, reviewer, fields, record_collection=RECORD_COLLECTION, eval_collection=EVAL_COLLECTION):
+    """Stage the evaluation document and the record's eval flag in `batch` (a WriteBatch or Transaction)."""
+    from firebase_admin import firestore
+
+    batch.set(db.collection(eval_collection).document(evaluation_id(record_id, reviewer)), {
+        **fields, 'record_id': record_id, 'username': reviewer,
+    })
+    # merge instead of update: a deleted record must not wedge the whole queue
+    batch.set(db.collection(record_collection).document(record_id), {
+        'eval': True,
+        'reviewers': firestore.ArrayUnion([reviewer_key(reviewer)]),  # idempotent on resubmission
+    }, merge=True)
+
+
+def star_bucket(stars):
+    """Counter key of a star rating (st.feedback gives 0-4 or None)."""
+    return 'none' if stars is None else str(int(stars) + 1)
+
+
+def counter_update(deltas):
+    """{(reviewer_key, bucket): delta} and the new-evaluation count -> merge-set fields of Increments."""
+    from firebase_admin import firestore
+
+    stars = {}
+    for (key, bucket), delta in deltas.items():
+        if key != '' and delta:
+            stars.setdefault(key, {})[bucket] = firestore.Increment(delta)
+    return {'evaluations': firestore.Increment(deltas.get(('', 'new'), 0)), 'stars': stars}
+
+
+def _stage_evaluations(transaction, db, evals, record_collection, eval_collection):
+    refs = [db.collection(eval_collection).document(evaluation_id(record_id, reviewer)) for record_id, reviewer, _ in evals]
+    previous = {snap.id: snap.to_dict() for snap in transaction.get_all(refs) if snap.exists}
+    deltas = Counter()
+    for ref, (record_id, reviewer, fields) in zip(refs, evals):
+        add_evaluation(transaction, db, record_id, reviewer, fields, record_collection, eval_collection)
+        key = reviewer_key(reviewer)
+        if ref.id in previous:
+            deltas[(key, star_bucket(previous[ref.id].get('fb_stars')))] -= 1
+        else:
+            deltas[('', 'new')] += 1
+        deltas[(key, star_bucket(fields.get('fb_stars')))] += 1
+    transaction.set(db.collection(STATS_DOCUMENT[0]).document(STATS_DOCUMENT[1]), counter_update(deltas), merge=True)
+
+
+def commit_evaluations(db, evals, record_collection=RECORD_COLLECTION, eval_collection=EVAL_COLLECTION):
+    """Write [(record_id, reviewer, fields)] and the matching counter deltas in one transaction.
+
+    Previous evaluations of the same (record, reviewer) are read first so a resubmission
+    moves the reviewer's star count instead of adding to it.
+    """
+    from firebase_admin import firestore
+
+    firestore.transactional(_stage_evaluations)(db.transaction(), db, evals, record_collection, eval_collection)
+
+
+class EvalWriter:
+    """Durable write-behind queue of evaluations, committed to Firestore by a background thread.
+
+    `submit` appends to a local SQLite file (WAL, fsync'd) and returns immediately; the
+    worker commits queued evaluations in transactions (evaluation document, record flag
+    and the eval_stats counters together) and deletes them only after the commit succeeded, so submissions
+    survive crashes and network outages and are flushed on the next start. Resubmitting
+    the same (record, reviewer) before a flush replaces the queued entry.
+
+    Entries of a failed batch are retried together once, then one at a time behind newer
+    entries, so one entry Firestore rejects cannot hold up the rest. After MAX_ATTEMPTS it
+    is moved to the `failed` table (counted in `stats()`) and requeued on the next start.
+    """
+
+    def __init__(self, db, path=EVAL_QUEUE_PATH, record_collection=RECORD_COLLECTION,
+                 eval_collection=EVAL_COLLECTION, flush_interval=FLUSH_INTERVAL, max_backoff=60.0):
+        self.db = db
+        self.record_collection = record_collection
+        self.eval_collection = eval_collection
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.committed = 0
+        self.failures = 0
+        self.last_error = None
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=FULL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS pending ('
+            ' seq INTEGER PRIMARY KEY AUTOINCREMENT, eval_id TEXT UNIQUE, record_id TEXT,'
+            ' reviewer TEXT, fields TEXT, attempts INTEGER DEFAULT 0)'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS failed ('
+            ' eval_id TEXT PRIMARY KEY, record_id TEXT, reviewer TEXT, fields TEXT, attempts INTEGER, error TEXT)'
+        )
+        # Entries set aside by an earlier run get another chance; newer submissions of them win
+        self._conn.execute(
+            'INSERT OR IGNORE INTO pending (eval_id, record_id, reviewer, fields)'
+            ' SELECT eval_id, record_id, reviewer, fields FROM failed'
+        )
+        self._conn.execute('DELETE FROM failed')
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._idle = threading.Condition(self._lock)
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name='eval-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, record_id, reviewer, fields):
+        """Queue an evaluation; returns its evaluation ID without waiting for the network."""
+        fields = {**fields, 'submit_datetime': fields.get('submit_datetime', datetime.datetime.now())}
+        payload = json.dumps(fields, default=lambda value: {'$datetime': value.isoformat()})
+        eval_id = evaluation_id(record_id, reviewer)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO pending (eval_id, record_id, reviewer, fields) VALUES (?, ?, ?, ?)',
+                (eval_id, record_id, reviewer, payload)
+            )
+        self._wake.set()
+        return eval_id
+
+    def pending(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM pending').fetchone()[0]
+
+    def failed(self):
+        """[(record_id, reviewer, error)] of entries set aside after MAX_ATTEMPTS failed commits."""
+        with self._lock:
+            return self._conn.execute('SELECT record_id, reviewer, error FROM failed ORDER BY eval_id').fetchall()
+
+    def stats(self):
+        with self._lock:
+            failed = self._conn.execute('SELECT COUNT(*) FROM failed').fetchone()[0]
+        return {'pending': self.pending(), 'committed': self.committed, 'failed': failed,
+                'failures': self.failures, 'last_error': self.last_error}
+
+    def flush(self, timeout=10.0):
+        """Wake the worker and wait until the queue is empty; False on timeout."""
+        deadline = time.monotonic() + timeout
+        self._wake.set()
+        with self._lock:
+            while self._conn.execute('SELECT COUNT(*) FROM pending').fetchone()[0]:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def close(self, timeout=10.0):
+        self.flush(timeout)
+        self._stop = True
+        self._wake.set()
+        self._thread.join(timeout)
+
+    def _decode(self, payload):
+        return json.loads(payload, object_hook=lambda obj: (
+            datetime.datetime.fromisoformat(obj['$datetime']) if set(obj) == {'$datetime'} else obj
+        ))
+
+    def _commit_pending(self):
+        with self._lock:
+            # Fresh entries first; entries that already failed twice are committed one at a time
+            attempts = self._conn.execute('SELECT MIN(attempts) FROM pending').fetchone()[0]
+            if attempts is None:
+                return 0
+            rows = self._conn.execute(
+                'SELECT seq, record_id, reviewer, fields FROM pending WHERE attempts = ? ORDER BY seq LIMIT ?',
+                (attempts, MAX_EVALS_PER_BATCH if attempts < 2 else 1)
+            ).fetchall()
+        evals = [(record_id, reviewer, self._decode(payload)) for _, record_id, reviewer, payload in rows]
+        seqs = [(row[0],) for row in rows]
+        try:
+            commit_evaluations(self.db, evals, self.record_collection, self.eval_collection)
+        except Exception as e:
+            with self._lock:
+                # Copied before deleting: a crash in between leaves the entry in both, never in neither
+                self._conn.executemany('UPDATE pending SET attempts = attempts + 1 WHERE seq = ?', seqs)
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO failed SELECT eval_id, record_id, reviewer, fields, attempts, ?'
+                    ' FROM pending WHERE seq = ? AND attempts >= ?',
+                    [(f'{type(e).__name__}: {e}', seq, MAX_ATTEMPTS) for seq, in seqs]
+                )
+                self._conn.execute('DELETE FROM pending WHERE attempts >= ?', (MAX_ATTEMPTS,))
+                self._idle.notify_all()
+            raise
+        with self._lock:
+            # Delete by seq so an entry replaced while committing stays queued
+            self._conn.executemany('DELETE FROM pending WHERE seq = ?', seqs)
+            self._idle.notify_all()
+        self.committed += len(rows)
+        return len(rows)
+
+    def _run(self):
+        failures_in_row = 0
+        while not self._stop:
+            self._wake.clear()
+            try:
+                while self._commit_pending():
+                    pass
+                failures_in_row = 0
+                self.last_error = None
+                timeout = self.flush_interval
+            except Exception as e:
+                # Keep the queue; retry with jittered exponential backoff
+                self.failures += 1
+                failures_in_row += 1
+                self.last_error = f'{type(e).__name__}: {e}'
+                timeout = min(self.max_backoff, 0.5 * 2 ** failures_in_row) * (1 + random.random())
+            self._wake.wait(timeout)
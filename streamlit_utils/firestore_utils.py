@@ -1,8 +1,10 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
 import streamlit as st
 
 def init_firestore():
+    # firebase_admin is imported on first use: it is slow to import and most reruns never need it
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
     if not firebase_admin._apps:
         cred_dict = {
             "type": st.secrets["firebase"]["type"],
@@ -0,0 +1,112 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+MAX_BATCH_SIZE = 500  # Firestore limit of writes per batch
+
+
+def load_checkpoint(path):
+    """IDs already committed by a previous run (one per line)."""
+    if path is None or not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def commit_with_retry(db, collection, docs, max_retries=5, backoff=0.5):
+    """Commit [(doc_id, fields), ...] as one WriteBatch, retrying with jittered exponential backoff."""
+    for attempt in range(max_retries + 1):
+        try:
+            batch = db.batch()
+            for doc_id, fields in docs:
+                batch.set(db.collection(collection).document(doc_id), fields)
+            batch.commit()
+            return attempt
+        except Exception:
+            if attempt == max_retries:
+                raise
+            time.sleep(backoff * 2 ** attempt * (1 + random.random()))
+
+
+def ingest(db, jobs, collection, build_doc, max_workers=8, use_processes=False,
+           batch_size=MAX_BATCH_SIZE, checkpoint_path=None, max_retries=5, backoff=0.5, log=print):
+    """Decode `jobs` [(doc_id, payload), ...] with `build_doc(payload)` in a pool and commit in batches.
+
+    Decoding, batching and commits overlap: workers decode while a commit thread writes
+    the previous batch. Committed IDs are appended to `checkpoint_path` so an interrupted
+    run resumes where it stopped. Returns a throughput report dict.
+    """
+    batch_size = min(batch_size, MAX_BATCH_SIZE)
+    done_ids = load_checkpoint(checkpoint_path)
+    all_jobs = list(jobs)
+    jobs = [(doc_id, payload) for doc_id, payload in all_jobs if doc_id not in done_ids]
+    report = {'submitted': len(jobs), 'skipped': len(all_jobs) - len(jobs), 'committed': 0,
+              'failed': 0, 'retries': 0, 'batches': 0, 'errors': []}
+    checkpoint_lock = threading.Lock()
+    checkpoint = open(checkpoint_path, 'a') if checkpoint_path else None
+
+    def commit(docs):
+        report['retries'] += commit_with_retry(db, collection, docs, max_retries, backoff)
+        with checkpoint_lock:
+            report['committed'] += len(docs)
+            report['batches'] += 1
+            if checkpoint:
+                checkpoint.write(''.join(f'{doc_id}\n' for doc_id, _ in docs))
+                checkpoint.flush()
+                os.fsync(checkpoint.fileno())
+        log(f"committed {report['committed']}/{report['submitted']}")
+
+    start = time.perf_counter()
+    pool_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    try:
+        with pool_cls(max_workers=max_workers) as pool, ThreadPoolExecutor(max_workers=1) as committer:
+            pending = deque()
+            commits = deque()
+            docs = []
+            job_iter = iter(jobs)
+
+            def submit_next():
+                for doc_id, payload in job_iter:
+                    pending.append((doc_id, pool.submit(build_doc, payload)))
+                    return
+
+            # Bounded in-flight window keeps memory flat for large runs
+            for _ in range(max_workers * 4):
+                submit_next()
+            while pending:
+                doc_id, future = pending.popleft()
+                submit_next()
+                try:
+                    docs.append((doc_id, future.result()))
+                except Exception as e:
+                    report['failed'] += 1
+                    report['errors'].append((doc_id, repr(e)))
+                    continue
+                if len(docs) == batch_size:
+                    commits.append(committer.submit(commit, docs))
+                    docs = []
+                    # At most two batches in flight
+                    while len(commits) > 2:
+                        commits.popleft().result()
+            if docs:
+                commits.append(committer.submit(commit, docs))
+            for future in commits:
+                future.result()
+    finally:
+        if checkpoint:
+            checkpoint.close()
+
+    elapsed = time.perf_counter() - start
+    report['seconds'] = elapsed
+    report['records_per_second'] = report['committed'] / elapsed if elapsed > 0 else 0.0
+    return report
+
+
+def format_report(report):
+    return (f"{report['committed']} committed in {report['batches']} batches, "
+            f"{report['skipped']} skipped (checkpoint), {report['failed']} failed, "
+            f"{report['retries']} retries, {report['seconds']:.1f}s "
+            f"({report['records_per_second']:.1f} records/s)")
@@ -0,0 +1,210 @@
+import functools
+import json
+import os
+import re
+import shutil
+import numpy as np
+
+# Diagnosis flag columns: WTD `g2_<snomed>` and MIMIC `R01..R25` / `M01..M28`
+BIT_COLUMN_PATTERN = re.compile(r'g2_\d+|[RM]\d{2}')
+META_FILE = 'meta.json'
+BITS_FILE = 'labels.bits.npy'
+KEY_COLUMNS = ('patient_id', 'study_id')  # record IDs looked up by the apps
+
+
+def store_path(csv_path):
+    """Store directory next to a CSV: ./wtd/x.csv -> ./wtd/x.store"""
+    return os.path.splitext(csv_path)[0] + '.store'
+
+
+def _source_stamp(csv_path):
+    stat = os.stat(csv_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def convert_csv(csv_path, out_dir=None):
+    """One-time conversion of a label/metadata CSV to the columnar store.
+
+    The store is written to a new directory and swapped in when complete: running apps keep
+    reading the old, memory-mapped files until they see the new meta.json.
+    """
+    import pandas as pd
+    from streamlit_utils.shard_store import replace_directory  # deferred: shard_store imports this module
+
+    out_dir = out_dir or store_path(csv_path)
+    tmp_dir = f'{out_dir}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    df = pd.read_csv(csv_path)
+
+    bit_columns = [col for col in df.columns if BIT_COLUMN_PATTERN.fullmatch(col)]
+    columns = {}
+    for col in df.columns:
+        if col in bit_columns:
+            continue
+        series = df[col]
+        if pd.api.types.is_numeric_dtype(series) and not series.isna().any():
+            values = pd.to_numeric(series, downcast='integer').to_numpy()
+            np.save(os.path.join(tmp_dir, f'{col}.npy'), values)
+            columns[col] = {'kind': 'numeric'}
+        else:
+            # Categorical dictionary: int32 codes plus utf-8 encoded categories
+            cat = pd.Categorical(series.astype('string').fillna(''))
+            np.save(os.path.join(tmp_dir, f'{col}.npy'), cat.codes.astype(np.int32))
+            cats = np.array([c.encode('utf-8') for c in cat.categories], dtype=bytes)
+            np.save(os.path.join(tmp_dir, f'{col}.cats.npy'), cats)
+            columns[col] = {'kind': 'category'}
+
+    # Sorted key index: memory-mapped by every app process instead of a per-process DataFrame index
+    keys = [col for col in KEY_COLUMNS if col in columns]
+    for col in keys:
+        if columns[col]['kind'] == 'numeric':
+            values = df[col].to_numpy().astype(np.int64)
+        else:
+            values = np.array([str(value).strip().encode('utf-8') for value in df[col]], dtype=bytes)
+        order = np.argsort(values, kind='stable').astype(np.int32)  # duplicates resolve to their first row
+        np.save(os.path.join(tmp_dir, f'{col}.keys.npy'), values[order])
+        np.save(os.path.join(tmp_dir, f'{col}.rows.npy'), order)
+
+    # Packed bit-matrix: one row of ceil(n_rows / 8) bytes per diagnosis column
+    flags = df[bit_columns].fillna(0).to_numpy().astype(bool).T
+    np.save(os.path.join(tmp_dir, BITS_FILE), np.packbits(flags, axis=1, bitorder='little'))
+
+    meta = {
+        'n_rows': len(df),
+        'column_order': list(df.columns),
+        'columns': columns,
+        'bit_columns': bit_columns,
+        'keys': keys,
+        'source': _source_stamp(csv_path),
+    }
+    with open(os.path.join(tmp_dir, META_FILE), 'w') as f:
+        json.dump(meta, f)
+    replace_directory(tmp_dir, out_dir)
+    return out_dir
+
+
+class LabelStore:
+    """Lazily memory-mapped view over a converted label/metadata table."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.n_rows = self.meta['n_rows']
+        self.bit_columns = self.meta['bit_columns']
+        self._bit_index = {col: ix for ix, col in enumerate(self.bit_columns)}
+        self._bits = None
+        self._arrays = {}
+
+    @property
+    def columns(self):
+        return self.meta['column_order']
+
+    @property
+    def bits(self):
+        """Packed (n_bit_columns, ceil(n_rows / 8)) uint8 matrix, bit order little."""
+        if self._bits is None:
+            self._bits = np.load(os.path.join(self.path, BITS_FILE), mmap_mode='r')
+        return self._bits
+
+    def column(self, name):
+        """One column as a NumPy array (categoricals decoded to strings)."""
+        if name in self._bit_index:
+            return self.unpack(self.bits[self._bit_index[name]]).astype(np.uint8)
+        if self.meta['columns'][name]['kind'] == 'category':
+            return np.asarray(self.categorical(name), dtype=object)
+        return np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+
+    def _array(self, name):
+        # Memory-mapped once per store; the pages are shared by every process reading the store
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+        return self._arrays[name]
+
+    def has_key(self, name):
+        return name in self.meta.get('keys', ())
+
+    def row(self, key_column, key):
+        """Row number of `key` in a key column (binary search of the mapped key index); raises KeyError."""
+        keys = self._array(f'{key_column}.keys')
+        try:
+            probe = int(key) if keys.dtype.kind in 'iu' else str(key).strip().encode('utf-8')
+        except ValueError:
+            raise KeyError(key) from None
+        ix = int(np.searchsorted(keys, probe))
+        if ix == len(keys) or keys[ix] != probe:
+            raise KeyError(key)
+        return int(self._array(f'{key_column}.rows')[ix])
+
+    def value(self, name, row):
+        """One cell, without materializing the column."""
+        if name in self._bit_index:
+            return int(self.bits[self._bit_index[name], row // 8] >> (row % 8) & 1)
+        value = self._array(name)[row]
+        if self.meta['columns'][name]['kind'] == 'category':
+            return bytes(self._array(f'{name}.cats')[value]).decode('utf-8')
+        return value.item()
+
+    def flags(self, row):
+        """{bit column: 0/1} of one row."""
+        values = self.bits[:, row // 8] >> (row % 8) & 1
+        return {col: int(value) for col, value in zip(self.bit_columns, values)}
+
+    def categorical(self, name):
+        import pandas as pd
+
+        codes = np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+        cats = np.load(os.path.join(self.path, f'{name}.cats.npy'))
+        return pd.Categorical.from_codes(np.asarray(codes), categories=np.char.decode(cats, 'utf-8'))
+
+    def frame(self, columns=None):
+        """DataFrame with only the requested columns read from disk."""
+        import pandas as pd
+
+        columns = self.columns if columns is None else list(columns)
+        data = {}
+        for col in columns:
+            if col in self._bit_index:
+                data[col] = self.column(col)
+            elif self.meta['columns'][col]['kind'] == 'category':
+                data[col] = self.categorical(col)
+            else:
+                data[col] = np.asarray(self.column(col))
+        return pd.DataFrame(data, columns=columns)
+
+    def unpack(self, packed):
+        return np.unpackbits(packed, count=self.n_rows, bitorder='little').astype(bool)
+
+    def packed(self, name):
+        return self.bits[self._bit_index[name]]
+
+    def mask(self, all_of=(), none_of=()):
+        """Row mask for `all_of == 1 & none_of == 0`, evaluated on packed bits."""
+        acc = np.full(self.bits.shape[1], 0xFF, dtype=np.uint8)
+        for name in all_of:
+            acc &= self.packed(name)
+        for name in none_of:
+            acc &= ~self.packed(name)
+        return self.unpack(acc)
+
+
+@functools.lru_cache(maxsize=8)
+def _open_store(path, meta_stamp):
+    return LabelStore(path)
+
+
+def open_store(csv_path):
+    """LabelStore for `csv_path` if a converted, up-to-date store exists, else None.
+
+    Stores are reused while their meta.json is unchanged; the CSV is re-checked on every call.
+    """
+    path = store_path(csv_path)
+    try:
+        stat = os.stat(os.path.join(path, META_FILE))
+    except FileNotFoundError:
+        return None
+    store = _open_store(path, (stat.st_ino, stat.st_mtime_ns, stat.st_size))
+    if os.path.exists(csv_path) and store.meta['source'] != _source_stamp(csv_path):
+        return None
+    return store
@@ -0,0 +1,129 @@
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+import numpy as np
+from streamlit_utils.preprocessing import N_LEADS
+from streamlit_utils.record_cache import file_stamp
+from streamlit_utils.wfdb_reader import WFDBSignal
+
+LOD_FACTOR = 4  # samples per bin grow 4x per level
+LOD_BASE = 16  # samples per bin of the first level: min + max per 16 samples is 1/8 of the raw size
+LOD_POINTS = 2000  # points per lead drawn at any zoom level
+BUILD_CHUNK = LOD_BASE * LOD_FACTOR ** 6  # raw samples read per step while building
+PYRAMID_CACHE_BYTES = 256 * 1024 * 1024
+
+
+class MinMaxPyramid:
+    """Per-lead min/max pyramid so any window of a recording draws at most ~LOD_POINTS points.
+
+    Level k (from 0) holds the min and max of bins of base * factor**k samples. Windows
+    short enough to draw raw are read directly from `read_raw(start, stop)` (a memory-mapped
+    record); windows too long for that but finer than level 0 are reduced from raw on the fly.
+    """
+
+    def __init__(self, read_raw, sig_len, fs, key, factor=LOD_FACTOR, base=LOD_BASE):
+        self.read_raw = read_raw
+        self.sig_len = sig_len
+        self.fs = fs
+        self.key = key
+        self.factor = factor
+        self.base = base
+        self.duration = sig_len / fs
+
+        # Level 0 streamed chunk by chunk, higher levels from the level below
+        chunk_size = base * max(1, BUILD_CHUNK // base)
+        mins, maxs = [], []
+        for start in range(0, sig_len, chunk_size):
+            chunk = read_raw(start, min(start + chunk_size, sig_len))
+            bins = np.arange(0, len(chunk), base)
+            mins.append(np.minimum.reduceat(chunk, bins, axis=0))
+            maxs.append(np.maximum.reduceat(chunk, bins, axis=0))
+        self.levels = [(np.concatenate(mins), np.concatenate(maxs))]
+        while len(self.levels[-1][0]) > 16:
+            low, high = self.levels[-1]
+            bins = np.arange(0, len(low), factor)
+            self.levels.append((np.minimum.reduceat(low, bins, axis=0), np.maximum.reduceat(high, bins, axis=0)))
+
+    @classmethod
+    def from_array(cls, signal, fs):
+        """Pyramid over an in-memory [T, C] signal."""
+        signal = np.ascontiguousarray(signal, dtype=np.float32)
+        key = hashlib.blake2b(signal.tobytes(), digest_size=16).hexdigest()
+        return cls(lambda start, stop: signal[start:stop], len(signal), fs, key)
+
+    @property
+    def nbytes(self):
+        return sum(low.nbytes + high.nbytes for low, high in self.levels)
+
+    def query(self, start, stop, max_points=LOD_POINTS):
+        """(time in s, values [n, C]) of seconds [start, stop) with n <= ~max_points."""
+        first = max(0, int(start * self.fs))
+        last = min(self.sig_len, int(math.ceil(stop * self.fs)))
+        n = last - first
+        if n <= max_points:
+            return (first + np.arange(n)) / self.fs, self.read_raw(first, last)
+
+        # Finest detail that still fits: each bin contributes its min and its max
+        needed = n / (max_points / 2)
+        if needed <= self.base:
+            # Finer than level 0: at most base * max_points / 2 raw samples, reduced here
+            bin_size = int(math.ceil(needed))
+            b0, b1 = first // bin_size, int(math.ceil(last / bin_size))
+            raw = self.read_raw(b0 * bin_size, min(b1 * bin_size, self.sig_len))
+            bins = np.arange(0, len(raw), bin_size)
+            low, high = np.minimum.reduceat(raw, bins, axis=0), np.maximum.reduceat(raw, bins, axis=0)
+        else:
+            level = min(int(math.ceil(math.log(needed / self.base, self.factor))), len(self.levels) - 1)
+            bin_size = self.base * self.factor ** level
+            b0, b1 = first // bin_size, int(math.ceil(last / bin_size))
+            low, high = (values[b0:b1] for values in self.levels[level])
+        values = np.empty((2 * len(low), low.shape[1]), dtype=np.float32)
+        values[0::2] = low
+        values[1::2] = high
+        bin_start = (b0 + np.arange(len(low))) * bin_size
+        time = np.empty(len(values))
+        time[0::2] = bin_start / self.fs
+        time[1::2] = (bin_start + bin_size / 2) / self.fs
+        return time, values
+
+
+class PyramidCache:
+    """Process-wide LRU of pyramids keyed by (path, file stamps, leads), bounded by their total nbytes."""
+
+    def __init__(self, max_bytes=PYRAMID_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.n_bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, record_path, n_leads):
+        stamp = file_stamp(record_path)
+        key = (record_path, stamp, n_leads)
+        with self._lock:
+            pyramid = self._items.get(key)
+            if pyramid is not None:
+                self._items.move_to_end(key)
+                return pyramid
+        signal = WFDBSignal(record_path)
+        channels = list(range(min(n_leads, signal.n_sig))) # type: ignore
+        pyramid = MinMaxPyramid(
+            lambda start, stop: signal.window(start, stop, channels),
+            signal.sig_len, signal.fs, f'{record_path}:{hash(stamp)}'
+        )
+        with self._lock:
+            if key not in self._items and pyramid.nbytes <= self.max_bytes:
+                self._items[key] = pyramid
+                self.n_bytes += pyramid.nbytes
+                while self.n_bytes > self.max_bytes:
+                    _, evicted = self._items.popitem(last=False)
+                    self.n_bytes -= evicted.nbytes
+        return pyramid
+
+
+pyramid_cache = PyramidCache()
+
+
+def record_pyramid(record_path, n_leads=N_LEADS):
+    """Process-wide cached pyramid of a WFDB record, rebuilt when its files change."""
+    return pyramid_cache.get(record_path, n_leads)
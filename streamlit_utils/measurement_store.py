@@ -0,0 +1,173 @@
+import functools
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from streamlit_utils.measurements import MEASUREMENT_FIELDS, measure_batch, measure_record
+from streamlit_utils.preprocessing import N_LEADS
+from streamlit_utils.record_cache import CACHE_SECONDS, file_stamp, read_record
+from streamlit_utils.wfdb_reader import WFDBSignal
+
+MEASURE_SECONDS = CACHE_SECONDS  # every record is measured on the window the viewers already cache
+CHUNK_RECORDS = 64  # records per worker task; each task measures them as one batch per (fs, length)
+
+
+def measurement_path(csv_path):
+    """Measurement cache next to a catalog: ./wtd/x.csv -> ./wtd/x.measurements.sqlite"""
+    return os.path.splitext(csv_path)[0] + '.measurements.sqlite'
+
+
+def _stamp(record_path):
+    return json.dumps(file_stamp(record_path))
+
+
+class MeasurementStore:
+    """Per-record measurement cache in SQLite, keyed by record ID and checked against the record's file stamps.
+
+    Filled in bulk by build_measurements and on demand by record_measurements; read by
+    the viewers, the evaluator and cohort exports. WAL mode lets app processes read
+    while a catalog build writes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        columns = ', '.join(f'{field} REAL' for field in MEASUREMENT_FIELDS)
+        self._conn.execute(f'CREATE TABLE IF NOT EXISTS measurements ('
+                           f' record_id TEXT PRIMARY KEY, stamp TEXT, fs REAL, {columns}, r_peaks BLOB)')
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM measurements').fetchone()[0]
+
+    def stamps(self):
+        """{record_id: stamp} of every cached record (for incremental builds)."""
+        with self._lock:
+            return dict(self._conn.execute('SELECT record_id, stamp FROM measurements'))
+
+    def get(self, record_id, record_path=None):
+        """{field: value, 'r_peaks': samples, 'fs': fs} of a record, or None if missing or stale."""
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT stamp, fs, {", ".join(MEASUREMENT_FIELDS)}, r_peaks FROM measurements WHERE record_id = ?',
+                (str(record_id).strip(),)
+            ).fetchone()
+        if row is None or (record_path is not None and row[0] != _stamp(record_path)):
+            return None
+        values = {field: (np.nan if value is None else value) for field, value in zip(MEASUREMENT_FIELDS, row[2:-1])}
+        return {**values, 'r_peaks': np.frombuffer(row[-1], dtype='<i4'), 'fs': row[1]}
+
+    def put_many(self, rows):
+        """Upsert [(record_id, stamp, fs, values [len(MEASUREMENT_FIELDS)], r_peaks)] in one transaction."""
+        params = [
+            (str(record_id), stamp, float(fs), *[None if np.isnan(value) else float(value) for value in values],
+             np.asarray(peaks, dtype='<i4').tobytes())
+            for record_id, stamp, fs, values, peaks in rows
+        ]
+        placeholders = ', '.join('?' * (len(MEASUREMENT_FIELDS) + 4))
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(f'INSERT OR REPLACE INTO measurements VALUES ({placeholders})', params)
+            except sqlite3.Error:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def frame(self, record_ids=None):
+        """Measurements as a DataFrame indexed by record ID (all records, or `record_ids` that are cached)."""
+        import pandas as pd
+
+        query = f'SELECT record_id, {", ".join(MEASUREMENT_FIELDS)} FROM measurements'
+        with self._lock:
+            df = pd.read_sql_query(query, self._conn).set_index('record_id')
+        if record_ids is not None:
+            df = df.reindex([str(record_id) for record_id in record_ids]).dropna(how='all')
+        return df
+
+
+@functools.lru_cache(maxsize=8)
+def open_measurements(csv_path):
+    """MeasurementStore of a catalog, created on first use; None where it cannot be written."""
+    try:
+        return MeasurementStore(measurement_path(csv_path))
+    except sqlite3.Error:
+        return None
+
+
+def _read(record_path, seconds=MEASURE_SECONDS):
+    signal = WFDBSignal(record_path)
+    window = signal.window(0, int(seconds * signal.fs), range(min(N_LEADS, signal.n_sig))) # type: ignore
+    return window, signal.fs
+
+
+def measure_jobs(jobs):
+    """Worker: [(record_id, record_path, stamp)] -> ([(record_id, stamp, fs, values, r_peaks)], [(record_id, error)])."""
+    groups = {}
+    rows = []
+    errors = []
+    for record_id, record_path, stamp in jobs:
+        try:
+            window, fs = _read(record_path)
+        except Exception as e:
+            errors.append((record_id, f'{type(e).__name__}: {e}'))
+            continue
+        groups.setdefault((fs, window.shape), []).append((record_id, stamp, window))
+    for (fs, _), members in groups.items():
+        values, peaks = measure_batch(np.stack([window for _, _, window in members]), fs)
+        rows.extend((record_id, stamp, fs, value, peak) for (record_id, stamp, _), value, peak in zip(members, values, peaks))
+    return rows, errors
+
+
+def build_measurements(jobs, store, max_workers=None, chunk_records=CHUNK_RECORDS, rebuild=False, log=print):
+    """Measure `jobs` ([(record_id, record_path)]) in a process pool into `store`.
+
+    Incremental like build_shards: records whose files are unchanged since they were
+    measured are skipped. Results are committed per completed chunk, so an interrupted
+    run keeps what it finished. Returns a report dict.
+    """
+    cached = {} if rebuild else store.stamps()
+    todo = []
+    for record_id, record_path in jobs:
+        stamp = _stamp(record_path)
+        if cached.get(str(record_id)) != stamp:
+            todo.append((str(record_id), record_path, stamp))
+    report = {'total': len(jobs), 'skipped': len(jobs) - len(todo), 'written': 0, 'errors': []}
+    log(f'{report["skipped"]} of {len(jobs)} records up to date, {len(todo)} to measure')
+
+    chunks = [todo[start:start + chunk_records] for start in range(0, len(todo), chunk_records)]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for rows, errors in pool.map(measure_jobs, chunks):
+            store.put_many(rows)
+            report['written'] += len(rows)
+            report['errors'].extend(errors)
+            log(f'{report["written"]}/{len(todo)} measured')
+    return report
+
+
+@functools.lru_cache(maxsize=1024)
+def _measure_cached(record_path, stamp):
+    # In-process fallback when the catalog's store cannot be written
+    record = read_record(record_path, seconds=MEASURE_SECONDS)
+    return measure_record(record.p_signal, record.fs), record.fs
+
+
+def record_measurements(record_id, record_path, csv_path):
+    """Measurements of one catalog record: from the store if fresh, else computed once and written back."""
+    store = open_measurements(csv_path)
+    if store is not None:
+        cached = store.get(record_id, record_path)
+        if cached is not None:
+            return cached
+    stamp = _stamp(record_path)
+    measured, fs = _measure_cached(record_path, stamp)
+    if store is not None:
+        try:
+            store.put_many([(record_id, stamp, fs, [measured[field] for field in MEASUREMENT_FIELDS], measured['r_peaks'])])
+        except sqlite3.Error:
+            pass  # read-only catalog directory: the in-process cache still applies
+    return {**measured, 'fs': fs}
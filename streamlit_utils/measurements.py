@@ -0,0 +1,237 @@
+import numpy as np
+
+# Per-record values measure_batch returns, in this column order (NaN when undetermined)
+MEASUREMENT_FIELDS = ('n_beats', 'heart_rate', 'rr_ms', 'sdnn_ms', 'rmssd_ms', 'qrs_ms', 'pr_ms', 'qt_ms', 'qtc_ms')
+MEASUREMENT_UNITS = {
+    'n_beats': '', 'heart_rate': 'bpm', 'rr_ms': 'ms', 'sdnn_ms': 'ms', 'rmssd_ms': 'ms',
+    'qrs_ms': 'ms', 'pr_ms': 'ms', 'qt_ms': 'ms', 'qtc_ms': 'ms',
+}
+
+QRS_BAND = (5.0, 15.0)  # Hz, where QRS energy dominates P/T waves and baseline wander
+WAVE_BAND = (0.5, 40.0)  # Hz, for delineating the averaged beat
+INTEGRATION = 0.10  # s, moving-window integration of the QRS energy
+REFRACTORY = 0.20  # s, no two beats closer than this
+THRESHOLD = 0.3  # fraction of the 99th percentile of integrated energy a beat must reach
+BEAT_WINDOW = (0.40, 0.60)  # s before and after the R peak averaged into the template
+
+
+def band_pass(spectrum, n, fs, low, high):
+    """Zero-phase band-pass of the rfft `spectrum` of [..., n] samples (4th-order Butterworth magnitude)."""
+    from scipy import fft  # deferred like the other scipy users; float32 transforms, unlike numpy.fft
+
+    freqs = np.fft.rfftfreq(n, 1 / fs)
+    gain = 1 / np.sqrt(1 + (freqs / high) ** 8)
+    with np.errstate(divide='ignore'):
+        gain /= np.sqrt(1 + (low / freqs) ** 8)
+    gain[0] = 0
+    return fft.irfft(spectrum * gain.astype(np.float32), n=n, axis=-1, workers=-1)
+
+
+def signal_spectrum(signals):
+    """rfft of [..., n] samples along the last axis, shared by band_pass calls on the same signals."""
+    from scipy import fft
+
+    return fft.rfft(signals, axis=-1, workers=-1)
+
+
+def _moving_average(x, width):
+    # Centered running mean along the last axis via a cumulative sum
+    width = max(1, int(width))
+    c = np.cumsum(np.pad(x, [(0, 0)] * (x.ndim - 1) + [(width // 2 + 1, width - width // 2 - 1)], mode='edge'), axis=-1)
+    return (c[..., width:] - c[..., :-width]) / width
+
+
+def _window_max(x, radius):
+    """Running max of [..., T] over [t - radius, t + radius] in O(T log radius)."""
+    length = 2 * radius + 1
+    m = np.pad(x, [(0, 0)] * (x.ndim - 1) + [(radius, radius)], constant_values=-np.inf)
+    span = 1
+    while span * 2 <= length:
+        m = np.maximum(m[..., :-span], m[..., span:])
+        span *= 2
+    rest = length - span
+    return np.maximum(m[..., :x.shape[-1]], m[..., rest:rest + x.shape[-1]])
+
+
+def detect_beats(signals, fs, spectrum=None):
+    """R peaks of a batch [N, C, T] as flat (record index, sample index) arrays sorted by record then time.
+
+    Band-passed leads are differentiated, squared and summed (spatial velocity), then
+    integrated; peaks are local maxima over the refractory period above a per-record
+    threshold, moved to the largest combined |QRS-band| amplitude within +-60 ms.
+    """
+    spectrum = signal_spectrum(signals) if spectrum is None else spectrum
+    qrs = band_pass(spectrum, signals.shape[-1], fs, *QRS_BAND)
+    energy = (np.diff(qrs, axis=-1, prepend=qrs[..., :1]) ** 2).sum(axis=1)
+    energy = _moving_average(energy, INTEGRATION * fs)
+    threshold = THRESHOLD * np.percentile(energy, 99, axis=-1, keepdims=True)
+    peaks = (energy == _window_max(energy, int(REFRACTORY * fs))) & (energy > threshold)
+    peaks[:, 1:] &= energy[:, 1:] > energy[:, :-1]  # one sample per plateau
+    records, samples = np.nonzero(peaks)
+
+    amplitude = np.abs(qrs).sum(axis=1)
+    radius = int(0.06 * fs)
+    offsets = np.arange(-radius, radius + 1)
+    around = np.clip(samples[:, None] + offsets, 0, signals.shape[-1] - 1)
+    samples = around[np.arange(len(samples)), amplitude[records[:, None], around].argmax(axis=1)]
+    return records, samples
+
+
+def _group_stats(values, groups, n_groups):
+    # Per-group count, mean, std and median of a flat array sorted by group
+    count = np.bincount(groups, minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(groups, values, minlength=n_groups) / count
+        var = np.bincount(groups, (values - mean[groups]) ** 2, minlength=n_groups) / count
+    order = np.lexsort((values, groups))
+    starts = np.concatenate([[0], np.cumsum(count)[:-1]])
+    lo = values[order][np.minimum(starts + (count - 1) // 2, len(values) - 1)] if len(values) else np.zeros(n_groups)
+    hi = values[order][np.minimum(starts + count // 2, len(values) - 1)] if len(values) else np.zeros(n_groups)
+    median = np.where(count > 0, (lo + hi) / 2, np.nan)
+    return count, mean, np.sqrt(var), median
+
+
+def _in_window(width, lo, hi):
+    # [N, width] mask of lo <= index < hi, per record
+    index = np.arange(width)
+    return (index >= lo[:, None]) & (index < hi[:, None])
+
+
+def _first(mask, lo, hi):
+    """First index in [lo, hi) where mask holds, per record; -1 if none."""
+    hit = mask & _in_window(mask.shape[-1], lo, hi)
+    return np.where(hit.any(axis=-1), hit.argmax(axis=-1), -1)
+
+
+def _last(mask, lo, hi):
+    """Last index in [lo, hi) where mask holds, per record; -1 if none."""
+    width = mask.shape[-1]
+    hit = (mask & _in_window(width, lo, hi))[:, ::-1]
+    return np.where(hit.any(axis=-1), width - 1 - hit.argmax(axis=-1), -1)
+
+
+def _argmax_in(values, lo, hi):
+    return np.where(_in_window(values.shape[-1], lo, hi), values, -np.inf).argmax(axis=-1)
+
+
+def _floor(values, lo, hi):
+    # Minimum over [lo, hi) per record; the value at lo where the window is empty
+    floor = np.where(_in_window(values.shape[-1], lo, hi), values, np.inf).min(axis=-1)
+    return np.where(np.isfinite(floor), floor, _take(values, lo))
+
+
+def _take(values, index):
+    return values[np.arange(len(values)), np.clip(index, 0, values.shape[-1] - 1)]
+
+
+def delineate(templates, fs, rr):
+    """QRS onset/offset, T end and P onset of averaged beats [N, C, W] (R at BEAT_WINDOW[0]).
+
+    Threshold crossings on the spatial velocity (QRS) and on the spatial magnitude above
+    the QRS-onset level (P and T); returns (qrs, pr, qt) in samples, -1 where not found.
+    """
+    n, _, width = templates.shape
+    r = np.full(n, int(BEAT_WINDOW[0] * fs))
+    span = lambda seconds: int(seconds * fs)
+
+    velocity = _moving_average(np.abs(np.diff(templates, axis=-1, append=templates[..., -1:])).sum(axis=1), 0.01 * fs)
+    peak_velocity = _take(velocity, _argmax_in(velocity, r - span(0.06), r + span(0.06)))
+    quiet = velocity < 0.15 * peak_velocity[:, None]
+    onset = _last(quiet, r - span(0.12), r)
+    offset = _first(quiet, r, r + span(0.15))
+
+    baseline = templates[np.arange(n), :, np.clip(onset, 0, width - 1)]
+    magnitude = np.abs(templates - baseline[..., None]).sum(axis=1)
+
+    # T wave: peak magnitude after the ST segment, before the next beat
+    t_start = offset + span(0.06)
+    t_stop = np.minimum(width, r + np.nan_to_num(0.7 * rr, nan=width).astype(int))
+    t_peak = _argmax_in(magnitude, t_start, t_stop)
+    t_floor = _floor(magnitude, t_peak, t_stop)
+    t_level = t_floor + 0.2 * (_take(magnitude, t_peak) - t_floor)
+    t_end = np.where(t_stop > t_start, _first(magnitude <= t_level[:, None], t_peak, t_stop), -1)
+
+    # P wave: peak magnitude in the 300 ms before the QRS (and after the previous beat's T
+    # wave at fast rates), onset where it rises from its floor
+    previous_t_end = np.where(t_end >= 0, t_end - np.nan_to_num(rr, nan=width).astype(int), 0)
+    p_start = np.maximum(np.maximum(onset - span(0.30), previous_t_end), 0)
+    p_peak = _argmax_in(magnitude, p_start, onset - span(0.03))
+    p_amplitude = _take(magnitude, p_peak)
+    p_floor = _floor(magnitude, p_start, p_peak + 1)
+    p_onset = _last(magnitude <= (p_floor + 0.2 * (p_amplitude - p_floor))[:, None], p_start, p_peak)
+    has_p = p_amplitude - p_floor > 0.05 * _take(magnitude, r)  # no P wave in e.g. atrial fibrillation
+
+    found = (onset >= 0) & (offset >= 0)
+    qrs = np.where(found, offset - onset, -1)
+    qt = np.where(found & (t_end >= 0), t_end - onset, -1)
+    pr = np.where(found & has_p & (p_onset >= 0), onset - p_onset, -1)
+    return qrs, pr, qt
+
+
+def average_beats(signals, fs, records, samples, window=BEAT_WINDOW):
+    """Mean beat of each record over the detected beats whose `window` fits inside it.
+
+    signals [N, C, T], (records, samples) as from detect_beats; returns (record indices
+    that have at least one such beat, templates [n_present, C, W]) with R at window[0].
+    """
+    before, after = int(window[0] * fs), int(window[1] * fs)
+    fits = (samples >= before) & (samples + after <= signals.shape[-1])
+    beat_records, beat_samples = records[fits], samples[fits]
+    if not len(beat_records):
+        return beat_records, np.zeros((0, signals.shape[1], before + after), dtype=signals.dtype)
+    beats = signals[beat_records[:, None], :, beat_samples[:, None] + np.arange(-before, after)]  # [B, W, C]
+    present, starts = np.unique(beat_records, return_index=True)
+    templates = np.add.reduceat(beats, starts, axis=0) / np.diff(np.append(starts, len(beats)))[:, None, None]
+    return present, np.ascontiguousarray(np.swapaxes(templates, -1, -2))
+
+
+def measure_batch(p_signals, fs):
+    """Beat and interval measurements of N records sharing `fs`.
+
+    p_signals is a physical-unit batch [N, T, C] (or one record [T, C]); returns
+    (values [N, len(MEASUREMENT_FIELDS)] float32, [R-peak sample indices per record]).
+    Intervals come from the average of the beats that fit BEAT_WINDOW, so they are
+    estimates for review, not diagnostic measurements.
+    """
+    p_signals = np.asarray(p_signals, dtype=np.float32)
+    if p_signals.ndim == 2:
+        p_signals = p_signals[None]
+    signals = np.ascontiguousarray(np.swapaxes(np.nan_to_num(p_signals), -1, -2))  # [N, C, T]
+    n, n_leads, n_samples = signals.shape
+    values = np.full((n, len(MEASUREMENT_FIELDS)), np.nan, dtype=np.float32)
+    spectrum = signal_spectrum(signals)
+    records, samples = detect_beats(signals, fs, spectrum)
+
+    # RR statistics over consecutive beats of the same record
+    same = records[1:] == records[:-1]
+    rr = (np.diff(samples) / fs * 1000)[same]
+    rr_records = records[1:][same]
+    n_rr, rr_mean, sdnn, rr_median = _group_stats(rr, rr_records, n)
+    successive = same[1:] & same[:-1]
+    drr = np.diff(np.diff(samples) / fs * 1000)[successive]
+    count_drr, mean_sq, _, _ = _group_stats(drr ** 2, records[2:][successive], n)
+    values[:, 0] = np.bincount(records, minlength=n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values[:, 1] = np.where(n_rr > 0, 60000 / rr_median, np.nan)
+    values[:, 2] = np.where(n_rr > 0, rr_mean, np.nan)
+    values[:, 3] = np.where(n_rr > 1, sdnn, np.nan)
+    values[:, 4] = np.where(count_drr > 0, np.sqrt(mean_sq), np.nan)
+
+    wave = band_pass(spectrum, n_samples, fs, *WAVE_BAND)
+    present, templates = average_beats(wave, fs, records, samples)
+    if len(present):
+        qrs, pr, qt = delineate(templates, fs, rr_median[present] / 1000 * fs)
+        to_ms = lambda interval: np.where(interval >= 0, interval / fs * 1000, np.nan)
+        values[present, 5] = to_ms(qrs)
+        values[present, 6] = to_ms(pr)
+        values[present, 7] = to_ms(qt)
+        with np.errstate(invalid='ignore'):
+            values[present, 8] = values[present, 7] / np.sqrt(rr_median[present] / 1000)  # Bazett
+    peaks = np.split(samples, np.cumsum(np.bincount(records, minlength=n))[:-1])
+    return values, peaks
+
+
+def measure_record(p_signal, fs):
+    """{field: value} measurements of one [T, C] record plus its 'r_peaks' (sample indices)."""
+    values, peaks = measure_batch(p_signal, fs)
+    return {**{field: float(value) for field, value in zip(MEASUREMENT_FIELDS, values[0])}, 'r_peaks': peaks[0]}
@@ -0,0 +1,283 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import streamlit as st
+from streamlit_utils.bootstrap import matplotlib_agg
+from streamlit_utils.lod import LOD_POINTS
+
+LEAD_NAMES = ['I', 'II', 'III', 'aVR', 'aVL', 'aVF', 'V1', 'V2', 'V3', 'V4', 'V5', 'V6']
+LEAD_ORDER = [0, 3, 1, 4, 2, 5, 6, 9, 7, 10, 8, 11]  # I, aVR, II, aVL, III, aVF, V1, V4, V2, V5, V3, V6
+PNG_CACHE_BYTES = 64 * 1024 * 1024
+MAX_RENDERERS = 8  # one cached figure per distinct window duration
+PLOT_BACKENDS = {'png': 'Image (server)', 'vega': 'Interactive (browser)'}
+DEFAULT_BACKEND = os.environ.get('ECG_PLOT_BACKEND', 'png')
+
+
+class ByteLRU:
+    """Thread-safe LRU of bytes values bounded by total size."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.n_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._items:
+                self.n_bytes -= len(self._items.pop(key))
+            if len(value) > self.max_bytes:
+                return
+            self._items[key] = value
+            self.n_bytes += len(value)
+            while self.n_bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.n_bytes -= len(evicted)
+
+
+def grid_steps(duration):
+    """(major, minor) x-grid spacing in seconds: ECG paper up to 10 s, coarser for long windows."""
+    if duration <= 10:
+        return 0.2, 0.04  # 5 mm and 1 mm at 25 mm/s
+    for major in (1, 5, 10, 30, 60, 300, 600, 1800, 3600):
+        if duration / major <= 50:
+            return major, major / 5
+    return duration / 50, duration / 250
+
+
+class ECGRenderer:
+    """6x2 ECG-paper figure whose grid is rasterized once; only the 12 traces are redrawn."""
+
+    def __init__(self, duration=5.0, dpi=100):
+        Figure, FigureCanvasAgg = matplotlib_agg()
+        self.duration = duration
+        major, minor = grid_steps(duration)
+
+        # Figure (not pyplot) so nothing is registered globally and nothing leaks per rerun
+        self.fig = Figure(figsize=(10, 12), dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.fig)
+        axes = self.fig.subplots(6, 2, sharex=True, sharey=True).flatten()
+
+        self.lines = []
+        for subplot_idx, lead_idx in enumerate(LEAD_ORDER):
+            ax = axes[subplot_idx]
+            # Set light pink background to mimic ECG paper
+            ax.set_facecolor('#ffe6e6')
+
+            # Animated lines are left out of the cached background and drawn per record
+            line, = ax.plot([], [], color='red', linewidth=1, animated=True)
+            self.lines.append((line, lead_idx))
+
+            # Set title to lead name
+            ax.set_title(LEAD_NAMES[lead_idx], loc='left', fontsize=10, fontweight='bold')
+
+            # Major grid: 0.5 mV (5 mm) and 0.2 s (5 mm at 25 mm/s)
+            ax.grid(True, which='major', linestyle='-', linewidth=0.8, color='gray', alpha=0.7)
+            ax.set_yticks(np.arange(-2, 2.1, 0.5))  # 0.5 mV steps
+            ax.set_xticks(np.arange(0, duration + major, major))  # 0.2 s steps on 5 s windows
+
+            # Minor grid: 0.1 mV (1 mm) and 0.04 s (1 mm at 25 mm/s)
+            ax.grid(True, which='minor', linestyle=':', linewidth=0.4, color='gray', alpha=0.4)
+            ax.set_yticks(np.arange(-2, 2.1, 0.1), minor=True)
+            ax.set_xticks(np.arange(0, duration + minor, minor), minor=True)
+
+            # Hide tick labels
+            ax.set_xticklabels([])
+            ax.set_yticklabels([])
+
+            # Set axis limits
+            ax.set_ylim(-2, 2)  # Typical ECG range in mV
+            ax.set_xlim(0, duration)
+
+            # Remove spines for cleaner look
+            for spine in ax.spines.values():
+                spine.set_visible(False)
+
+        self.fig.tight_layout()
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._lock = threading.Lock()
+
+    def render(self, ecg, time=None):
+        """[12, n] signal (sampled evenly over the window, or at `time` seconds) -> RGBA array."""
+        if time is None:
+            time = np.linspace(0, self.duration, ecg.shape[-1])
+        with self._lock:
+            self.canvas.restore_region(self.background)
+            for line, lead_idx in self.lines:
+                line.set_data(time, ecg[lead_idx])
+                line.axes.draw_artist(line)
+            return np.array(self.canvas.buffer_rgba())
+
+    def render_png(self, ecg, time=None):
+        from PIL import Image
+
+        buf = io.BytesIO()
+        Image.fromarray(self.render(ecg, time)).save(buf, format='png', compress_level=1)
+        return buf.getvalue()
+
+
+_renderers = OrderedDict()
+_renderers_lock = threading.Lock()
+png_cache = ByteLRU(PNG_CACHE_BYTES)
+
+
+def get_renderer(duration=5.0):
+    """Process-wide renderer per window duration, shared across sessions."""
+    key = round(float(duration), 3)
+    with _renderers_lock:
+        if key not in _renderers:
+            _renderers[key] = ECGRenderer(key)
+            while len(_renderers) > MAX_RENDERERS:
+                _renderers.popitem(last=False)
+        _renderers.move_to_end(key)
+        return _renderers[key]
+
+
+def render_ecg_png(ecg, sampling_rate=100):
+    """PNG bytes of a [12, n_samples] ECG, cached by content hash."""
+    ecg = np.ascontiguousarray(ecg, dtype=np.float32)
+    key = hashlib.blake2b(ecg.tobytes(), digest_size=16).hexdigest() + str(ecg.shape)
+    png = png_cache.get(key)
+    if png is None:
+        png = get_renderer(ecg.shape[-1] / sampling_rate).render_png(ecg)
+        png_cache.put(key, png)
+    return png
+
+
+def render_ecg_window_png(pyramid, start, stop, max_points=None):
+    """PNG bytes of seconds [start, stop) of a MinMaxPyramid, drawn at a bounded point count."""
+    max_points = max_points or LOD_POINTS
+    key = f'{pyramid.key}:{start:.3f}:{stop:.3f}:{max_points}'
+    png = png_cache.get(key)
+    if png is None:
+        time, values = pyramid.query(start, stop, max_points)
+        png = get_renderer(stop - start).render_png(values.T, time - start)
+        png_cache.put(key, png)
+    return png
+
+
+def ecg_chart_data(ecg, time):
+    """Wide float32 frame (t plus one column per lead); streamlit ships it to the browser as Arrow."""
+    import pandas as pd
+
+    data = pd.DataFrame(np.asarray(ecg, dtype=np.float32).T, columns=LEAD_NAMES[:len(ecg)])
+    data.insert(0, 't', np.asarray(time, dtype=np.float32))
+    return data
+
+
+def ecg_chart_spec(start, stop):
+    """Vega-Lite spec of the 6x2 lead grid; grid, zoom and pan (shared x) run client-side."""
+    major, _ = grid_steps(stop - start)
+    return {
+        'transform': [{'fold': LEAD_NAMES, 'as': ['lead', 'mV']}],
+        'facet': {
+            'field': 'lead', 'type': 'nominal', 'sort': [LEAD_NAMES[ix] for ix in LEAD_ORDER],
+            'header': {'title': None, 'labelAnchor': 'start', 'labelFontWeight': 'bold', 'labelFontSize': 12},
+        },
+        'columns': 2,
+        'spec': {
+            'width': 330,
+            'height': 110,
+            'mark': {'type': 'line', 'color': 'red', 'strokeWidth': 1, 'clip': True},
+            'params': [{'name': 'zoom', 'select': {'type': 'interval', 'encodings': ['x']}, 'bind': 'scales'}],
+            'encoding': {
+                'x': {'field': 't', 'type': 'quantitative', 'scale': {'domain': [start, stop], 'nice': False},
+                      'axis': {'title': None, 'labels': False, 'ticks': False, 'tickMinStep': major, 'gridColor': 'gray', 'gridOpacity': 0.5}},
+                'y': {'field': 'mV', 'type': 'quantitative', 'scale': {'domain': [-2, 2]},
+                      'axis': {'title': None, 'labels': False, 'ticks': False, 'values': np.arange(-2, 2.1, 0.5).tolist(), 'gridColor': 'gray', 'gridOpacity': 0.5}},
+            },
+        },
+        'resolve': {'scale': {'x': 'shared', 'y': 'shared'}},
+        'config': {'view': {'fill': '#ffe6e6', 'stroke': None}, 'axis': {'domain': False}},
+    }
+
+
+def select_backend():
+    """Sidebar switch between the server-rendered image and the in-browser chart."""
+    options = list(PLOT_BACKENDS)
+    if st.session_state.get('plot_backend') not in options:
+        st.session_state.plot_backend = DEFAULT_BACKEND if DEFAULT_BACKEND in options else 'png'
+    return st.sidebar.radio('ECG renderer', options, format_func=PLOT_BACKENDS.get, key='plot_backend')
+
+
+def _backend(backend):
+    return backend or st.session_state.get('plot_backend', DEFAULT_BACKEND)
+
+
+def show_ecg(ecg, sampling_rate=100, backend=None):
+    """Drop-in for the old plt.subplots(6, 2) + st.pyplot block."""
+    if _backend(backend) == 'vega':
+        duration = ecg.shape[-1] / sampling_rate
+        time = np.arange(ecg.shape[-1]) / sampling_rate
+        st.vega_lite_chart(ecg_chart_data(ecg, time), ecg_chart_spec(0, duration), theme=None)
+    else:
+        st.image(render_ecg_png(ecg, sampling_rate), width='stretch')
+
+
+def show_ecg_window(pyramid, start, stop, backend=None):
+    """Zoomable view of an arbitrary window of a long recording."""
+    if _backend(backend) == 'vega':
+        time, values = pyramid.query(start, stop)
+        st.vega_lite_chart(ecg_chart_data(values.T, time), ecg_chart_spec(start, stop), theme=None)
+    else:
+        st.image(render_ecg_window_png(pyramid, start, stop), width='stretch')
+    st.caption(f'{start:.1f} s - {stop:.1f} s of {pyramid.duration:.1f} s')
+
+
+def _value(measured, field, fmt='{:.0f}'):
+    value = measured.get(field)
+    return '–' if value is None or np.isnan(value) else fmt.format(value)
+
+
+def show_measurements(measured, caption=None, intervals=True):
+    """Metric row of a measure_record / record_measurements result.
+
+    intervals=False shows heart rate only, for signals sampled too coarsely (e.g. the
+    100 Hz evaluator blobs) for QRS/PR/QT and beat-to-beat variability to be meaningful.
+    """
+    if not intervals:
+        st.metric('Heart rate', f"{_value(measured, 'heart_rate')} bpm")
+        st.caption(caption or f"{_value(measured, 'n_beats')} beats detected; automatic estimate, not a diagnosis")
+        return
+    heart_rate, rr, qrs, pr, qt = st.columns(5)
+    heart_rate.metric('Heart rate', f"{_value(measured, 'heart_rate')} bpm")
+    rr.metric('SDNN / RMSSD', f"{_value(measured, 'sdnn_ms')} / {_value(measured, 'rmssd_ms')} ms")
+    qrs.metric('QRS', f"{_value(measured, 'qrs_ms')} ms")
+    pr.metric('PR', f"{_value(measured, 'pr_ms')} ms")
+    qt.metric('QT / QTc', f"{_value(measured, 'qt_ms')} / {_value(measured, 'qtc_ms')} ms")
+    st.caption(caption or f"{_value(measured, 'n_beats')} beats detected; automatic estimates, not a diagnosis")
+
+
+def show_similar(index, record_id, ecg=None):
+    """"Similar ECGs" panel: k nearest records in a SimilarityIndex, optionally restricted to labels.
+
+    `ecg` (preprocessed [N_LEADS, N_SAMPLES]) is embedded on the fly when the record
+    is not in the index, e.g. it was added after the index was built.
+    """
+    with st.expander('Similar ECGs'):
+        k = st.slider('Number of results', 1, 50, 10, key='similar_k')
+        labels = index.vocabulary()
+        chosen = st.multiselect('Only records labelled', sorted(labels), key='similar_labels')
+        require_all = st.checkbox('With all of these labels', key='similar_all') if len(chosen) > 1 else False
+        if record_id not in index and ecg is None:
+            st.caption('This record is not in the similarity index.')
+            return
+        rows, scores = index.similar(record_id, ecg, k, [labels[label] for label in chosen], require_all)
+        st.dataframe(index.frame(rows, scores), hide_index=True, width='stretch')
+        st.caption(f'Cosine similarity of beat shape and spectrum over {len(index)} indexed records')
@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Shared by every session so idle sessions don't each hold their own threads
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='ecg-prefetch')
+
+
+class PrefetchingRecordCache:
+    """Bounded LRU of fetched records keyed by document ID, filled ahead of navigation.
+
+    `fetch(doc_id)` runs in a background thread and should return everything the page
+    needs (document, decoded signal, warmed plot) so a switch is a dictionary lookup.
+    """
+
+    def __init__(self, fetch, capacity=32, n_latencies=100):
+        self.fetch = fetch
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.latencies = deque(maxlen=n_latencies)
+        self._futures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _submit(self, doc_id):
+        # Caller holds the lock
+        future = self._futures.get(doc_id)
+        if future is None or (future.done() and future.exception() is not None):
+            future = _executor.submit(self.fetch, doc_id)
+            self._futures[doc_id] = future
+        self._futures.move_to_end(doc_id)
+        while len(self._futures) > self.capacity:
+            self._futures.popitem(last=False)
+        return future
+
+    def get(self, doc_id):
+        """Record for `doc_id`, waiting for an in-flight prefetch or fetching it now."""
+        start = time.perf_counter()
+        with self._lock:
+            future = self._futures.get(doc_id)
+            if future is not None and future.done() and future.exception() is None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            future = self._submit(doc_id)
+        try:
+            return future.result()
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+    def prefetch(self, doc_ids):
+        with self._lock:
+            for doc_id in doc_ids:
+                self._submit(doc_id)
+
+    def invalidate(self, doc_id):
+        with self._lock:
+            self._futures.pop(doc_id, None)
+
+    def stats(self):
+        n = self.hits + self.misses
+        latencies = sorted(self.latencies)
+        return {
+            'hit_rate': self.hits / n if n else 0.0,
+            'last_ms': self.latencies[-1] * 1000 if latencies else 0.0,
+            'median_ms': latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+            'cached': len(self._futures),
+        }
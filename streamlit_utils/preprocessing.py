@@ -0,0 +1,49 @@
+import math
+import numpy as np
+
+N_LEADS = 12
+TARGET_FS = 100
+DURATION = 5
+N_SAMPLES = TARGET_FS * DURATION  # 500 samples per lead after downsampling
+
+
+def crop(p_signal, fs, duration=DURATION, n_leads=N_LEADS):
+    """First `duration` seconds of the first `n_leads` leads as float32 [..., T, C]."""
+    return np.asarray(p_signal[..., :int(fs * duration), :n_leads], dtype=np.float32)
+
+
+def downsample(window, fs, target_fs=TARGET_FS):
+    """Resample [..., T, C] from fs to target_fs and return lead-major [..., C, T']."""
+    fs = int(fs)
+    if fs % target_fs == 0:
+        # Integer factor: one reshape-and-mean over every lead at once
+        factor = fs // target_fs
+        n_out = window.shape[-2] // factor
+        window = window[..., :n_out * factor, :]
+        out = window.reshape(*window.shape[:-2], n_out, factor, window.shape[-1]).mean(axis=-2)
+    else:
+        # Arbitrary rate: polyphase FIR resampling along the time axis
+        from scipy.signal import resample_poly  # deferred: only non-integer rates need scipy
+
+        g = math.gcd(fs, target_fs)
+        out = resample_poly(window, target_fs // g, fs // g, axis=-2).astype(np.float32)
+    return np.ascontiguousarray(np.swapaxes(out, -1, -2))
+
+
+def preprocess_signal(p_signal, fs, duration=DURATION, n_leads=N_LEADS, target_fs=TARGET_FS):
+    """[T, C] physical signal -> [n_leads, duration * target_fs] float32."""
+    out = downsample(crop(p_signal, fs, duration, n_leads), fs, target_fs)
+    return out[..., :int(duration * target_fs)]
+
+
+def preprocess_record(record, duration=DURATION, n_leads=N_LEADS, target_fs=TARGET_FS):
+    """Preprocess a wfdb.Record (replacement of the old per-lead loop)."""
+    return preprocess_signal(record.p_signal, record.fs, duration, n_leads, target_fs)
+
+
+def preprocess_batch(signals, fs, duration=DURATION, n_leads=N_LEADS, target_fs=TARGET_FS):
+    """N records sharing `fs` ([N, T, C] array or list of [T, C]) -> [N, n_leads, T'] float32."""
+    if not isinstance(signals, np.ndarray):
+        n_crop = int(fs * duration)
+        signals = np.stack([crop(sig, fs, duration, n_leads)[:n_crop] for sig in signals])
+    return preprocess_signal(signals, fs, duration, n_leads, target_fs)
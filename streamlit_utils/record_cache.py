@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict, namedtuple
+import numpy as np
+from streamlit_utils.preprocessing import DURATION, N_LEADS
+from streamlit_utils.wfdb_reader import WFDBSignal
+
+RECORD_CACHE_BYTES = 256 * 1024 * 1024
+CACHE_SECONDS = 2 * DURATION  # room for time-warp margins around the displayed window
+# Decoded windows shared by every app process on the host; tmpfs keeps them in RAM once
+SHARED_CACHE_DIR = os.environ.get('ECG_RECORD_CACHE_DIR', os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'ecg_record_cache'))
+SHARED_CACHE_BYTES = 2 * 1024 * 1024 * 1024
+
+# Duck-types the parts of wfdb.Record the apps use; p_signal starts at `start` seconds
+CachedRecord = namedtuple('CachedRecord', ['p_signal', 'fs', 'sig_name', 'comments', 'sig_len', 'start'])
+
+
+def file_stamp(record_path):
+    """(extension, mtime_ns, size) of every file backing a WFDB record."""
+    stamp = []
+    for ext in ('.hea', '.mat', '.dat'):
+        try:
+            stat = os.stat(record_path + ext)
+        except FileNotFoundError:
+            continue
+        stamp.append((ext, stat.st_mtime_ns, stat.st_size))
+    return tuple(stamp)
+
+
+def decode_record(record_path, seconds=CACHE_SECONDS, start=0.0, n_leads=N_LEADS):
+    # Only the requested window of the first n_leads leads is read from disk
+    signal = WFDBSignal(record_path)
+    channels = range(min(n_leads, signal.n_sig)) # type: ignore
+    first = int(start * signal.fs) # type: ignore
+    p_signal = signal.window(first, first + int(seconds * signal.fs), channels) # type: ignore
+    p_signal.setflags(write=False)  # shared between sessions
+    return CachedRecord(p_signal, signal.fs, signal.sig_name[:n_leads], signal.comments, signal.sig_len, start)
+
+
+class SharedRecordStore:
+    """Decoded windows as .npy files in a directory every process maps, bounded in bytes.
+
+    One process decodes a window and the others map the same pages, so the cached
+    signal data costs RAM once per host instead of once per worker process. Files are
+    replaced atomically; the least recently used are removed when the directory grows
+    past `max_bytes` (a reader that has one mapped keeps it until it lets go). The
+    directory is created on the first write.
+    """
+
+    def __init__(self, directory=SHARED_CACHE_DIR, max_bytes=SHARED_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._written = 0  # bytes written since the directory size was last checked
+
+    def _path(self, key):
+        record_path, stamp, start, seconds = key
+        digest = hashlib.sha1(repr((os.path.abspath(record_path), stamp, start, seconds)).encode()).hexdigest()
+        return os.path.join(self.directory, digest)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path + '.json') as f:
+                meta = json.load(f)
+            p_signal = np.load(path + '.npy', mmap_mode='r')
+            os.utime(path + '.npy')  # recency for eviction
+        except (OSError, ValueError):
+            return None
+        return CachedRecord(p_signal, meta['fs'], meta['sig_name'], meta['comments'], meta['sig_len'], meta['start'])
+
+    def put(self, key, record):
+        """Write a decoded record and return it backed by the shared file; raises OSError if it can't."""
+        path = self._path(key)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        meta = {'fs': record.fs, 'sig_name': list(record.sig_name), 'comments': list(record.comments),
+                'sig_len': record.sig_len, 'start': record.start}
+        if self._written + record.p_signal.nbytes > self.max_bytes // 16:
+            self.evict()  # before writing, so the write fits
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Metadata first: a window is only visible once its .npy is in place
+            with open(tmp, 'w') as f:
+                json.dump(meta, f)
+            os.replace(tmp, path + '.json')
+            with open(tmp, 'wb') as f:
+                np.save(f, record.p_signal)
+            os.replace(tmp, path + '.npy')
+        except OSError:
+            # Typically ENOSPC: drop the metadata without a window and make room for the next write
+            if not os.path.exists(path + '.npy'):
+                _remove(path + '.json')
+            self.evict()
+            raise
+        finally:
+            _remove(tmp)
+        self._written += record.p_signal.nbytes
+        return self.get(key) or record
+
+    def evict(self):
+        """Remove least recently used windows until the directory is within max_bytes."""
+        self._written = 0
+        try:
+            listing = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return
+        entries = []
+        for entry in listing:
+            if entry.name.endswith('.npy'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path[:-4]))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for ext in ('.npy', '.json'):
+                _remove(path + ext)
+            total -= size
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class RecordCache:
+    """Process-wide LRU of decoded windows keyed by (path, file stamps, start, seconds), bounded in bytes.
+
+    With a SharedRecordStore, misses are looked up there before decoding and decoded
+    windows are written there, so the LRU holds views of pages shared between processes.
+    """
+
+    def __init__(self, max_bytes=RECORD_CACHE_BYTES, shared=None):
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.n_bytes = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, record_path, seconds=CACHE_SECONDS, start=0.0):
+        key = (record_path, file_stamp(record_path), start, seconds)
+        with self._lock:
+            record = self._items.get(key)
+            if record is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return record
+        record = self.shared.get(key) if self.shared is not None else None
+        with self._lock:
+            if record is not None:
+                self.shared_hits += 1
+            else:
+                self.misses += 1
+        if record is None:
+            record = decode_record(record_path, seconds, start)
+            if self.shared is not None:
+                try:
+                    record = self.shared.put(key, record)
+                except OSError:
+                    pass  # shared directory full or gone: keep the private copy
+        with self._lock:
+            if key not in self._items and record.p_signal.nbytes <= self.max_bytes:
+                self._items[key] = record
+                self.n_bytes += record.p_signal.nbytes
+                while self.n_bytes > self.max_bytes:
+                    _, evicted = self._items.popitem(last=False)
+                    self.n_bytes -= evicted.p_signal.nbytes
+                    self.evictions += 1
+        return record
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'shared_hits': self.shared_hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'records': len(self._items), 'bytes': self.n_bytes}
+
+
+# Without a writable shared directory every put fails and each process caches privately
+record_cache = RecordCache(shared=SharedRecordStore())
+
+
+def read_record(record_path, seconds=CACHE_SECONDS, start=0.0):
+    """Cached replacement of wfdb.rdrecord for `seconds` of a record from `start` seconds."""
+    return record_cache.get(record_path, seconds, start)
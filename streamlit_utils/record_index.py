@@ -0,0 +1,93 @@
+import functools
+import numpy as np
+from streamlit_utils.label_store import open_store
+
+WTD_CSV = './wtd/5_wtd_10seconds.csv'
+MIMIC_RECORDS_CSV = './mimic/record_list.csv'
+MIMIC_LABELS_CSV = './mimic/mimic_iv_v2.csv'
+
+
+def _read_table(csv_path, columns=None, dtype=None):
+    # Prefer the columnar store written by build_label_store.py, fall back to the CSV
+    store = open_store(csv_path)
+    if store is not None:
+        return store.frame(columns)
+    import pandas as pd  # only once per table: the loaders are cached
+
+    return pd.read_csv(csv_path, usecols=columns, dtype=dtype)
+
+
+@functools.lru_cache(maxsize=None)
+def load_wtd_table(csv_path=WTD_CSV, columns=None):
+    """WTD catalog indexed by patient_id, loaded once per process and column set."""
+    df = _read_table(csv_path, columns, dtype={'patient_id': str, 'record_path': str, 'dataset': 'category'})
+    label_cols = [col for col in df.columns if col.startswith('g2_')]
+    df[label_cols] = df[label_cols].fillna(0).astype(np.uint8)
+    return df.set_index('patient_id', drop=False)
+
+
+@functools.lru_cache(maxsize=None)
+def load_mimic_records(csv_path=MIMIC_RECORDS_CSV, columns=('study_id', 'path')):
+    """MIMIC-IV-ECG record list indexed by study_id, loaded once per process."""
+    df = _read_table(csv_path, columns, dtype={'study_id': np.int64, 'path': str})
+    return df.set_index('study_id', drop=False)
+
+
+@functools.lru_cache(maxsize=None)
+def load_mimic_labels(csv_path=MIMIC_LABELS_CSV):
+    """MIMIC label table (R01..R25 / M01..M28) indexed by study_id."""
+    df = _read_table(csv_path)
+    df['study_id'] = df['study_id'].astype(np.int64)
+    label_cols = [col for col in df.columns if col != 'study_id']
+    df[label_cols] = df[label_cols].fillna(0).astype(np.uint8)
+    return df.set_index('study_id')
+
+
+def _keyed_store(csv_path, key_column):
+    # Converted store with a key index: lookups then read mapped pages shared by all processes.
+    # Not cached here: open_store re-checks the store and its CSV on every call
+    store = open_store(csv_path)
+    return store if store is not None and store.has_key(key_column) else None
+
+
+def _row(df, key):
+    # Hashed index lookup; a duplicated key resolves to its first row like `.iloc[0]` did
+    loc = df.index.get_loc(key)
+    if not isinstance(loc, (int, np.integer)):
+        loc = np.flatnonzero(loc)[0] if isinstance(loc, np.ndarray) else loc.start
+    return df.iloc[loc]
+
+
+def wtd_record_path(patient_id, csv_path=WTD_CSV):
+    """Relative record path of a WTD patient; raises KeyError if unknown."""
+    store = _keyed_store(csv_path, 'patient_id')
+    if store is not None:
+        return store.value('record_path', store.row('patient_id', patient_id))
+    table = load_wtd_table(csv_path, ('patient_id', 'record_path'))
+    return _row(table, str(patient_id))['record_path']
+
+
+def wtd_label_row(patient_id, csv_path=WTD_CSV):
+    """{'g2_<code>': 0/1} diagnosis flags of a WTD patient."""
+    store = _keyed_store(csv_path, 'patient_id')
+    if store is not None:
+        return store.flags(store.row('patient_id', patient_id))
+    row = _row(load_wtd_table(csv_path), str(patient_id))
+    return {key: int(value) for key, value in row.items() if key.startswith('g2_')}
+
+
+def mimic_record_path(study_id, csv_path=MIMIC_RECORDS_CSV):
+    """Relative record path of a MIMIC study; raises KeyError if unknown."""
+    store = _keyed_store(csv_path, 'study_id')
+    if store is not None:
+        return store.value('path', store.row('study_id', study_id))
+    return _row(load_mimic_records(csv_path), int(study_id))['path']
+
+
+def mimic_label_row(study_id, csv_path=MIMIC_LABELS_CSV):
+    """{'R01': 0/1, ..., 'M28': 0/1} label flags of a MIMIC study."""
+    store = _keyed_store(csv_path, 'study_id')
+    if store is not None:
+        return store.flags(store.row('study_id', study_id))
+    row = _row(load_mimic_labels(csv_path), int(study_id))
+    return {key: int(value) for key, value in row.items()}
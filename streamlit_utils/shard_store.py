@@ -0,0 +1,254 @@
+import functools
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from streamlit_utils.app_utils import MIMIC_CODE_IDS, MIMIC_CODES, MIMIC_LABELS, WTD_CODE_IDS, WTD_CODES, WTD_LABELS, wtd_dx_codes
+from streamlit_utils.preprocessing import DURATION, N_LEADS, N_SAMPLES, preprocess_signal
+from streamlit_utils.record_cache import file_stamp
+from streamlit_utils.record_index import MIMIC_LABELS_CSV, MIMIC_RECORDS_CSV, WTD_CSV, load_mimic_records, load_wtd_table, mimic_label_row
+from streamlit_utils.wfdb_reader import WFDBSignal
+
+INDEX_FILE = 'index.json'
+SHARD_VERSION = 1
+SHARD_SIZE = 2048  # records per shard: 2048 * 12 * 500 float32 = 48 MB
+
+# Label vocabulary of each catalog: shard bit i is codes[i]
+VOCABULARIES = {
+    'wtd': (WTD_CODES, WTD_LABELS),
+    'mimic': (MIMIC_CODES, MIMIC_LABELS),
+}
+
+
+def shard_path(csv_path):
+    """Shard directory next to a catalog: ./wtd/x.csv -> ./wtd/x.shards"""
+    return os.path.splitext(csv_path)[0] + '.shards'
+
+
+def wtd_jobs(base_path, csv_path=WTD_CSV):
+    """(record_id, record_path) of every record in the WTD catalog."""
+    table = load_wtd_table(csv_path, ('patient_id', 'record_path'))
+    return [(str(pid), base_path + rel) for pid, rel in zip(table['patient_id'], table['record_path'])]
+
+
+def mimic_jobs(base_path, csv_path=MIMIC_RECORDS_CSV):
+    """(record_id, record_path) of every study in the MIMIC record list."""
+    table = load_mimic_records(csv_path)
+    return [(str(sid), base_path + rel) for sid, rel in zip(table['study_id'], table['path'])]
+
+
+def _stamp(record_path):
+    # JSON-comparable form of file_stamp
+    return [list(part) for part in file_stamp(record_path)]
+
+
+def record_code_ids(dataset, record_id, comments):
+    """Indices into VOCABULARIES[dataset] codes of a record's labels (WTD: header comments, MIMIC: label CSV)."""
+    if dataset == 'wtd':
+        return [WTD_CODE_IDS[code] for code in wtd_dx_codes(comments) if code in WTD_CODE_IDS]
+    try:
+        row = mimic_label_row(record_id, MIMIC_LABELS_CSV)
+    except KeyError:
+        row = {}
+    return [MIMIC_CODE_IDS[key] for key, value in row.items() if value == 1 and key in MIMIC_CODE_IDS]
+
+
+def preprocess_job(job):
+    """Worker: (record_id, record_path, dataset) -> (record_id, ecg, code ids, sig_len, fs, error).
+
+    Only the first DURATION seconds of the first N_LEADS leads are read; short records
+    and records with fewer leads are zero-padded to (N_LEADS, N_SAMPLES).
+    """
+    record_id, record_path, dataset = job
+    try:
+        signal = WFDBSignal(record_path)
+        channels = range(min(N_LEADS, signal.n_sig)) # type: ignore
+        window = signal.window(0, int(DURATION * signal.fs), channels) # type: ignore
+        ecg = np.zeros((N_LEADS, N_SAMPLES), dtype=np.float32)
+        out = preprocess_signal(window, signal.fs)
+        ecg[:out.shape[0], :out.shape[1]] = np.nan_to_num(out)
+        code_ids = record_code_ids(dataset, record_id, signal.comments)
+        return record_id, ecg, code_ids, signal.sig_len, signal.fs, None
+    except Exception as e:
+        return record_id, None, None, None, None, f'{type(e).__name__}: {e}'
+
+
+def _write_json(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _load_index(out_dir, dataset):
+    path = os.path.join(out_dir, INDEX_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            index = json.load(f)
+        if index.get('version') == SHARD_VERSION and index.get('dataset') == dataset:
+            return index
+    codes, _ = VOCABULARIES[dataset]
+    return {'version': SHARD_VERSION, 'dataset': dataset, 'codes': list(codes),
+            'shape': [N_LEADS, N_SAMPLES], 'shards': [], 'records': {}}
+
+
+def replace_directory(new_dir, out_dir):
+    """Swap a freshly built directory in for `out_dir`.
+
+    The old files are unlinked, not overwritten, so processes that have them
+    memory-mapped keep reading consistent data until they reopen.
+    """
+    old_dir = f'{out_dir}.old-{os.getpid()}'
+    if os.path.exists(out_dir):
+        os.replace(out_dir, old_dir)
+    os.replace(new_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def build_shards(dataset, jobs, out_dir, shard_size=SHARD_SIZE, max_workers=None, rebuild=False, log=print):
+    """Preprocess `jobs` ([(record_id, record_path)]) into memory-mappable shards under `out_dir`.
+
+    Incremental: records whose files are unchanged (mtime/size) since they were sharded
+    are skipped; changed ones are written to a new shard and the index repointed. The
+    index is replaced atomically after every completed shard, so an interrupted run
+    resumes from the last finished shard. A rebuild writes a new directory next to
+    `out_dir` and swaps it in when complete. Returns a report dict.
+    """
+    if rebuild:
+        tmp_dir = f'{out_dir}.tmp-{os.getpid()}'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        report = build_shards(dataset, jobs, tmp_dir, shard_size, max_workers, log=log)
+        replace_directory(tmp_dir, out_dir)
+        return report
+    os.makedirs(out_dir, exist_ok=True)
+    index_path = os.path.join(out_dir, INDEX_FILE)
+    index = _load_index(out_dir, dataset)
+    codes = index['codes']
+    records = index['records']
+
+    todo = []
+    stamps = {}
+    for record_id, record_path in jobs:
+        stamp = _stamp(record_path)
+        entry = records.get(record_id)
+        if entry is not None and entry['stamp'] == stamp:
+            continue
+        stamps[record_id] = stamp
+        todo.append((record_id, record_path, dataset))
+    report = {'total': len(jobs), 'skipped': len(jobs) - len(todo), 'written': 0, 'errors': []}
+    log(f'{report["skipped"]} of {len(jobs)} records up to date, {len(todo)} to preprocess')
+
+    signals = np.zeros((shard_size, N_LEADS, N_SAMPLES), dtype=np.float32)
+    flags = np.zeros((shard_size, len(codes)), dtype=bool)
+    pending = []
+
+    def flush():
+        if not pending:
+            return
+        n = len(pending)
+        name = f'shard-{len(index["shards"]):05d}'
+        # Arrays first, then the index that points at them
+        np.save(os.path.join(out_dir, f'{name}.signals.npy'), signals[:n])
+        np.save(os.path.join(out_dir, f'{name}.bits.npy'), np.packbits(flags[:n], axis=1, bitorder='little'))
+        index['shards'].append({'name': name, 'n': n})
+        for row, (record_id, sig_len, fs) in enumerate(pending):
+            records[record_id] = {'shard': len(index['shards']) - 1, 'row': row, 'stamp': stamps[record_id],
+                                  'sig_len': sig_len, 'fs': fs}
+        _write_json(index_path, index)
+        report['written'] += n
+        log(f'{name}: {n} records ({report["written"]}/{len(todo)})')
+        pending.clear()
+        flags[:] = False
+
+    chunksize = max(1, min(64, len(todo) // (4 * (max_workers or os.cpu_count() or 1)) or 1))
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for record_id, ecg, code_ids, sig_len, fs, error in pool.map(preprocess_job, todo, chunksize=chunksize):
+            if error is not None:
+                report['errors'].append((record_id, error))
+                continue
+            row = len(pending)
+            signals[row] = ecg
+            flags[row, code_ids] = True
+            pending.append((record_id, int(sig_len), float(fs)))
+            if len(pending) == shard_size:
+                flush()
+    flush()
+    if not os.path.exists(index_path):
+        _write_json(index_path, index)
+
+    live = {entry['shard'] for entry in records.values()}
+    report['stale_shards'] = [shard['name'] for ix, shard in enumerate(index['shards']) if ix not in live]
+    return report
+
+
+class ShardStore:
+    """Read side of a shard directory: each record is a zero-copy slice of a memory-mapped shard."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX_FILE)) as f:
+            self.index = json.load(f)
+        self.records = self.index['records']
+        self.codes = self.index['codes']
+        self._labels = VOCABULARIES[self.index['dataset']][1]
+        self._arrays = {}
+
+    def __contains__(self, record_id):
+        return str(record_id).strip() in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def _shard(self, ix):
+        if ix not in self._arrays:
+            name = self.index['shards'][ix]['name']
+            self._arrays[ix] = (
+                np.load(os.path.join(self.path, f'{name}.signals.npy'), mmap_mode='r'),
+                np.load(os.path.join(self.path, f'{name}.bits.npy'), mmap_mode='r'),
+            )
+        return self._arrays[ix]
+
+    def rows(self, shard, rows):
+        """(signals [n, N_LEADS, N_SAMPLES], packed label bits [n, bytes]) of `rows` of shard number `shard`."""
+        signals, bits = self._shard(shard)
+        return signals[rows], bits[rows]
+
+    def entry(self, record_id, record_path=None):
+        """Index entry of a record, or None if missing (or stale against `record_path`'s files)."""
+        entry = self.records.get(str(record_id).strip())
+        if entry is None or (record_path is not None and entry['stamp'] != _stamp(record_path)):
+            return None
+        return entry
+
+    def signal(self, record_id, record_path=None):
+        """Read-only [N_LEADS, N_SAMPLES] view into the shard, or None if not (freshly) sharded."""
+        entry = self.entry(record_id, record_path)
+        if entry is None:
+            return None
+        return self._shard(entry['shard'])[0][entry['row']]
+
+    def code_ids(self, record_id):
+        entry = self.records[str(record_id).strip()]
+        bits = self._shard(entry['shard'])[1][entry['row']]
+        return np.flatnonzero(np.unpackbits(bits, count=len(self.codes), bitorder='little'))
+
+    def labels(self, record_id):
+        return [self._labels[self.codes[ix]] for ix in self.code_ids(record_id)]
+
+
+@functools.lru_cache(maxsize=8)
+def _open_shards(path, index_stamp):
+    return ShardStore(path)
+
+
+def open_shards(csv_path):
+    """ShardStore built from `csv_path`'s catalog, or None; reopened when the index changes."""
+    path = shard_path(csv_path)
+    try:
+        stat = os.stat(os.path.join(path, INDEX_FILE))
+    except FileNotFoundError:
+        return None
+    return _open_shards(path, (stat.st_ino, stat.st_mtime_ns, stat.st_size))
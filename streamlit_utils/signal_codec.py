@@ -0,0 +1,59 @@
+import zlib
+import numpy as np
+
+# Firestore layout: `signal_blob` (bytes) + `signal_codec` + `signal_version` + `shape` (+ `signal_gain`)
+SIGNAL_VERSION = 1
+INT16_GAIN = 1000  # counts per mV: 1 uV resolution, +/-32.7 mV range
+CODECS = ('int16', 'int16-delta-zlib', 'float32', 'float32-zlib')
+DEFAULT_CODEC = 'int16-delta-zlib'
+
+
+def encode_signal(ecg, codec=DEFAULT_CODEC, gain=INT16_GAIN):
+    """[12, 500] ECG -> Firestore fields holding a compact binary signal."""
+    ecg = np.asarray(ecg, dtype=np.float32)
+    if codec.startswith('int16'):
+        counts = np.clip(np.rint(ecg * gain), -32768, 32767).astype('<i2')
+        if codec == 'int16-delta-zlib':
+            # First sample of each lead kept as is, then sample-to-sample differences
+            counts = np.diff(counts, axis=-1, prepend=0).astype('<i2')
+            blob = zlib.compress(counts.tobytes(), 6)
+        else:
+            blob = counts.tobytes()
+    elif codec == 'float32':
+        blob = ecg.astype('<f4').tobytes()
+    elif codec == 'float32-zlib':
+        blob = zlib.compress(ecg.astype('<f4').tobytes(), 6)
+    else:
+        raise ValueError(f'Unknown signal codec "{codec}", expected one of {CODECS}')
+
+    fields = {
+        "signal_blob": blob,
+        "signal_codec": codec,
+        "signal_version": SIGNAL_VERSION,
+        "shape": list(ecg.shape),
+    }
+    if codec.startswith('int16'):
+        fields["signal_gain"] = gain
+    return fields
+
+
+def decode_signal(doc):
+    """Firestore document dict -> float32 ECG; reads legacy `signals_flat` documents too."""
+    shape = doc.get('shape', [12, 500])
+    if 'signal_blob' not in doc:
+        return np.asarray(doc['signals_flat'], dtype=np.float32).reshape(shape)
+
+    if doc.get('signal_version', SIGNAL_VERSION) > SIGNAL_VERSION:
+        raise ValueError(f'Signal version {doc["signal_version"]} is newer than this reader ({SIGNAL_VERSION})')
+    codec = doc['signal_codec']
+    blob = bytes(doc['signal_blob'])
+    if codec.endswith('zlib'):
+        blob = zlib.decompress(blob)
+    if codec.startswith('int16'):
+        counts = np.frombuffer(blob, dtype='<i2').reshape(shape)
+        if codec == 'int16-delta-zlib':
+            counts = np.cumsum(counts, axis=-1, dtype=np.int16)
+        return counts.astype(np.float32) / np.float32(doc.get('signal_gain', INT16_GAIN))
+    if codec in ('float32', 'float32-zlib'):
+        return np.frombuffer(blob, dtype='<f4').reshape(shape).copy()
+    raise ValueError(f'Unknown signal codec "{codec}", expected one of {CODECS}')
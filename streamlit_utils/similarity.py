@@ -0,0 +1,260 @@
+import functools
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from streamlit_utils.measurements import WAVE_BAND, average_beats, band_pass, detect_beats, signal_spectrum
+from streamlit_utils.preprocessing import TARGET_FS
+from streamlit_utils.shard_store import VOCABULARIES, ShardStore, replace_directory
+
+INDEX_FILE = 'index.json'
+SIMILARITY_VERSION = 1
+EMBEDDING_DIM = 64
+FIT_RECORDS = 20000  # records sampled to fit the projection; more barely changes the components
+TEMPLATE_WINDOW = (0.25, 0.45)  # s around R: QRS, ST segment and most of the T wave
+SPECTRUM_BANDS = 25  # per-lead log-magnitude bands (2 Hz wide on the 12 x 500, 100 Hz arrays)
+QUERY_BLOCK = 65536  # embedding rows scored per step: 65536 * 64 float32 = 16 MB
+
+
+def similarity_path(csv_path):
+    """Similarity index next to a catalog: ./wtd/x.csv -> ./wtd/x.similarity"""
+    return os.path.splitext(csv_path)[0] + '.similarity'
+
+
+def features(ecgs, fs=TARGET_FS):
+    """Averaged beat and spectral summary of preprocessed ECGs.
+
+    ecgs is [N, C, T] (or one [C, T]) as stored in the shards; returns (templates
+    [N, C * W], bands [N, C * SPECTRUM_BANDS]). Records without a detected beat get
+    an all-zero template, so they are matched on their spectrum alone.
+    """
+    signals = np.nan_to_num(np.asarray(ecgs, dtype=np.float32))
+    if signals.ndim == 2:
+        signals = signals[None]
+    n, n_leads, n_samples = signals.shape
+    spectrum = signal_spectrum(signals)
+    records, samples = detect_beats(signals, fs, spectrum)
+    present, beats = average_beats(band_pass(spectrum, n_samples, fs, *WAVE_BAND), fs, records, samples, TEMPLATE_WINDOW)
+    templates = np.zeros((n, n_leads, beats.shape[-1]), dtype=np.float32)
+    templates[present] = beats
+    magnitude = np.abs(spectrum[..., 1:])  # without DC: offsets say nothing about morphology
+    width = magnitude.shape[-1] // SPECTRUM_BANDS
+    bands = np.log1p(magnitude[..., :width * SPECTRUM_BANDS].reshape(n, n_leads, SPECTRUM_BANDS, width).mean(axis=-1))
+    return templates.reshape(n, -1), bands.reshape(n, -1).astype(np.float32)
+
+
+class Projection:
+    """PCA of the concatenated features, each block scaled to unit total variance first.
+
+    Without the scaling the block with more columns (the templates) would dominate the
+    components. Embeddings are L2-normalised, so a dot product is a cosine similarity.
+    """
+
+    def __init__(self, mean, scales, components):
+        self.mean = mean
+        self.scales = scales
+        self.components = components
+
+    @classmethod
+    def fit(cls, blocks, dim=EMBEDDING_DIM):
+        centered = [block - block.mean(axis=0) for block in blocks]
+        scales = np.array([np.sqrt((block ** 2).sum(axis=1).mean()) or 1.0 for block in centered], dtype=np.float32)
+        x = np.concatenate([block / scale for block, scale in zip(blocks, scales)], axis=1)
+        mean = x.mean(axis=0)
+        _, _, vt = np.linalg.svd(x - mean, full_matrices=False)
+        return cls(mean.astype(np.float32), scales, np.ascontiguousarray(vt[:dim], dtype=np.float32))
+
+    def transform(self, blocks):
+        x = np.concatenate([block / scale for block, scale in zip(blocks, self.scales)], axis=1)
+        out = (x - self.mean) @ self.components.T
+        norm = np.linalg.norm(out, axis=1, keepdims=True)
+        return np.divide(out, norm, out=np.zeros_like(out), where=norm > 0).astype(np.float32)
+
+    def save(self, path):
+        np.savez(path, mean=self.mean, scales=self.scales, components=self.components)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['mean'], data['scales'], data['components'])
+
+
+def _shard_features(job):
+    # Worker: (shard directory, shard index, rows) -> feature blocks of those rows
+    path, shard, rows = job
+    return features(ShardStore(path).rows(shard, rows)[0])
+
+
+def _shard_embeddings(job):
+    # Worker: (shard directory, shard index, rows, projection arrays) -> embeddings of those rows
+    path, shard, rows, arrays = job
+    return Projection(*arrays).transform(_shard_features((path, shard, rows)))
+
+
+def build_similarity(shard_dir, out_dir, dim=EMBEDDING_DIM, fit_records=FIT_RECORDS, max_workers=None,
+                     seed=0, log=print):
+    """Embed every live record of the shard directory into a memory-mappable index at `out_dir`.
+
+    Two passes over the shards in a process pool: fit the projection on a random
+    sample, then embed every record in shard order. The index is written to a
+    temporary directory and swapped in whole, so apps that have the old one
+    memory-mapped keep reading it until they reopen. Returns a report dict.
+    """
+    shards = ShardStore(shard_dir)
+    entries = sorted((entry['shard'], entry['row'], record_id) for record_id, entry in shards.records.items())
+    if not entries:
+        raise ValueError(f'{shard_dir} has no records')
+    located = np.array([(shard, row) for shard, row, _ in entries], dtype=np.int64)
+    ids = np.array([record_id for _, _, record_id in entries])
+
+    def split(positions):
+        # `positions` (sorted) grouped by shard
+        return np.split(positions, np.flatnonzero(np.diff(located[positions, 0])) + 1)
+
+    def jobs(positions):
+        # One worker job per shard touched by `positions`, with that shard's rows
+        return [(shard_dir, int(located[part[0], 0]), located[part, 1]) for part in split(positions)]
+
+    rng = np.random.default_rng(seed)
+    sample = np.sort(rng.choice(len(entries), size=min(fit_records, len(entries)), replace=False))
+    tmp_dir = f'{out_dir}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        blocks = list(zip(*pool.map(_shard_features, jobs(sample))))
+        projection = Projection.fit([np.concatenate(block) for block in blocks], dim)
+        log(f'fitted {projection.components.shape[0]} components on {len(sample)} records')
+
+        embeddings = np.lib.format.open_memmap(os.path.join(tmp_dir, 'embeddings.npy'), mode='w+', dtype=np.float32,
+                                               shape=(len(entries), projection.components.shape[0]))
+        arrays = (projection.mean, projection.scales, projection.components)
+        shard_jobs = [job + (arrays,) for job in jobs(np.arange(len(entries)))]
+        for positions, out in zip(split(np.arange(len(entries))), pool.map(_shard_embeddings, shard_jobs)):
+            embeddings[positions] = out
+            log(f'{positions[-1] + 1}/{len(entries)} embedded')
+        embeddings.flush()
+        del embeddings
+
+    bits = np.concatenate([shards.rows(shard, rows)[1] for _, shard, rows, _ in shard_jobs])
+    np.save(os.path.join(tmp_dir, 'bits.npy'), np.ascontiguousarray(bits.T))
+    np.save(os.path.join(tmp_dir, 'ids.npy'), ids)
+    projection.save(os.path.join(tmp_dir, 'projection.npz'))
+    with open(os.path.join(tmp_dir, INDEX_FILE), 'w') as f:
+        json.dump({'version': SIMILARITY_VERSION, 'dataset': shards.index['dataset'], 'codes': shards.codes,
+                   'n': len(entries), 'dim': int(projection.components.shape[0])}, f)
+
+    replace_directory(tmp_dir, out_dir)
+    return {'total': len(entries), 'fit': len(sample), 'dim': int(projection.components.shape[0])}
+
+
+class SimilarityIndex:
+    """Read side of a similarity directory: exact cosine k-NN by blocked scans of memory-mapped embeddings.
+
+    A scan of a few hundred thousand 64-dimensional rows is a handful of milliseconds
+    and needs no approximate structure, so results are exact. Label filters select
+    the matching rows first and only those are scored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX_FILE)) as f:
+            self.index = json.load(f)
+        if self.index.get('version') != SIMILARITY_VERSION:
+            raise ValueError(f'{path}: unsupported similarity index version {self.index.get("version")}')
+        self.codes = self.index['codes']
+        self._labels = VOCABULARIES[self.index['dataset']][1]
+        self.embeddings = np.load(os.path.join(path, 'embeddings.npy'), mmap_mode='r')
+        self.bits = np.load(os.path.join(path, 'bits.npy'), mmap_mode='r')  # [bytes, N]: one label byte is contiguous
+        self.ids = np.load(os.path.join(path, 'ids.npy'), mmap_mode='r')
+        self.projection = Projection.load(os.path.join(path, 'projection.npz'))
+        self._rows = None
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    def __contains__(self, record_id):
+        return self.row(record_id) is not None
+
+    def row(self, record_id):
+        if self._rows is None:
+            self._rows = {record_id: row for row, record_id in enumerate(self.ids.tolist())}
+        return self._rows.get(str(record_id).strip())
+
+    def embed(self, ecgs):
+        """Embeddings [N, dim] of preprocessed [N, C, T] (or one [C, T]) ECGs not in the index."""
+        return self.projection.transform(features(ecgs))
+
+    def _matching(self, code_ids, require_all):
+        hits = [(self.bits[code // 8] >> (code % 8)) & 1 for code in code_ids]
+        return np.flatnonzero(np.logical_and.reduce(hits) if require_all else np.logical_or.reduce(hits))
+
+    def search(self, vector, k=10, codes=(), require_all=False, exclude=None, block=QUERY_BLOCK):
+        """(rows, cosine similarities) of the k nearest records to an embedding, best first.
+
+        `codes` restricts results to records carrying any (or with `require_all`,
+        every) one of those label codes; `exclude` is a row to leave out (the query).
+        """
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        code_ids = [self.codes.index(code) for code in codes]
+        candidates = self._matching(code_ids, require_all) if code_ids else None
+        n = len(self) if candidates is None else len(candidates)
+        rows, scores = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.float32)]
+        for start in range(0, n, block):
+            stop = min(start + block, n)
+            if candidates is None:
+                block_rows = np.arange(start, stop)
+                score = self.embeddings[start:stop] @ vector
+            else:
+                block_rows = candidates[start:stop]
+                score = self.embeddings[block_rows] @ vector
+            if exclude is not None:
+                score[block_rows == exclude] = -np.inf
+            top = np.argpartition(score, -k)[-k:] if k < len(score) else np.arange(len(score))
+            top = top[np.isfinite(score[top])]
+            rows.append(block_rows[top])
+            scores.append(score[top])
+        rows, scores = np.concatenate(rows), np.concatenate(scores)
+        order = np.argsort(-scores, kind='stable')[:k]
+        return rows[order], scores[order]
+
+    def similar(self, record_id, ecg=None, k=10, codes=(), require_all=False):
+        """search() from a record: its stored embedding if indexed (excluding itself), else `ecg` embedded."""
+        row = self.row(record_id)
+        if row is None and ecg is None:
+            raise KeyError(record_id)
+        vector = self.embeddings[row] if row is not None else self.embed(ecg)[0]
+        return self.search(vector, k, codes, require_all, exclude=row)
+
+    def vocabulary(self):
+        """{label: code} of every code a search can be filtered by."""
+        return {self._labels[code]: code for code in self.codes}
+
+    def labels(self, row):
+        code_ids = np.flatnonzero(np.unpackbits(self.bits[:, row], count=len(self.codes), bitorder='little'))
+        return [self._labels[self.codes[ix]] for ix in code_ids]
+
+    def frame(self, rows, scores):
+        """Search results as a DataFrame for display: record ID, similarity, labels."""
+        import pandas as pd
+
+        return pd.DataFrame({
+            'record_id': [str(self.ids[row]) for row in rows],
+            'similarity': np.round(scores, 3),
+            'labels': [', '.join(self.labels(row)) for row in rows],
+        })
+
+
+@functools.lru_cache(maxsize=8)
+def _open_similarity(path, index_stamp):
+    return SimilarityIndex(path)
+
+
+def open_similarity(csv_path):
+    """SimilarityIndex built from `csv_path`'s shards, or None; reopened when the index is rebuilt."""
+    path = similarity_path(csv_path)
+    try:
+        stat = os.stat(os.path.join(path, INDEX_FILE))
+    except FileNotFoundError:
+        return None
+    return _open_similarity(path, (stat.st_ino, stat.st_mtime_ns, stat.st_size))
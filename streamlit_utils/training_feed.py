@@ -0,0 +1,253 @@
+import multiprocessing
+import queue
+import time
+from collections import namedtuple
+from multiprocessing import shared_memory
+import numpy as np
+from streamlit_utils.augment import augmented_view, crop_seconds
+from streamlit_utils.preprocessing import DURATION, N_LEADS, TARGET_FS
+from streamlit_utils.shard_store import VOCABULARIES, record_code_ids
+from streamlit_utils.wfdb_reader import WFDBSignal
+
+# x [B, N_LEADS, T] float32, y [B, n_codes] uint8 multi-hot, index [B] positions in `jobs`,
+# valid [B] False for padding rows of a short last batch and records that failed to read
+Batch = namedtuple('Batch', ['x', 'y', 'index', 'valid'])
+
+WORKER_TIMEOUT = 5.0  # seconds between liveness checks while waiting for a batch
+
+
+def _slot_layout(batch_size, n_codes, n_samples):
+    # (name, shape, dtype, byte offset) of each array in one slot, and the slot size
+    fields = [('x', (batch_size, N_LEADS, n_samples), np.float32), ('y', (batch_size, n_codes), np.uint8),
+              ('index', (batch_size,), np.int64), ('valid', (batch_size,), np.bool_)]
+    layout = []
+    offset = 0
+    for name, shape, dtype in fields:
+        offset = -(-offset // 64) * 64  # cache-line aligned
+        layout.append((name, shape, np.dtype(dtype).str, offset))
+        offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return layout, -(-offset // 64) * 64
+
+
+def _slot_views(buffer, layout, slot_bytes, n_slots):
+    return [
+        {name: np.ndarray(shape, dtype=dtype, buffer=buffer, offset=slot * slot_bytes + offset)
+         for name, shape, dtype, offset in layout}
+        for slot in range(n_slots)
+    ]
+
+
+def padded_window(record_path, seconds, n_leads=N_LEADS):
+    """(first `seconds` s of the first `n_leads` leads as [T, n_leads] float32, zero-padded; fs; comments)."""
+    signal = WFDBSignal(record_path)
+    n_crop = int(seconds * signal.fs)
+    window = signal.window(0, min(n_crop, signal.sig_len), range(min(n_leads, signal.n_sig))) # type: ignore
+    padded = np.zeros((n_crop, n_leads), dtype=np.float32)
+    padded[:len(window), :window.shape[1]] = np.nan_to_num(window)
+    return padded, signal.fs, signal.comments
+
+
+def fill_batch(slot, jobs, indices, dataset, rng, params, duration=DURATION):
+    """Read, crop, augment and downsample jobs[indices] into the slot arrays; returns [(record_id, error)].
+
+    Records are grouped by sampling rate so each group is one augmented_view call over [n, T, C].
+    """
+    slot['x'][:] = 0
+    slot['y'][:] = 0
+    slot['valid'][:] = False
+    slot['index'][:] = -1
+    slot['index'][:len(indices)] = indices
+    seconds = crop_seconds(duration, **params)
+    groups = {}
+    errors = []
+    for row, ix in enumerate(indices):
+        record_id, record_path = jobs[ix]
+        try:
+            window, fs, comments = padded_window(record_path, seconds)
+            slot['y'][row, record_code_ids(dataset, record_id, comments)] = 1
+        except Exception as e:
+            errors.append((record_id, f'{type(e).__name__}: {e}'))
+            continue
+        groups.setdefault(fs, []).append((row, window))
+    for fs, members in groups.items():
+        rows = [row for row, _ in members]
+        ecg = augmented_view(np.stack([window for _, window in members]), fs, rng, duration, **params)
+        slot['x'][rows, :, :ecg.shape[-1]] = ecg
+        slot['valid'][rows] = True
+    return errors
+
+
+def _worker(shm_name, layout, slot_bytes, n_slots, jobs, dataset, params, duration, tasks, done):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    slots = _slot_views(shm.buf, layout, slot_bytes, n_slots)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            slot, seed, batch_index, indices = task
+            try:
+                errors = fill_batch(slots[slot], jobs, indices, dataset, np.random.default_rng(seed), params, duration)
+                done.put((batch_index, slot, errors, None))
+            except Exception as e:
+                done.put((batch_index, slot, [], f'{type(e).__name__}: {e}'))
+    finally:
+        del slots
+        shm.close()
+
+
+class TrainingFeed:
+    """Multi-process iterator of augmented training batches over a WTD or MIMIC catalog.
+
+    `jobs` is [(record_id, record_path)] as from shard_store.wtd_jobs/mimic_jobs and `params`
+    the augment_batch keyword arguments; each record goes through augmented_view, the
+    transform the viewers display. Worker processes fill slots of one shared-memory block
+    and only slot numbers cross the queues; at most `prefetch` batches per worker are in
+    flight. Batch b of epoch e is augmented with default_rng([seed, e, b]), so the stream
+    is reproducible whatever the number of workers.
+
+    Yielded arrays are views into shared memory, valid until the next batch is requested;
+    pass copy=True to get owned arrays instead.
+    """
+
+    def __init__(self, jobs, dataset, batch_size=64, params=None, n_workers=4, prefetch=2, seed=0,
+                 shuffle=True, drop_last=False, duration=DURATION, target_fs=TARGET_FS, copy=False, mp_context=None):
+        if dataset not in VOCABULARIES:
+            raise ValueError(f'Unknown dataset "{dataset}", expected one of {sorted(VOCABULARIES)}')
+        self.jobs = list(jobs)
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.params = dict(params or {})
+        self.n_workers = n_workers
+        self.n_slots = n_workers * prefetch
+        self.seed = seed
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.duration = duration
+        self.copy = copy
+        self.codes = VOCABULARIES[dataset][0]
+        self.epoch = 0
+        self.errors = []
+        self.reset_stats()
+        self._context = multiprocessing.get_context(mp_context)
+        self._layout, self._slot_bytes = _slot_layout(batch_size, len(self.codes), int(duration * target_fs))
+        self._shm = None
+        self._workers = []
+
+    def __len__(self):
+        n, rest = divmod(len(self.jobs), self.batch_size)
+        return n + (1 if rest and not self.drop_last else 0)
+
+    def start(self):
+        """Allocate the shared block and start the workers (done on first iteration)."""
+        if self._shm is not None:
+            return
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, self._slot_bytes * self.n_slots))
+        self._slots = _slot_views(self._shm.buf, self._layout, self._slot_bytes, self.n_slots)
+        self._tasks = self._context.Queue()
+        self._done = self._context.Queue()
+        for _ in range(self.n_workers):
+            worker = self._context.Process(target=_worker, daemon=True, args=(
+                self._shm.name, self._layout, self._slot_bytes, self.n_slots, self.jobs,
+                self.dataset, self.params, self.duration, self._tasks, self._done,
+            ))
+            worker.start()
+            self._workers.append(worker)
+
+    def _batches(self, epoch):
+        order = np.arange(len(self.jobs))
+        if self.shuffle:
+            np.random.default_rng([self.seed, epoch]).shuffle(order)
+        return [order[start:start + self.batch_size] for start in range(0, len(self) * self.batch_size, self.batch_size)]
+
+    def _result(self):
+        while True:
+            try:
+                return self._done.get(timeout=WORKER_TIMEOUT)
+            except queue.Empty:
+                dead = [worker.exitcode for worker in self._workers if not worker.is_alive()]
+                if dead:
+                    raise RuntimeError(f'{len(dead)} training feed worker(s) exited (exit codes {dead})')
+
+    def __iter__(self):
+        """One epoch of Batch in shuffled order; abandoning it early waits for in-flight batches."""
+        self.start()
+        epoch = self.epoch
+        self.epoch += 1
+        batches = self._batches(epoch)
+        free = list(range(self.n_slots))
+        ready = {}
+        submitted = 0
+        in_flight = 0
+        last = time.perf_counter()
+        try:
+            for batch_index in range(len(batches)):
+                while free and submitted < len(batches):
+                    self._tasks.put((free.pop(), [self.seed, epoch, submitted], submitted, batches[submitted]))
+                    submitted += 1
+                    in_flight += 1
+                waited = time.perf_counter()
+                while batch_index not in ready:
+                    done_index, slot, errors, failure = self._result()
+                    in_flight -= 1
+                    if failure is not None:
+                        free.append(slot)
+                        raise RuntimeError(f'Batch {done_index} of epoch {epoch} failed: {failure}')
+                    self.errors.extend(errors)
+                    ready[done_index] = slot
+                self._counters['wait_seconds'] += time.perf_counter() - waited
+                slot = ready.pop(batch_index)
+                view = self._slots[slot]
+                batch = Batch(view['x'], view['y'], view['index'], view['valid'])
+                if self.copy:
+                    batch = Batch(*(array.copy() for array in batch))
+                self._counters['samples'] += int(view['valid'].sum())
+                self._counters['batches'] += 1
+                now = time.perf_counter()
+                self._counters['seconds'] += now - last
+                last = now
+                yield batch
+                free.append(slot)  # the consumer is done with the views once it asks for more
+        finally:
+            # Workers must not write into slots the next epoch hands out
+            while in_flight:
+                self._result()
+                in_flight -= 1
+            self._counters['seconds'] += time.perf_counter() - last
+
+    def reset_stats(self):
+        self._counters = {'samples': 0, 'batches': 0, 'seconds': 0.0, 'wait_seconds': 0.0}
+
+    def stats(self):
+        """Throughput so far: samples/s over iteration time and the share of it spent waiting for workers."""
+        counters = dict(self._counters)
+        seconds = counters['seconds'] or 1e-9
+        counters['samples_per_second'] = counters['samples'] / seconds
+        counters['wait_fraction'] = counters['wait_seconds'] / seconds
+        counters['errors'] = len(self.errors)
+        return counters
+
+    def close(self):
+        """Stop the workers and release the shared memory block."""
+        if self._shm is None:
+            return
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join(WORKER_TIMEOUT)
+            if worker.is_alive():
+                worker.terminate()
+        self._workers = []
+        self._slots = None
+        try:
+            self._shm.close()
+        except BufferError:
+            pass  # batches still referenced by the caller; the mapping goes when they do
+        self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
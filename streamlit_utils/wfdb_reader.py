@@ -0,0 +1,221 @@
+import os
+import re
+import tempfile
+from types import SimpleNamespace
+import numpy as np
+
+# WFDB storage formats that are plain interleaved integers: dtype, offset subtracted, invalid sample value
+MEMMAP_FORMATS = {
+    '16': ('<i2', 0, -32768),
+    '61': ('>i2', 0, -32768),
+    '32': ('<i4', 0, -2147483648),
+    '80': ('u1', 128, -128),
+    '160': ('<u2', 32768, -32768),
+}
+
+
+class WFDBSignal:
+    """Header-only handle on a WFDB record that reads sample windows on demand.
+
+    Signal files in a plain integer format are memory-mapped and only the requested
+    rows are converted to physical units (float32); other formats fall back to
+    wfdb.rdrecord with sampfrom/sampto/channels. With `buffers` ({file name: bytes}),
+    e.g. an upload, the signal files are read from memory instead of next to `record_path`.
+    """
+
+    def __init__(self, record_path, header=None, buffers=None):
+        self.record_path = record_path
+        if header is None:
+            header = read_header(record_path)
+        self.header = header
+        self.buffers = buffers
+        self.fs = self.header.fs
+        self.sig_len = self.header.sig_len
+        self.sig_name = list(self.header.sig_name) # type: ignore
+        self.comments = list(self.header.comments) # type: ignore
+        self.n_sig = self.header.n_sig
+        self.gain = np.asarray(self.header.adc_gain, dtype=np.float32)
+        self.baseline = np.asarray(self.header.baseline, dtype=np.float32)
+        self._maps = None
+        self.memmappable = self._check_memmappable()
+
+    def _check_memmappable(self):
+        header = self.header
+        if any(spf not in (None, 1) for spf in header.samps_per_frame or []): # type: ignore
+            return False
+        if any(skew for skew in header.skew or []): # type: ignore
+            return False
+        for file_name in set(header.file_name): # type: ignore
+            fmts = {fmt for name, fmt in zip(header.file_name, header.fmt) if name == file_name} # type: ignore
+            if len(fmts) != 1 or fmts.pop() not in MEMMAP_FORMATS:
+                return False
+        return True
+
+    def _file_maps(self):
+        # {file_name: (memmap [sig_len, n_in_file], format)} plus each signal's (file, column)
+        if self._maps is None:
+            header = self.header
+            directory = os.path.dirname(self.record_path)
+            files = {}
+            columns = []
+            for file_name, fmt, offset in zip(header.file_name, header.fmt, header.byte_offset): # type: ignore
+                if file_name not in files:
+                    files[file_name] = [fmt, offset or 0, 0]
+                columns.append((file_name, files[file_name][2]))
+                files[file_name][2] += 1
+            maps = {}
+            for file_name, (fmt, offset, n_in_file) in files.items():
+                dtype = MEMMAP_FORMATS[fmt][0]
+                if self.buffers is not None:
+                    buffer = self.buffers[file_name]
+                    data = np.frombuffer(buffer, dtype=dtype, offset=offset, count=(len(buffer) - offset) // np.dtype(dtype).itemsize)
+                else:
+                    data = np.memmap(os.path.join(directory, file_name), dtype=dtype, mode='r', offset=offset)
+                n_frames = min(len(data) // n_in_file, self.sig_len) # type: ignore
+                maps[file_name] = (data[:n_frames * n_in_file].reshape(n_frames, n_in_file), fmt)
+            self._maps = (maps, columns)
+        return self._maps
+
+    def window(self, start=0, stop=None, channels=None):
+        """Physical float32 samples [stop - start, len(channels)] of the record."""
+        stop = self.sig_len if stop is None else min(stop, self.sig_len)
+        start = max(0, min(start, stop)) # type: ignore
+        channels = list(range(self.n_sig)) if channels is None else list(channels) # type: ignore
+        if not self.memmappable:
+            return self._read_with_wfdb(start, stop, channels)
+
+        maps, columns = self._file_maps()
+        out = np.empty((stop - start, len(channels)), dtype=np.float32)
+        for ix, channel in enumerate(channels):
+            file_name, column = columns[channel]
+            data, fmt = maps[file_name]
+            _, shift, invalid = MEMMAP_FORMATS[fmt]
+            digital = data[start:stop, column].astype(np.float32)
+            if shift:
+                digital -= shift
+            digital[digital == invalid] = np.nan
+            out[:, ix] = (digital - self.baseline[channel]) / self.gain[channel]
+        return out
+
+    def _read_with_wfdb(self, start, stop, channels):
+        import wfdb
+
+        if self.buffers is None:
+            record = wfdb.rdrecord(self.record_path, sampfrom=start, sampto=stop, channels=channels, return_res=32)
+            return np.asarray(record.p_signal, dtype=np.float32) # type: ignore
+        # In-memory record in a format wfdb has to decode: one round-trip through a temp dir
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for file_name, buffer in self.buffers.items():
+                with open(os.path.join(tmp_dir, file_name), 'wb') as f:
+                    f.write(buffer)
+            record = wfdb.rdrecord(os.path.join(tmp_dir, os.path.basename(self.record_path)), sampfrom=start, sampto=stop, channels=channels, return_res=32)
+        return np.asarray(record.p_signal, dtype=np.float32) # type: ignore
+
+    def iter_windows(self, window_samples, channels=None, start=0, stop=None):
+        """Yield (start_sample, window) over the record in fixed-size windows."""
+        stop = self.sig_len if stop is None else min(stop, self.sig_len)
+        for begin in range(start, stop, window_samples): # type: ignore
+            yield begin, self.window(begin, min(begin + window_samples, stop), channels) # type: ignore
+
+
+SIMPLE_FORMAT = re.compile(r'^(\d+)(?:\+(\d+))?$')
+SIMPLE_GAIN = re.compile(r'^([-+\d.eE]+)(?:\((-?\d+)\))?(?:/(\S+))?$')
+
+
+def simple_header(header_text):
+    """Header fields of a plain single-segment `.hea` text without wfdb, or None.
+
+    Covers the layout of the WTD and MIMIC records (one file per record, no samples per
+    frame, skew or counter frequency, every signal field present); anything else returns
+    None and is left to wfdb. wfdb.rdheader parses signal lines through pandas and costs
+    ~20 ms per record, which dominates batch reads.
+    """
+    lines = [line.strip() for line in header_text.splitlines()]
+    comments = [line.strip(' \t#') for line in lines if line.startswith('#')]
+    lines = [line for line in lines if line and not line.startswith('#')]
+    if not lines or any('#' in line for line in lines):
+        return None
+    record = lines[0].split()
+    if len(record) < 4 or '/' in record[0] or '/' in record[2] or '(' in record[2]:
+        return None
+    try:
+        n_sig, fs, sig_len = int(record[1]), float(record[2]), int(record[3])
+        fields = {'file_name': [], 'fmt': [], 'byte_offset': [], 'adc_gain': [], 'baseline': [],
+                  'units': [], 'adc_res': [], 'adc_zero': [], 'init_value': [], 'checksum': [],
+                  'block_size': [], 'sig_name': []}
+        if len(lines) != n_sig + 1:
+            return None
+        for line in lines[1:]:
+            parts = line.split(maxsplit=8)
+            fmt, gain = SIMPLE_FORMAT.match(parts[1]), SIMPLE_GAIN.match(parts[2])
+            if len(parts) < 9 or fmt is None or gain is None or float(gain.group(1)) == 0:
+                return None
+            fields['file_name'].append(parts[0])
+            fields['fmt'].append(fmt.group(1))
+            fields['byte_offset'].append(int(fmt.group(2)) if fmt.group(2) else None)
+            fields['adc_gain'].append(float(gain.group(1)))
+            fields['adc_zero'].append(int(parts[4]))
+            fields['baseline'].append(int(gain.group(2)) if gain.group(2) else int(parts[4]))
+            fields['units'].append(gain.group(3) or 'mV')
+            fields['adc_res'].append(int(parts[3]))
+            fields['init_value'].append(int(parts[5]))
+            fields['checksum'].append(int(parts[6]))
+            fields['block_size'].append(int(parts[7]))
+            fields['sig_name'].append(parts[8])
+    except (ValueError, IndexError):
+        return None
+    return SimpleNamespace(record_name=record[0], n_sig=n_sig, fs=fs, sig_len=sig_len, comments=comments,
+                           samps_per_frame=[1] * n_sig, skew=[None] * n_sig, **fields)
+
+
+def read_header(record_path):
+    """Header of `record_path` (no extension): the plain-text fast path, else wfdb.rdheader."""
+    try:
+        with open(record_path + '.hea', encoding='ascii', errors='ignore') as f:
+            header = simple_header(f.read())
+    except FileNotFoundError:
+        header = None  # wfdb also resolves other locations (e.g. PhysioNet streaming)
+    if header is None:
+        import wfdb  # deferred: importing wfdb costs ~0.5 s at app start
+
+        header = wfdb.rdheader(record_path)
+    return header
+
+
+def header_from_text(header_text):
+    """wfdb.Record with the header fields of a single-segment `.hea` text (as wfdb.rdheader)."""
+    import wfdb
+    from wfdb.io import _header, header as wfdb_header
+
+    header_lines, comment_lines = wfdb_header.parse_header_content(header_text)
+    record_fields = _header._parse_record_line(header_lines[0])
+    if record_fields['n_seg'] is not None:
+        raise ValueError('Multi-segment records are not supported')
+    record = wfdb.Record()
+    if len(header_lines) > 1:
+        for field, value in _header._parse_signal_lines(header_lines[1:]).items():
+            setattr(record, field, value)
+    for field, value in record_fields.items():
+        if field != 'n_seg':
+            setattr(record, field, value)
+    record.comments = [line.strip(' \t#') for line in comment_lines]
+    return record
+
+
+def signal_from_bytes(record_name, header_bytes, buffers):
+    """WFDBSignal over an in-memory record: `.hea` bytes plus {signal file name: bytes}."""
+    header_text = header_bytes.decode('ascii', errors='ignore')
+    header = simple_header(header_text) or header_from_text(header_text)
+    missing = sorted(set(header.file_name) - set(buffers)) # type: ignore
+    if missing:
+        raise ValueError(f'Missing signal file(s) {", ".join(missing)} for record {record_name}')
+    # The header travels with the signal files in case wfdb has to decode them itself
+    return WFDBSignal(record_name, header=header, buffers={**buffers, record_name + '.hea': header_bytes})
+
+
+def read_window(record_path, start_seconds=0.0, seconds=None, channels=None):
+    """(physical float32 window, WFDBSignal) for `seconds` of a record from `start_seconds`."""
+    signal = WFDBSignal(record_path)
+    start = int(start_seconds * signal.fs) # type: ignore
+    stop = None if seconds is None else start + int(seconds * signal.fs) # type: ignore
+    return signal.window(start, stop, channels), signal
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from streamlit_utils.cohort import Cohort
+
+COLUMNS = ['g2_164889003', 'g2_164890007', 'g2_195080001', 'g2_164931005']
+LABELS = {
+    'g2_164889003': 'atrial fibrillation',
+    'g2_164890007': 'atrial flutter',
+    'g2_195080001': 'atrial fibrillation and flutter',
+    'g2_164931005': 'st elevation',
+}
+FLAGS = np.array([
+    [1, 0, 0, 1, 0, 0],
+    [0, 1, 0, 0, 0, 0],
+    [0, 0, 1, 0, 0, 1],
+    [1, 0, 1, 0, 1, 0],
+], dtype=bool)
+
+
+@pytest.fixture
+def cohort():
+    bits = np.packbits(FLAGS, axis=1, bitorder='little')
+    datasets = ['cpsc_2018', 'cpsc_2018', 'ptb', 'ptb', 'ptb', 'cpsc_2018']
+    return Cohort(np.arange(FLAGS.shape[1]), bits, COLUMNS, LABELS, datasets)
+
+
+def test_label_containing_and_is_one_term(cohort):
+    assert list(cohort.select('atrial fibrillation and flutter')) == [2, 5]
+    assert list(cohort.select('atrial fibrillation and flutter AND st elevation')) == [2]
+
+
+def test_lowercase_keywords_are_part_of_the_label(cohort):
+    with pytest.raises(ValueError, match='Unknown diagnosis "atrial fibrillation or st elevation"'):
+        cohort.query('atrial fibrillation or st elevation')
+
+
+def test_uppercase_keywords(cohort):
+    assert list(cohort.select('atrial fibrillation OR atrial flutter')) == [0, 1, 3]
+    assert list(cohort.select('st elevation AND NOT atrial fibrillation IN ptb')) == [2, 4]
+    assert list(cohort.select('(atrial flutter OR st elevation) IN cpsc_2018, ptb')) == [0, 1, 2, 4]
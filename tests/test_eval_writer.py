@@ -0,0 +1,68 @@
+import time
+import pytest
+from streamlit_utils import eval_writer as eval_writer_module
+from streamlit_utils.eval_writer import MAX_ATTEMPTS, EvalWriter
+
+
+class FakeCommits:
+    """Stands in for commit_evaluations: records committed record IDs, rejects batches containing `poison`."""
+
+    def __init__(self, poison=()):
+        self.poison = set(poison)
+        self.calls = 0
+        self.committed = []
+
+    def __call__(self, db, evals, record_collection, eval_collection):
+        self.calls += 1
+        rejected = [record_id for record_id, _, _ in evals if record_id in self.poison]
+        if rejected:
+            raise ValueError(f'invalid document {rejected[0]}')
+        self.committed.extend(record_id for record_id, _, _ in evals)
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def commits(monkeypatch):
+    fake = FakeCommits(poison={'bad'})
+    monkeypatch.setattr(eval_writer_module, 'commit_evaluations', fake)
+    return fake
+
+
+def open_writer(path):
+    return EvalWriter(None, path=path, flush_interval=0.01, max_backoff=0.001)
+
+
+def test_rejected_entry_does_not_stall_the_queue(tmp_path, commits):
+    writer = open_writer(str(tmp_path / 'queue.sqlite'))
+    for record_id in ('r1', 'bad', 'r2', 'r3'):
+        writer.submit(record_id, 'alice', {'fb_stars': 3})
+    wait_for(lambda: writer.stats()['failed'] == 1 and writer.stats()['pending'] == 0)
+    writer.submit('r4', 'alice', {'fb_stars': 1})
+    assert writer.flush()
+    writer.close()
+
+    assert sorted(commits.committed) == ['r1', 'r2', 'r3', 'r4']
+    assert writer.stats()['committed'] == 4
+    assert writer.failed() == [('bad', 'alice', 'ValueError: invalid document bad')]
+
+
+def test_failed_entries_are_requeued_on_the_next_start(tmp_path, commits):
+    path = str(tmp_path / 'queue.sqlite')
+    writer = open_writer(path)
+    writer.submit('bad', 'alice', {'fb_stars': 3})
+    wait_for(lambda: writer.stats()['failed'] == 1)
+    writer.close()
+    assert commits.calls == MAX_ATTEMPTS
+
+    commits.poison.clear()
+    writer = open_writer(path)
+    assert writer.flush()
+    writer.close()
+    assert commits.committed == ['bad']
+    assert writer.stats()['failed'] == 0
@@ -0,0 +1,85 @@
+import pytest
+from benchmarks.fake_firestore import FakeBatch, FakeFirestore
+from streamlit_utils import ingest as ingest_module
+from streamlit_utils.ingest import MAX_BATCH_SIZE, ingest, load_checkpoint
+
+
+class RecordingFirestore(FakeFirestore):
+    """FakeFirestore that records every commit's size and fails the commits numbered in `fail_on`."""
+
+    def __init__(self, fail_on=(), error=ConnectionError):
+        super().__init__()
+        self.fail_on = set(fail_on)
+        self.error = error
+        self.attempts = 0
+        self.batch_sizes = []
+        self.writes_per_doc = {}
+
+    def batch(self):
+        return RecordingBatch(self)
+
+
+class RecordingBatch(FakeBatch):
+    def commit(self):
+        self.client.attempts += 1
+        if self.client.attempts in self.client.fail_on:
+            raise self.client.error('transient')
+        super().commit()
+        self.client.batch_sizes.append(len(self.writes))
+        for _, doc_id, _, _ in self.writes:
+            self.client.writes_per_doc[doc_id] = self.client.writes_per_doc.get(doc_id, 0) + 1
+
+
+def jobs(n):
+    return [(f'rec{ix:05d}', ix) for ix in range(n)]
+
+
+def build_doc(payload):
+    return {'value': payload}
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(ingest_module.time, 'sleep', delays.append)
+    return delays
+
+
+def test_batches_never_exceed_firestore_limit(sleeps):
+    db = RecordingFirestore()
+    report = ingest(db, jobs(1234), 'ecg', build_doc, max_workers=4, batch_size=1000, log=lambda message: None)
+    assert report['committed'] == 1234
+    assert max(db.batch_sizes) <= MAX_BATCH_SIZE
+    assert sum(db.batch_sizes) == 1234
+    assert len(db.data['ecg']) == 1234
+
+
+def test_transient_errors_are_retried_with_backoff(sleeps):
+    db = RecordingFirestore(fail_on={1, 2, 3})
+    report = ingest(db, jobs(10), 'ecg', build_doc, max_workers=2, backoff=0.5, log=lambda message: None)
+    assert report['committed'] == 10
+    assert report['retries'] == 3
+    assert len(sleeps) == 3
+    # Jittered exponential backoff: attempt i waits in [backoff * 2**i, 2 * backoff * 2**i)
+    for attempt, delay in enumerate(sleeps):
+        assert 0.5 * 2 ** attempt <= delay < 0.5 * 2 ** (attempt + 1)
+
+
+def test_interrupted_run_resumes_from_checkpoint_without_duplicates(tmp_path, sleeps):
+    checkpoint = str(tmp_path / 'uploaded.txt')
+    db = RecordingFirestore(fail_on={3})  # third batch fails for good: the run stops part-way
+    with pytest.raises(ConnectionError):
+        ingest(db, jobs(250), 'ecg', build_doc, max_workers=2, batch_size=50, max_retries=0,
+               checkpoint_path=checkpoint, log=lambda message: None)
+    committed = load_checkpoint(checkpoint)
+    assert 0 < len(committed) < 250
+    assert committed == set(db.writes_per_doc)
+
+    db.fail_on = set()
+    report = ingest(db, jobs(250), 'ecg', build_doc, max_workers=2, batch_size=50,
+                    checkpoint_path=checkpoint, log=lambda message: None)
+    assert report['skipped'] == len(committed)
+    assert report['committed'] == 250 - len(committed)
+    assert len(db.data['ecg']) == 250
+    assert set(db.writes_per_doc.values()) == {1}
+    assert load_checkpoint(checkpoint) == {doc_id for doc_id, _ in jobs(250)}
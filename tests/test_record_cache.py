@@ -0,0 +1,52 @@
+import errno
+import os
+import numpy as np
+import pytest
+from streamlit_utils import record_cache as record_cache_module
+from streamlit_utils.record_cache import CachedRecord, RecordCache, SharedRecordStore
+
+
+def window(n_samples=1000, value=0.0):
+    p_signal = np.full((n_samples, 12), value, dtype=np.float32)
+    return CachedRecord(p_signal, 500, [f'L{ix}' for ix in range(12)], [], n_samples, 0.0)
+
+
+def key(name):
+    return (f'/records/{name}', (('.hea', 0, 0),), 0.0, 20.0)
+
+
+def test_directory_is_created_on_first_write(tmp_path):
+    directory = str(tmp_path / 'shared')
+    store = SharedRecordStore(directory)
+    assert not os.path.exists(directory)
+    assert store.get(key('a')) is None
+
+    record = store.put(key('a'), window())
+    assert os.path.isdir(directory)
+    assert isinstance(record.p_signal, np.memmap)
+
+
+def test_failed_write_leaves_no_files_and_makes_room(tmp_path, monkeypatch):
+    directory = str(tmp_path / 'shared')
+    store = SharedRecordStore(directory)
+    for name in ('a', 'b', 'c'):
+        store.put(key(name), window())
+    file_size = os.path.getsize(os.path.join(directory, os.listdir(directory)[0][:40] + '.npy'))
+    store.max_bytes = 2 * file_size  # the device is now "full"
+
+    def no_space(f, array):
+        f.write(b'partial')
+        raise OSError(errno.ENOSPC, 'No space left on device')
+
+    monkeypatch.setattr(record_cache_module.np, 'save', no_space)
+    with pytest.raises(OSError):
+        store.put(key('d'), window())
+    names = sorted(os.listdir(directory))
+    assert not [name for name in names if name.endswith('.tmp')]
+    assert len([name for name in names if name.endswith('.npy')]) == 2  # evicted down to max_bytes
+    assert {name[:-5] for name in names if name.endswith('.json')} == {name[:-4] for name in names if name.endswith('.npy')}
+
+    # The cache falls back to its private copy instead of failing the read
+    monkeypatch.setattr(record_cache_module, 'decode_record', lambda *args: window(value=1.0))
+    record = RecordCache(shared=store).get('/records/d')
+    assert record.p_signal[0, 0] == 1.0
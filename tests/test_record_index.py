@@ -0,0 +1,58 @@
+import os
+from streamlit_utils.label_store import convert_csv
+from streamlit_utils.record_index import _keyed_store, wtd_record_path
+
+
+def write_catalog(path, rows):
+    with open(path, 'w') as f:
+        f.write('patient_id,record_path,dataset,g2_164889003\n')
+        for patient_id, record_path in rows:
+            f.write(f'{patient_id},{record_path},cpsc_2018,0\n')
+
+
+def test_store_converted_after_first_lookup_is_used(tmp_path):
+    csv_path = str(tmp_path / 'catalog.csv')
+    write_catalog(csv_path, [('A0001', 'g1/A0001'), ('A0002', 'g1/A0002')])
+    assert _keyed_store(csv_path, 'patient_id') is None
+    assert wtd_record_path('A0002', csv_path) == 'g1/A0002'
+
+    convert_csv(csv_path)
+    store = _keyed_store(csv_path, 'patient_id')
+    assert store is not None
+    assert _keyed_store(csv_path, 'patient_id') is store
+    assert wtd_record_path('A0002', csv_path) == 'g1/A0002'
+
+
+def test_store_is_dropped_once_its_csv_changes(tmp_path):
+    csv_path = str(tmp_path / 'catalog.csv')
+    write_catalog(csv_path, [('A0001', 'g1/A0001')])
+    convert_csv(csv_path)
+    assert _keyed_store(csv_path, 'patient_id') is not None
+
+    write_catalog(csv_path, [('A0001', 'g1/A0001'), ('A0002', 'g1/A0002')])
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert _keyed_store(csv_path, 'patient_id') is None
+
+    convert_csv(csv_path)
+    assert _keyed_store(csv_path, 'patient_id').row('patient_id', 'A0002') == 1
+
+
+def test_reconversion_leaves_mapped_store_intact(tmp_path):
+    csv_path = str(tmp_path / 'catalog.csv')
+    write_catalog(csv_path, [('A0001', 'g1/A0001')])
+    convert_csv(csv_path)
+    old = _keyed_store(csv_path, 'patient_id')
+    old_bits = old.bits
+    assert old_bits[0, 0] == 0
+
+    with open(csv_path, 'w') as f:
+        f.write('patient_id,record_path,dataset,g2_164889003\n')
+        f.write('A0001,g1/A0001,cpsc_2018,1\n')
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    convert_csv(csv_path)
+
+    assert old_bits[0, 0] == 0  # still the old file's pages, not truncated or overwritten
+    assert _keyed_store(csv_path, 'patient_id').bits[0, 0] == 1
+    assert sorted(os.listdir(tmp_path)) == ['catalog.csv', 'catalog.store']
@@ -1,39 +1,64 @@
+import argparse
 import wfdb
-import pandas as pd
-import numpy as np
 from streamlit_utils.firestore_utils import init_firestore
-from streamlit_utils.app_utils import label_finder
-import random
+from streamlit_utils.app_utils import wtd_label_finder
+from streamlit_utils.record_index import wtd_record_path
+from streamlit_utils.cohort import wtd_cohort
+from streamlit_utils.preprocessing import preprocess_record
+from streamlit_utils.signal_codec import encode_signal
+from streamlit_utils.ingest import ingest, format_report
 
-db = init_firestore()
-df = pd.read_csv('./data/5_wtd_10seconds.csv')
+# Usage: python uploader.py [--query 'st elevation IN cpsc_2018'] [-n 40 | --all] [--workers 8] [--processes] [--checkpoint uploaded.txt]
+WTD_CSV = './data/5_wtd_10seconds.csv'
 
 ecg_base_path = 'C:/Data/ECG/will_two_do_2021/data'
 
-patient_id_list = df[(df['dataset'] == 'cpsc_2018') & (df['g2_164931005'] == 1)]['patient_id'].to_list()
-patient_id_list_rand = random.sample(patient_id_list, 40)
 
-for patient_id in patient_id_list_rand:
-    patient_record_path = ecg_base_path + df[df['patient_id']==patient_id]['record_path'].iloc[0]
+def build_document(patient_record_path):
     record = wfdb.rdrecord(patient_record_path)
-    
+
     # Process ECG signals
-    ecg = []
-    for ix, _ in enumerate(record.sig_name[:12]): # type: ignore
-        num_signals = record.fs * 5 # type: ignore
-        signals = record.p_signal[:num_signals, ix] # type: ignore
-        signals = signals.reshape(500, (record.fs//100)).mean(axis=1) # type: ignore
-        ecg.append(signals)
-    ecg = np.array(ecg)
-    
-    label_list = label_finder(record.comments[2]) # type: ignore
-    actual_labels = '\n- '.join(label_list)
-    
-    # Save to Firestore
-    doc_ref = db.collection("ecg_data_ste").document(patient_id)
-    doc_ref.set({
-        "signals_flat": ecg.flatten().tolist(),  # 1D list
-        "shape": list(ecg.shape),
+    ecg = preprocess_record(record)
+
+    label_list = wtd_label_finder(record.comments) # type: ignore
+    return {
+        **encode_signal(ecg),  # compressed binary signal + shape
         "label_list": label_list,
         "eval": False
-    })
\ No newline at end of file
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--query', default='st elevation IN cpsc_2018', help='cohort query, e.g. "st elevation AND NOT lbbb IN cpsc_2018"')
+    parser.add_argument('--stratify', default=None, help="'dataset' or comma-separated diagnoses to stratify the sample by")
+    parser.add_argument('-n', type=int, default=40, help='number of patients to sample')
+    parser.add_argument('--all', action='store_true', help='upload the whole cohort instead of a sample')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--collection', default='ecg_data_ste')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--processes', action='store_true', help='decode in worker processes instead of threads')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--checkpoint', default=None, help='file of committed IDs, used to resume')
+    args = parser.parse_args()
+
+    cohort = wtd_cohort(WTD_CSV)
+    if args.all:
+        patient_id_list = cohort.select(args.query)
+    else:
+        strata = args.stratify if args.stratify in (None, 'dataset') else args.stratify.split(',')
+        patient_id_list = cohort.sample(args.query, args.n, seed=args.seed, strata=strata)
+
+    jobs = [(patient_id, ecg_base_path + wtd_record_path(patient_id, WTD_CSV)) for patient_id in patient_id_list]
+    report = ingest(
+        init_firestore(), jobs, args.collection, build_document,
+        max_workers=args.workers, use_processes=args.processes,
+        batch_size=args.batch_size, checkpoint_path=args.checkpoint
+    )
+    print(format_report(report))
+    for patient_id, error in report['errors']:
+        print(f'failed {patient_id}: {error}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import streamlit as st
+import numpy as np
+from streamlit_utils.datasets import DATASETS, get_dataset
+from streamlit_utils.preprocessing import DURATION, preprocess_signal
+from streamlit_utils.augment import augmented_view
+from streamlit_utils.record_cache import read_record, record_cache
+from streamlit_utils.plotting import show_ecg, show_ecg_window, show_measurements, show_similar, select_backend
+from streamlit_utils.lod import record_pyramid
+from streamlit_utils.shard_store import open_shards
+from streamlit_utils.measurement_store import open_measurements, record_measurements
+from streamlit_utils.similarity import open_similarity
+from streamlit_utils.bootstrap import dataset_cohort
+
+# Usage: streamlit run viewer.py
+# One viewer for every dataset in streamlit_utils.datasets (WTD, MIMIC-IV-ECG, uploaded
+# WFDB records). Catalog lookups, shards, measurements and decoded records are memory-mapped
+# or shared between processes, so more sessions or datasets do not multiply RAM use.
+
+def augmentation_params():
+    """Sidebar augmentation settings as augment_batch keyword arguments."""
+    state = st.session_state
+    return {
+        'scale_range': (float(state.scale_range_min), float(state.scale_range_max)) if state.random_scale else None,
+        'shift_range': (float(state.shift_range_min), float(state.shift_range_max)) if state.random_shift else None,
+        'sigma_range': (float(state.sigma_range_min), float(state.sigma_range_max)) if state.random_gaussian_noise else None,
+        'max_stretch': float(state.warp_max_stretch) if state.random_time_warp else None,
+        'dropout_p': float(state.dropout_p) if state.random_lead_dropout else None,
+    }
+
+def load_ecg(dataset, record, ecg_name, full_view=None, record_path=None):
+    if full_view is None:
+        params = augmentation_params()
+        shards = open_shards(dataset.catalog_path)
+        ecg = None
+        if shards is not None and record.start == 0 and all(value is None for value in params.values()):
+            # Unaugmented first window: a zero-copy slice of the precomputed shard (None if stale)
+            ecg = shards.signal(ecg_name, record_path)
+        if ecg is None:
+            # Augment only the displayed window, then downsample it (same transform as the training feed)
+            seed = st.session_state.get('aug_seed', '')
+            rng = np.random.default_rng(int(seed) if seed.strip().isdigit() else None)
+            ecg = augmented_view(record.p_signal, record.fs, rng, **params) # type: ignore
+
+    label_list = dataset.labels(ecg_name, record)
+    actual_labels = '\n- '.join(label_list)
+
+    st.success(f'ECG "{ecg_name}" successfully processed!')
+
+    st.info(f"""
+            **Actual** interpretation:\n- {actual_labels}
+            """)
+
+    if full_view is None:
+        show_ecg(ecg)
+    else:
+        show_ecg_window(*full_view)
+    if record_path is not None:
+        # Measured once per record on the unaugmented signal, then served from the dataset's cache
+        show_measurements(record_measurements(ecg_name, record_path, dataset.catalog_path))
+    similarity = open_similarity(dataset.catalog_path)
+    if similarity is not None:
+        # Indexed records use their stored embedding; others are embedded from the unaugmented window
+        show_similar(similarity, ecg_name, None if ecg_name in similarity else preprocess_signal(record.p_signal, record.fs))
+
+def pick_record(dataset):
+    """Sidebar record selection for `dataset`: ID input, cohort sampling, or the uploaded records."""
+    if dataset.name == 'uploaded':
+        with st.sidebar.expander('Add records'):
+            uploads = st.file_uploader('.hea + .mat/.dat files or .zip archives', type=['hea', 'mat', 'dat', 'zip'],
+                                       accept_multiple_files=True, key='viewer_uploads',
+                                       help="Files are paired by name, e.g. 00001.hea with 00001.mat")
+            if uploads and st.button('Add'):
+                added, problems = dataset.add(uploads)
+                st.success(f'{len(added)} records added')
+                for name, problem in problems:
+                    st.warning(f'{name}: {problem}')
+        return st.sidebar.selectbox(dataset.id_label, [""] + dataset.record_ids())
+
+    ecg_name = st.sidebar.text_input(dataset.id_label)
+    with st.sidebar.expander('Cohort query'):
+        cohort_query = st.text_input('Query', placeholder=dataset.query_placeholder)
+        if cohort_query != "":
+            try:
+                cohort = dataset_cohort(dataset.name)
+                st.caption(f'{cohort.count(cohort_query)} matching records')
+                cohort_pick = st.selectbox('Sample', [""] + [str(x) for x in cohort.sample(cohort_query, 50, seed=0)])
+                ecg_name = ecg_name or cohort_pick
+                measurements = open_measurements(dataset.catalog_path)
+                if measurements is not None and len(measurements):
+                    st.download_button('Export measurements (CSV)', file_name='cohort_measurements.csv',
+                                       data=lambda: measurements.frame(cohort.select(cohort_query)).to_csv().encode())
+            except ValueError as e:
+                st.error(str(e))
+    return ecg_name
+
+def main(dataset_name=None):
+    st.set_page_config(page_title="ECGMaster Viewer", page_icon="👨‍⚕️")
+    st.title("👨‍⚕️ ECGMaster Viewer")
+    st.header("Upload your ECG to see what is going on!")
+
+    # Checkboxes start off; their text inputs start at the default ranges
+    session_state_defaults = {
+        'random_scale': False, 'scale_range_min': '0.9', 'scale_range_max': '1.1',
+        'random_shift': False, 'shift_range_min': '-0.5', 'shift_range_max': '0.5',
+        'random_gaussian_noise': False, 'sigma_range_min': '0.0', 'sigma_range_max': '0.2',
+        'random_time_warp': False, 'warp_max_stretch': '0.8',
+        'random_lead_dropout': False, 'dropout_p': '0.1',
+    }
+    for item, default in session_state_defaults.items():
+        if item not in st.session_state:
+            st.session_state[item] = default
+
+    # Sidebar widgets
+    st.sidebar.header("Load ECG")
+    if dataset_name is None:
+        dataset_name = st.sidebar.selectbox('Dataset', list(DATASETS), format_func=lambda name: DATASETS[name].title)
+    dataset = get_dataset(dataset_name)
+    ecg_name = pick_record(dataset)
+
+    if ecg_name != "":
+        try:
+            patient_record_path = dataset.record_path(ecg_name)
+        except KeyError:
+            st.sidebar.error(f'{dataset.id_label} "{ecg_name}" was not found in {dataset.title}.')
+            return
+        record = read_record(patient_record_path)
+
+        # Full-length view: zoom/scroll over a min/max pyramid (augmentations don't apply)
+        full_view = None
+        select_backend()
+        if st.sidebar.checkbox('Full record view (zoom & scroll)', key='full_view'):
+            pyramid = record_pyramid(patient_record_path)
+            view_range = st.sidebar.slider('Visible range (s)', 0.0, pyramid.duration, (0.0, pyramid.duration), step=0.1)
+            if view_range[1] - view_range[0] >= 0.1:
+                full_view = (pyramid, view_range[0], view_range[1])
+        else:
+            # Page through the full recording; only the displayed window is read from disk
+            max_start = max(0.0, record.sig_len / record.fs - DURATION)
+            if st.session_state.get('window_start', 0.0) > max_start:
+                st.session_state.window_start = max_start
+            st.sidebar.number_input('Window start (s)', min_value=0.0, max_value=max_start, step=float(DURATION), key='window_start')
+            if st.session_state.window_start > 0:
+                record = read_record(patient_record_path, start=float(st.session_state.window_start))
+
+        st.sidebar.success("Files loaded successfully!")
+
+        st.sidebar.checkbox('random scale', key='random_scale')
+        random_scale_1, random_scale_2 = st.sidebar.columns(2)
+        if st.session_state.random_scale:
+            with random_scale_1:
+                st.text_input('min scale range', key='scale_range_min')
+            with random_scale_2:
+                st.text_input('max scale range', key='scale_range_max')
+
+        st.sidebar.checkbox('random shift', key='random_shift')
+        random_shift_1, random_shift_2 = st.sidebar.columns(2)
+        if st.session_state.random_shift:
+            with random_shift_1:
+                st.text_input('min shift range', key='shift_range_min')
+            with random_shift_2:
+                st.text_input('max shift range', key='shift_range_max')
+
+        st.sidebar.checkbox('random gaussian noise', key='random_gaussian_noise')
+        random_gaussian_1, random_gaussian_2 = st.sidebar.columns(2)
+        if st.session_state.random_gaussian_noise:
+            with random_gaussian_1:
+                st.text_input('min sigma range', key='sigma_range_min')
+            with random_gaussian_2:
+                st.text_input('max sigma range', key='sigma_range_max')
+
+        st.sidebar.checkbox('random time warp', key='random_time_warp')
+        random_time_1, _ = st.sidebar.columns(2)
+        if st.session_state.random_time_warp:
+            with random_time_1:
+                st.text_input('max stretch', key='warp_max_stretch')
+
+        st.sidebar.checkbox('random lead dropout', key='random_lead_dropout')
+        random_lead_dropout_1, _ = st.sidebar.columns(2)
+        if st.session_state.random_lead_dropout:
+            with random_lead_dropout_1:
+                st.text_input('p', key='dropout_p')
+
+        st.sidebar.text_input('augmentation seed (optional)', key='aug_seed')
+
+        cache_stats = record_cache.stats()
+        st.sidebar.caption(
+            f"Record cache: {cache_stats['hits']} hits, {cache_stats['shared_hits']} shared hits, "
+            f"{cache_stats['misses']} misses, {cache_stats['evictions']} evictions, {cache_stats['bytes'] / 2**20:.1f} MB"
+        )
+
+        load_ecg(dataset, record=record, ecg_name=ecg_name, full_view=full_view, record_path=patient_record_path)
+    else:
+        st.info(f"👈 Please specify the {dataset.id_label} in the sidebar to load an ECG.")
+
+    # Expander with additional info
+    with st.expander("About the app"):
+        st.write("""
+            This is an interface to view ECG data.\n
+            Design and development by Dr. Alireza Soheilipour
+        """)
+
+if __name__ == "__main__":
+    main()